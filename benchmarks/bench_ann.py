@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compara los tipos de índice de faiss_io.build_index (flat, hnsw, ivf, ivfpq, sq8):
+recall@k frente al índice plano (búsqueda exacta), latencia p50/p99 y tamaño en disco.
+
+Los vectores salen del índice de contenido actual; con --synthetic N se generan N
+vectores alrededor de los reales (ruido gaussiano) para simular un corpus mayor.
+
+Uso (desde la raíz del repositorio):
+  python -m benchmarks.bench_ann
+  python -m benchmarks.bench_ann --synthetic 200000 --k 10
+  python -m benchmarks.bench_ann --synthetic 200000 --types flat hnsw hnsw:efSearch=128 ivfpq:nprobe=32,m=96
+
+Columnas:
+  build = segundos de entrenamiento + inserción
+  r@k   = fracción de los k vecinos exactos (flat) que devuelve el índice
+  p50/p99 = latencia de una pregunta (batch de 1), en ms
+  MB    = tamaño del fichero del índice
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import faiss
+import numpy as np
+
+from graphrag_app.faiss_io import INDEX_TYPES, build_index, read_index_params, search_parameters, write_index
+from graphrag_app.retriever import _load_index
+
+
+def _base_vectors(synthetic: int, noise: float, rng) -> np.ndarray:
+    index = _load_index("content").index
+    if isinstance(index, faiss.IndexIDMap):
+        # índice con IDs estables: los vectores están en el índice interno
+        index = faiss.downcast_index(index.index)
+    X = index.reconstruct_n(0, index.ntotal)
+    if synthetic:
+        picks = rng.integers(0, len(X), size=synthetic)
+        X = X[picks] + noise * rng.standard_normal((synthetic, X.shape[1])).astype("float32")
+    X /= np.linalg.norm(X, axis=1, keepdims=True)
+    return np.ascontiguousarray(X, dtype="float32")
+
+
+def _queries(X: np.ndarray, n: int, noise: float, rng) -> np.ndarray:
+    Q = X[rng.integers(0, len(X), size=n)] + noise * rng.standard_normal((n, X.shape[1])).astype("float32")
+    Q /= np.linalg.norm(Q, axis=1, keepdims=True)
+    return np.ascontiguousarray(Q, dtype="float32")
+
+
+def _parse_spec(spec: str):
+    # "hnsw:efSearch=128,M=48" -> ("hnsw", {"efSearch": 128, "M": 48})
+    index_type, _, rest = spec.partition(":")
+    params = {}
+    for pair in filter(None, rest.split(",")):
+        key, _, value = pair.partition("=")
+        params[key] = int(value)
+    return index_type, params
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--types", nargs="+", default=list(INDEX_TYPES))
+    ap.add_argument("--synthetic", type=int, default=0, help="nº de vectores sintéticos (0 = los del índice actual)")
+    ap.add_argument("--noise", type=float, default=0.03)
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--k", type=int, default=10)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    X = _base_vectors(args.synthetic, args.noise, rng)
+    Q = _queries(X, args.queries, args.noise, rng)
+    print(f"vectores: {X.shape[0]} x {X.shape[1]} | preguntas: {len(Q)} | k={args.k}\n")
+
+    tmp = tempfile.mkdtemp(prefix="bench_ann_")
+    truth = None
+    print(f"{'tipo':<44} {'build s':>8} {'r@k':>6} {'p50 ms':>7} {'p99 ms':>7} {'MB':>8}")
+
+    for spec in (["flat"] if "flat" not in args.types else []) + args.types:
+        index_type, params = _parse_spec(spec)
+        t0 = time.perf_counter()
+        index, info = build_index(X, index_type, params)
+        build_s = time.perf_counter() - t0
+
+        path = os.path.join(tmp, spec.replace(":", "_").replace(",", "_") + ".index")
+        write_index(index, path, info)
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        # como el retriever: parámetros de búsqueda leídos del fichero de parámetros
+        sp = search_parameters(read_index_params(path))
+
+        lat = []
+        found = np.empty((len(Q), args.k), dtype="int64")
+        for i in range(len(Q)):
+            t0 = time.perf_counter()
+            _, ids = index.search(Q[i:i + 1], args.k, params=sp)
+            lat.append(time.perf_counter() - t0)
+            found[i] = ids[0]
+
+        if truth is None:
+            # la primera pasada es siempre flat: búsqueda exacta de referencia
+            truth = found
+            if spec not in args.types:
+                continue
+
+        recall = np.mean([len(set(t) & set(f)) / args.k for t, f in zip(truth.tolist(), found.tolist())])
+        label = " ".join([index_type] + [f"{k}={v}" for k, v in info["params"].items()])
+        print(
+            f"{label:<44} {build_s:>8.2f} {recall:>6.3f} {1000 * np.percentile(lat, 50):>7.3f} "
+            f"{1000 * np.percentile(lat, 99):>7.3f} {size_mb:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
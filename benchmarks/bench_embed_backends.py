@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compara los backends de embeddings (torch, onnx, onnx-int8) de graphrag_app.embeddings:
+arranque, latencia por pregunta, throughput y recall@k frente a torch.
+
+Requiere el modelo exportado (python -m graphrag_app.export_onnx).
+
+Uso (desde la raíz del repositorio):
+  python -m benchmarks.bench_embed_backends
+  python -m benchmarks.bench_embed_backends --queries 500 --corpus 4000 --k 10
+  python -m benchmarks.bench_embed_backends --backends torch onnx-int8 --onnx_dir /ruta/al/modelo-onnx
+
+Las preguntas son el comienzo de cards reales del índice de contenido; el corpus,
+los textos de las propias cards.
+
+Columnas:
+  cold     = proceso nuevo: import + carga del modelo + primer encode (lo que paga un worker al arrancar)
+  p50/p95  = latencia de una pregunta (batch de 1), en ms
+  txt/s    = throughput codificando el corpus en batches de --batch_size
+  cos      = similitud coseno mínima / media con los vectores de torch
+  r@k idx  = recall@k sobre el índice actual (construido con torch) frente a las preguntas codificadas con torch
+  r@k new  = recall@k si se reconstruye el índice con el mismo backend (corpus y preguntas)
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import faiss
+import numpy as np
+
+from graphrag_app import embeddings
+from graphrag_app.meta_store import meta_column
+from graphrag_app.retriever import _load_index
+
+
+def _cold_start(model_name: str, backend: str) -> float:
+    code = (
+        "import time; t0 = time.perf_counter()\n"
+        "from graphrag_app import embeddings\n"
+        f"embeddings.warmup({model_name!r}, backend={backend!r})\n"
+        "print(time.perf_counter() - t0)\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, env=os.environ)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def _recall(truth: np.ndarray, found: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(t) & set(f)) / k for t, f in zip(truth.tolist(), found.tolist())]))
+
+
+def _queries(texts, n: int, words: int = 12):
+    rng = np.random.default_rng(0)
+    picks = rng.choice(len(texts), size=min(n, len(texts)), replace=False)
+    return [" ".join(texts[i].split()[:words]) for i in picks]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model", default=embeddings.MODEL_NAME)
+    ap.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    ap.add_argument("--onnx_dir", default=None, help="por defecto EMBED_ONNX_DIR o graphrag_app/models/<modelo>-onnx")
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--corpus", type=int, default=2000)
+    ap.add_argument("--batch_size", type=int, default=64)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--no_cold", action="store_true", help="no medir el arranque en un proceso nuevo")
+    args = ap.parse_args()
+
+    if args.onnx_dir:
+        os.environ["EMBED_ONNX_DIR"] = args.onnx_dir
+        embeddings.EMBED_ONNX_DIR = args.onnx_dir
+
+    bundle = _load_index("content")
+    texts = [t for t in meta_column(bundle.meta, "text", "") if t]
+    queries = _queries(texts, args.queries)
+    corpus = texts[:args.corpus]
+    print(f"model: {args.model} | queries: {len(queries)} | corpus: {len(corpus)} | index: {bundle.index.ntotal} vectores\n")
+
+    ref_q = ref_c = None
+    ref_idx = ref_new = None
+    print(
+        f"{'backend':>10} {'cold s':>7} {'p50 ms':>7} {'p95 ms':>7} {'txt/s':>8} "
+        f"{'cos min':>8} {'cos avg':>8} {'r@k idx':>8} {'r@k new':>8}"
+    )
+
+    for backend in args.backends:
+        cold = float("nan") if args.no_cold else _cold_start(args.model, backend)
+        embeddings.warmup(args.model, backend=backend)
+
+        lat = []
+        q_vecs = []
+        for q in queries:
+            t0 = time.perf_counter()
+            q_vecs.append(embeddings.encode([q], args.model, backend=backend)[0])
+            lat.append(time.perf_counter() - t0)
+        q_vecs = np.stack(q_vecs)
+
+        t0 = time.perf_counter()
+        c_vecs = embeddings.encode(corpus, args.model, batch_size=args.batch_size, backend=backend)
+        tput = len(corpus) / (time.perf_counter() - t0)
+
+        # top-k sobre el índice existente y sobre un índice reconstruido con este backend
+        _, idx_ids = bundle.index.search(q_vecs, args.k)
+        rebuilt = faiss.IndexFlatIP(c_vecs.shape[1])
+        rebuilt.add(c_vecs)
+        _, new_ids = rebuilt.search(q_vecs, args.k)
+
+        if ref_q is None:
+            # el primer backend (torch por defecto) es la referencia
+            ref_q, ref_c, ref_idx, ref_new = q_vecs, c_vecs, idx_ids, new_ids
+
+        cos = np.concatenate([(q_vecs * ref_q).sum(axis=1), (c_vecs * ref_c).sum(axis=1)])
+        print(
+            f"{backend:>10} {cold:>7.2f} {1000 * np.percentile(lat, 50):>7.2f} {1000 * np.percentile(lat, 95):>7.2f} "
+            f"{tput:>8.1f} {cos.min():>8.5f} {cos.mean():>8.5f} "
+            f"{_recall(ref_idx, idx_ids):>8.3f} {_recall(ref_new, new_ids):>8.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
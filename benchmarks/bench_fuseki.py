@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Latencia por llamada SPARQL: cliente antiguo (requests.get/post sueltos, una conexión
+TCP nueva por consulta y POST solo tras fallar el GET) frente a graphrag_app.fuseki
+(keep-alive, pool y método recordado por endpoint), y el mismo cliente en asíncrono
+lanzando las consultas de cada ronda a la vez (asparql_many). Sin caché de resultados:
+se mide el coste de ir a Fuseki.
+
+Las consultas son las del camino EXACT de app.answer_question: resolver la figura por
+nombre, sus umbrales, el total mínimo y los fragmentos de una sección.
+
+Uso (desde la raíz del repositorio, con Fuseki levantado):
+  python -m benchmarks.bench_fuseki
+  python -m benchmarks.bench_fuseki --endpoint http://localhost:3030/academic-career/query --rounds 50
+
+Columnas:
+  p50/p95/mean = latencia de una llamada, en ms (async: de una ronda completa)
+  total        = segundos de todas las rondas (cada ronda = una pregunta EXACT)
+"""
+
+import argparse
+import asyncio
+import time
+
+import numpy as np
+import requests
+
+from graphrag_app import fuseki
+
+U = "http://example.org/academic-career/ontology#"
+
+
+def _legacy_select(endpoint: str, query: str, timeout: int = 30):
+    # lo que hacía fuseki.sparql_select antes: sin sesión, GET y si falla POST
+    r = requests.get(endpoint, params={"query": query}, headers=fuseki.HEADERS_GET, timeout=timeout)
+    if r.status_code == 200:
+        return r.json().get("results", {}).get("bindings", [])
+    r2 = requests.post(endpoint, data={"query": query}, headers=fuseki.HEADERS_POST, timeout=timeout)
+    r2.raise_for_status()
+    return r2.json().get("results", {}).get("bindings", [])
+
+
+def _exact_queries(endpoint: str):
+    rows = fuseki.sparql_select(
+        f"PREFIX u: <{U}> SELECT ?fig ?n WHERE {{ ?fig a u:Figura ; u:nombre ?n . }} ORDER BY ?fig LIMIT 1",
+        endpoint=endpoint,
+    )
+    fig_uri = rows[0]["fig"]["value"] if rows else f"{U}figura_inexistente"
+    fig_name = rows[0]["n"]["value"].lower() if rows else "agregado"
+    return [
+        f"""PREFIX u: <{U}>
+        SELECT ?fig WHERE {{ ?fig a u:Figura ; u:nombre ?n . FILTER(CONTAINS(LCASE(STR(?n)), "{fig_name}")) }} LIMIT 1""",
+        f"""PREFIX u: <{U}>
+        SELECT ?v ?mm ?ap ?p WHERE {{
+          <{fig_uri}> u:tieneUmbral ?umb .
+          ?umb a u:UmbralPuntuacion ; u:valor ?v ; u:minmax ?mm ; u:apartado ?ap ; u:provieneDe ?frag .
+          OPTIONAL {{ ?frag u:pagina ?p . }}
+        }} ORDER BY ?mm ?ap""",
+        f"""PREFIX u: <{U}>
+        SELECT ?v WHERE {{
+          <{fig_uri}> u:tieneUmbral ?umb .
+          ?umb a u:UmbralPuntuacion ; u:valor ?v ; u:apartado u:apartado_total ; u:minmax ?mm .
+          FILTER(STR(?mm) = "total_min")
+        }} LIMIT 1""",
+        f"""PREFIX u: <{U}>
+        SELECT ?frag ?texto WHERE {{
+          ?frag a u:Fragmento ; u:textoFuente ?texto ; u:enSeccion ?sec .
+          ?sec u:nombre ?secNombre .
+          FILTER(LCASE(STR(?secNombre)) = "requisitos")
+        }} LIMIT 6""",
+    ]
+
+
+def _run(select, queries, rounds: int):
+    lat = []
+    t_start = time.perf_counter()
+    for _ in range(rounds):
+        for q in queries:
+            t0 = time.perf_counter()
+            select(q)
+            lat.append(time.perf_counter() - t0)
+    return np.array(lat), time.perf_counter() - t_start
+
+
+def _run_async(queries, endpoint: str, rounds: int):
+    # una ronda = las consultas de la pregunta lanzadas a la vez; latencia = la de la ronda
+    async def go():
+        lat = []
+        t_start = time.perf_counter()
+        for _ in range(rounds):
+            t0 = time.perf_counter()
+            await fuseki.asparql_many(queries, endpoint=endpoint, cache=False)
+            lat.append(time.perf_counter() - t0)
+        return np.array(lat), time.perf_counter() - t_start
+
+    return asyncio.run(go())
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--endpoint", default=fuseki.FUSEKI_QUERY_URL or "http://localhost:3030/academic-career/query")
+    ap.add_argument("--rounds", type=int, default=30)
+    args = ap.parse_args()
+
+    queries = _exact_queries(args.endpoint)
+    print(f"endpoint: {args.endpoint} | {len(queries)} consultas x {args.rounds} rondas\n")
+    print(f"{'cliente':<10} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8} {'total s':>8}")
+
+    clients = {
+        "antiguo": lambda q: _legacy_select(args.endpoint, q),
+        "pool": lambda q: fuseki.sparql_select(q, endpoint=args.endpoint, cache=False),
+    }
+    for name, select in clients.items():
+        select(queries[0])  # calentamiento (y método recordado en el cliente nuevo)
+        lat, total = _run(select, queries, args.rounds)
+        print(
+            f"{name:<10} {1000 * np.percentile(lat, 50):>8.2f} {1000 * np.percentile(lat, 95):>8.2f} "
+            f"{1000 * lat.mean():>8.2f} {total:>8.2f}"
+        )
+    lat, total = _run_async(queries, args.endpoint, args.rounds)
+    print(
+        f"{'async':<10} {1000 * np.percentile(lat, 50):>8.2f} {1000 * np.percentile(lat, 95):>8.2f} "
+        f"{1000 * lat.mean():>8.2f} {total:>8.2f}   (por ronda, consultas en paralelo)"
+    )
+    print(f"\nfuseki.sparql_stats(): {fuseki.sparql_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compara la memoria residente y la latencia de la primera consulta con N procesos
+(como N workers de uvicorn) cargando el mismo índice FAISS, con y sin mmap.
+
+Uso (desde la raíz del repositorio):
+  python -m benchmarks.bench_mmap_workers
+  python -m benchmarks.bench_mmap_workers --index graphrag_app/index_content/content.index --workers 1 4 8
+  python -m benchmarks.bench_mmap_workers --synthetic 200000   # índice sintético más grande
+
+Columnas:
+  rss  = memoria residente sumada de todos los workers (cuenta varias veces las páginas compartidas)
+  pss  = memoria proporcional (las páginas compartidas se reparten entre los procesos que las usan)
+  load = tiempo medio de faiss.read_index por worker
+  q1   = latencia media de la primera búsqueda por worker
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import tempfile
+import time
+
+import numpy as np
+
+DEFAULT_INDEX = os.path.join("graphrag_app", "index_content", "content.index")
+
+
+def _mem_kb() -> dict:
+    out = {"rss": 0, "pss": 0}
+    with open("/proc/self/smaps_rollup", "r") as f:
+        for line in f:
+            key = line.split(":")[0].strip().lower()
+            if key in out:
+                out[key] = int(line.split()[1])
+    return out
+
+
+def _worker(index_path: str, mmap: bool, barrier, queue) -> None:
+    from graphrag_app.faiss_io import read_index
+
+    base = _mem_kb()
+    t0 = time.perf_counter()
+    index = read_index(index_path, mmap=mmap)
+    load_s = time.perf_counter() - t0
+
+    q = np.random.default_rng(os.getpid()).standard_normal((1, index.d)).astype("float32")
+    q /= np.linalg.norm(q)
+    t0 = time.perf_counter()
+    index.search(q, 30)
+    q1_s = time.perf_counter() - t0
+
+    mem = _mem_kb()
+    queue.put({
+        "load": load_s,
+        "q1": q1_s,
+        "rss": mem["rss"] - base["rss"],
+        "pss": mem["pss"] - base["pss"],
+    })
+    # todos los workers vivos a la vez para que el PSS refleje el reparto real
+    barrier.wait()
+
+
+def run(index_path: str, n_workers: int, mmap: bool) -> dict:
+    ctx = mp.get_context("spawn")
+    barrier = ctx.Barrier(n_workers)
+    queue = ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(index_path, mmap, barrier, queue)) for _ in range(n_workers)]
+    for p in procs:
+        p.start()
+    rows = [queue.get() for _ in procs]
+    for p in procs:
+        p.join()
+
+    return {
+        "rss_mb": sum(r["rss"] for r in rows) / 1024,
+        "pss_mb": sum(r["pss"] for r in rows) / 1024,
+        "load_ms": 1000 * sum(r["load"] for r in rows) / n_workers,
+        "q1_ms": 1000 * sum(r["q1"] for r in rows) / n_workers,
+    }
+
+
+def _synthetic_index(n: int, dim: int = 384) -> str:
+    import faiss
+
+    X = np.random.default_rng(0).standard_normal((n, dim)).astype("float32")
+    faiss.normalize_L2(X)
+    index = faiss.IndexFlatIP(dim)
+    index.add(X)
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_mmap_"), "synthetic.index")
+    faiss.write_index(index, path)
+    return path
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--index", default=DEFAULT_INDEX)
+    ap.add_argument("--synthetic", type=int, default=0, help="nº de vectores de un índice sintético (0 = usar --index)")
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    args = ap.parse_args()
+
+    index_path = _synthetic_index(args.synthetic) if args.synthetic else args.index
+    size_mb = os.path.getsize(index_path) / (1024 * 1024)
+    print(f"index: {index_path} ({size_mb:.1f} MB)\n")
+    print(f"{'workers':>7} {'mmap':>5} {'rss MB':>9} {'pss MB':>9} {'load ms':>9} {'q1 ms':>8}")
+
+    for n in args.workers:
+        for mmap in (False, True):
+            r = run(index_path, n, mmap)
+            print(
+                f"{n:>7} {'on' if mmap else 'off':>5} {r['rss_mb']:>9.1f} {r['pss_mb']:>9.1f} "
+                f"{r['load_ms']:>9.2f} {r['q1_ms']:>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,30 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import re
+import asyncio
 from typing import List, Optional, Dict, Any
 
-from graphrag_app.fuseki import sparql_select
-from graphrag_app.ollama_client import ollama_generate
+from graphrag_app import gazetteer
+from graphrag_app.fuseki import asparql_select, run_sync
+from graphrag_app.ollama_client import aollama_generate
+from graphrag_app.threshold_table import (
+    aget_table,
+    choose_figures,
+    group_threshold_rows,
+    record_lookup,
+)
+from graphrag_app.signals import QuestionSignals, match_signals
 
 # Intenta usar tu retriever nuevo (content.index) y si no, cae al antiguo
 try:
     from graphrag_app.retriever import retrieve as _retrieve
 
-    def retrieve_content_hits(q: str, k: int = 8):
-        return _retrieve(q, kind="content", k=max(20, k), final_k=k, min_score=None)
+    def retrieve_content_hits(q: str, k: int = 8, sig: Optional[QuestionSignals] = None):
+        return _retrieve(q, kind="content", k=max(20, k), final_k=k, min_score=None, signals=sig)
 except Exception:
     from graphrag_app.content_retriever import retrieve_content as _retrieve
 
-    def retrieve_content_hits(q: str, k: int = 8):
+    def retrieve_content_hits(q: str, k: int = 8, sig: Optional[QuestionSignals] = None):
         return _retrieve(q, k=k)
 
 U = "http://example.org/academic-career/ontology#"
@@ -33,31 +41,8 @@ SYSTEM_PROMPT = (
     "'No hay evidencia suficiente en el grafo cargado.'\n"
 )
 
-# ======== Alias de figuras (para detectar en la pregunta) ========
-FIGURE_ALIASES = {
-    "profesorado pleno": [r"\bpleno\b", r"\bprofesorado pleno\b", r"\bprofesor pleno\b"],
-    "profesorado agregado": [r"\bagregado\b", r"\bprofesorado agregado\b", r"\bprofesor agregado\b"],
-    "profesorado de investigación": [r"\bprofesorado de investigaci[oó]n\b", r"\bprofesorado investigaci[oó]n\b"],
-    "doctor investigador": [r"\bdoctor investigador\b"],
-}
-
-SECTION_ALIASES = {
-    "indice": [r"\bíndice\b", r"\bindice\b", r"\baurkibidea\b"],
-    "introduccion": [r"\bintroducci[oó]n\b", r"\bintroduccion\b", r"\bsarrera\b"],
-    "procedimiento": [r"\bprocedimiento\b", r"\bizapidetzea\b"],
-    "recurso": [r"\brecurso\b", r"\brecursos\b", r"\berrekurtsoak\b", r"\berrekurtsoa\b"],
-    "requisitos": [r"\brequisito\b", r"\brequisitos\b"],
-    "plazos": [r"\bplazo\b", r"\bplazos\b", r"\bepeak\b"],
-    "notificacion": [r"\bnotificaci[oó]n\b", r"\bnotificacion\b", r"\bjakinarazpen\b"],
-    "tasas": [r"\btasa\b", r"\btasas\b", r"\bordainketa\b"],
-    "evaluacion": [r"\bevaluaci[oó]n\b", r"\bevaluacion\b", r"\bebaluazioa\b"],
-    "otro": [r"\botro\b"],
-}
-
-SECTION_QUERY_HINTS = [
-    "sección", "seccion", "apartado", "índice", "indice", "introducción", "introduccion",
-    "aurkibidea", "sarrera",
-]
+# Alias de figuras/secciones y palabras de routing: ver graphrag_app/signals.py
+# (se detectan todas de una vez con match_signals y se pasan por el pipeline)
 
 # Mapping “Apartado N” -> individuo en tu ontología
 # (según tu TTL: investigacion/docencia/formacion/gestion)
@@ -73,58 +58,41 @@ APARTADO_NUM_TO_URI = {
 # Helpers de routing / intent
 # =========================
 
-def detect_figures(question: str) -> List[str]:
-    q = (question or "").lower()
-    found = []
-    for fig_name, pats in FIGURE_ALIASES.items():
-        if any(re.search(p, q) for p in pats):
-            found.append(fig_name)
-    return found
+def question_signals(q: str) -> QuestionSignals:
+    """
+    Señales de la pregunta con las figuras y secciones del gazetteer (si está cargado):
+    la ruta EXACT/SEARCH y la detección de figuras y secciones usan la misma fuente.
+    """
+    return gazetteer.with_entities(match_signals(q))
 
 
-def detect_sections(question: str) -> List[str]:
-    q = (question or "").lower()
-    found = []
-    for sec_name, pats in SECTION_ALIASES.items():
-        if any(re.search(p, q) for p in pats):
-            found.append(sec_name)
-    return found
+def _signals(q: str, sig: Optional[QuestionSignals]) -> QuestionSignals:
+    return sig if sig is not None else question_signals(q)
 
 
-def is_searchy(q: str) -> bool:
-    ql = (q or "").lower()
-    return any(
-        w in ql
-        for w in [
-            "dónde", "donde", "menciona", "mencione", "aparece", "habla de", "texto",
-            "fragmento", "muéstrame", "muestrame", "enséñame", "enseñame", "qué pone",
-            "que pone", "qué dice", "que dice", "sección", "seccion", "apartado",
-        ]
-    )
+def detect_figures(question: str, sig: Optional[QuestionSignals] = None) -> List[str]:
+    # con el gazetteer cargado, las figuras del grafo (y sus alias ES/EU); si no, la lista fija
+    return list(gazetteer.with_entities(_signals(question, sig)).figures)
 
 
-def is_exacty(q: str) -> bool:
-    ql = (q or "").lower()
-    return any(
-        w in ql
-        for w in [
-            "umbral", "mínim", "minim", "máxim", "maxim", "puntuación", "puntuacion",
-            "puntos", "requisito",
-        ]
-    )
+def detect_sections(question: str, sig: Optional[QuestionSignals] = None) -> List[str]:
+    return list(gazetteer.with_entities(_signals(question, sig)).sections)
+
+
+def is_searchy(q: str, sig: Optional[QuestionSignals] = None) -> bool:
+    return _signals(q, sig).searchy
+
 
+def is_exacty(q: str, sig: Optional[QuestionSignals] = None) -> bool:
+    return _signals(q, sig).exacty
 
-def is_section_query(q: str) -> bool:
-    ql = (q or "").lower()
-    return bool(detect_sections(ql)) or any(w in ql for w in SECTION_QUERY_HINTS)
 
+def is_section_query(q: str, sig: Optional[QuestionSignals] = None) -> bool:
+    return _signals(q, sig).section_query
 
-def route_intent(q: str) -> str:
-    if is_exacty(q):
-        return "EXACT"
-    if is_section_query(q) or is_searchy(q):
-        return "SEARCH"
-    return "OPEN"
+
+def route_intent(q: str, sig: Optional[QuestionSignals] = None) -> str:
+    return _signals(q, sig).route
 
 
 def evidence_strength(hits: List[Dict[str, Any]]) -> int:
@@ -187,7 +155,7 @@ def _rows_to_section_hits(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     return hits
 
 
-def query_fragments_by_section(section_name: str, limit: int = 6) -> List[Dict[str, Any]]:
+async def aquery_fragments_by_section(section_name: str, limit: int = 6) -> List[Dict[str, Any]]:
     section_name = (section_name or "").strip().lower()
     if not section_name:
         return []
@@ -207,6 +175,28 @@ def query_fragments_by_section(section_name: str, limit: int = 6) -> List[Dict[s
     vals = aliases.get(section_name, [section_name])
     values_clause = " ".join(f'\"{_escape_sparql_literal(v.lower())}\"' for v in vals)
 
+    # con el gazetteer, la sección ya es una URI: sin comparar nombres en Fuseki
+    gaz = gazetteer.current()
+    sec = gaz.resolve(section_name, "seccion") if gaz is not None else None
+    if sec is not None:
+        query = f"""
+    PREFIX u: <{U}>
+    SELECT ?frag ?texto ?pagina ?titulo ?secNombre WHERE {{
+      VALUES ?sec {{ <{sec.uri}> }}
+      ?frag a u:Fragmento ;
+            u:textoFuente ?texto ;
+            u:enSeccion ?sec .
+      OPTIONAL {{ ?frag u:pagina ?pagina . }}
+      OPTIONAL {{
+        ?frag u:fuenteDocumento ?doc .
+        OPTIONAL {{ ?doc u:titulo ?titulo . }}
+      }}
+      ?sec u:nombre ?secNombre .
+    }}
+    LIMIT {max(1, int(limit))}
+    """
+        return _rows_to_section_hits(await asparql_select(query))
+
     query = f"""
     PREFIX u: <{U}>
     SELECT ?frag ?texto ?pagina ?titulo ?secNombre WHERE {{
@@ -225,59 +215,91 @@ def query_fragments_by_section(section_name: str, limit: int = 6) -> List[Dict[s
     }}
     LIMIT {max(1, int(limit))}
     """
-    rows = sparql_select(query)
+    rows = await asparql_select(query)
     return _rows_to_section_hits(rows)
 
 
-def retrieve_section_hits(q: str, k: int = 6) -> List[Dict[str, Any]]:
-    sections = detect_sections(q)
+def query_fragments_by_section(section_name: str, limit: int = 6) -> List[Dict[str, Any]]:
+    return run_sync(aquery_fragments_by_section(section_name, limit))
+
+
+async def aretrieve_section_hits(q: str, k: int = 6, sig: Optional[QuestionSignals] = None) -> List[Dict[str, Any]]:
+    await gazetteer.aget_gazetteer()
+    sections = detect_sections(q, sig)
     hits: List[Dict[str, Any]] = []
 
-    for sec in sections:
-        hits.extend(query_fragments_by_section(sec, limit=max(2, k)))
+    # una consulta por sección, todas a la vez
+    per_section = await asyncio.gather(*(aquery_fragments_by_section(sec, limit=max(2, k)) for sec in sections))
+    for sec_hits in per_section:
+        hits.extend(sec_hits)
 
     if evidence_strength(hits) >= 120:
         return hits[:k]
 
-    boosted_q = q
-    if sections:
-        boosted_q = q + " " + " ".join(f"seccion {s}" for s in sections)
-    return retrieve_content_hits(boosted_q, k=k)
+    # FAISS + modelo de embeddings: CPU, fuera del event loop
+    if not sections:
+        return await asyncio.to_thread(retrieve_content_hits, q, k, sig)
+
+    # la pregunta reforzada es otro texto: sus señales se calculan de nuevo
+    boosted_q = q + " " + " ".join(f"seccion {s}" for s in sections)
+    return await asyncio.to_thread(retrieve_content_hits, boosted_q, k)
+
+
+def retrieve_section_hits(q: str, k: int = 6, sig: Optional[QuestionSignals] = None) -> List[Dict[str, Any]]:
+    return run_sync(aretrieve_section_hits(q, k, sig))
 
 
 # =========================
 # SPARQL: Figura -> Umbrales
 # =========================
 
-def _resolve_figure_uri_by_name(fig_name: str) -> Optional[str]:
+async def _aresolve_figure_uri_by_name(fig_name: str) -> Optional[str]:
     """
-    Busca una Figura por u:nombre (case-insensitive contains).
+    URI de una Figura por nombre: primero en el gazetteer (alias, erratas, contiene),
+    sin ir a Fuseki; si no está cargado, u:nombre case-insensitive contains.
     """
     name = (fig_name or "").strip().lower()
     if not name:
         return None
 
+    gaz = await gazetteer.aget_gazetteer()
+    if gaz is not None:
+        entity = gaz.resolve(name, "figura")
+        return entity.uri if entity is not None else None
+
     query = f"""
     PREFIX u: <{U}>
     SELECT ?fig WHERE {{
       ?fig a u:Figura ;
            u:nombre ?n .
-      FILTER(CONTAINS(LCASE(STR(?n)), "{name}"))
+      FILTER(CONTAINS(LCASE(STR(?n)), "{_escape_sparql_literal(name)}"))
     }}
     LIMIT 1
     """
-    rows = sparql_select(query)
+    rows = await asparql_select(query)
     if not rows:
         return None
     return rows[0]["fig"]["value"]
 
 
-def sparql_total_min_for_figure(fig_uri: str) -> Optional[str]:
+def _resolve_figure_uri_by_name(fig_name: str) -> Optional[str]:
+    return run_sync(_aresolve_figure_uri_by_name(fig_name))
+
+
+async def asparql_total_min_for_figure(fig_uri: str) -> Optional[str]:
     """
     Devuelve el umbral total mínimo (1 número) para una figura:
     figura u:tieneUmbral ?u .
     ?u u:apartado u:apartado_total ; u:minmax "total_min" ; u:valor ?v .
+    Primero en la tabla en memoria; a Fuseki solo si la figura no está.
     """
+    table = await aget_table()
+    if table is not None and table.has_figure(fig_uri):
+        record_lookup(True)
+        val = table.value(fig_uri, f"{U}apartado_total", "total_min")
+        return _fmt_num(val) if val is not None else None
+    record_lookup(False)
+
     query = f"""
     PREFIX u: <{U}>
     SELECT ?v WHERE {{
@@ -290,17 +312,29 @@ def sparql_total_min_for_figure(fig_uri: str) -> Optional[str]:
     }}
     LIMIT 1
     """
-    rows = sparql_select(query)
+    rows = await asparql_select(query)
     if not rows:
         return None
     return _fmt_num(rows[0]["v"]["value"])
 
 
-def sparql_apartado_min_for_figure(fig_uri: str, apartado_uri: str) -> Optional[str]:
+def sparql_total_min_for_figure(fig_uri: str) -> Optional[str]:
+    return run_sync(asparql_total_min_for_figure(fig_uri))
+
+
+async def asparql_apartado_min_for_figure(fig_uri: str, apartado_uri: str) -> Optional[str]:
     """
     Devuelve el umbral mínimo de un apartado concreto (1 número) para una figura:
     ?umb u:apartado <apartado_uri> ; u:minmax "apartado_min" ; u:valor ?v
+    Primero en la tabla en memoria; a Fuseki solo si la figura no está.
     """
+    table = await aget_table()
+    if table is not None and table.has_figure(fig_uri):
+        record_lookup(True)
+        val = table.value(fig_uri, apartado_uri, "apartado_min")
+        return _fmt_num(val) if val is not None else None
+    record_lookup(False)
+
     query = f"""
     PREFIX u: <{U}>
     SELECT ?v WHERE {{
@@ -313,69 +347,127 @@ def sparql_apartado_min_for_figure(fig_uri: str, apartado_uri: str) -> Optional[
     }}
     LIMIT 1
     """
-    rows = sparql_select(query)
+    rows = await asparql_select(query)
     if not rows:
         return None
     return _fmt_num(rows[0]["v"]["value"])
 
 
-def build_exact_context(q: str) -> str:
+def sparql_apartado_min_for_figure(fig_uri: str, apartado_uri: str) -> Optional[str]:
+    return run_sync(asparql_apartado_min_for_figure(fig_uri, apartado_uri))
+
+
+def _figure_thresholds_query(names: List[str], apartados: Optional[List[str]] = None) -> str:
+    """
+    Una sola SELECT para varias figuras: VALUES con los nombres buscados (mismo
+    CONTAINS que _resolve_figure_uri_by_name) y, en OPTIONAL, todos sus umbrales
+    (o solo los de los apartados pedidos).
+    """
+    values_clause = " ".join(f'"{_escape_sparql_literal(n)}"' for n in names)
+    ap_filter = ""
+    if apartados:
+        ap_filter = f"FILTER(?ap IN ({', '.join(f'<{a}>' for a in apartados)}))"
+
+    return f"""
+    PREFIX u: <{U}>
+    SELECT ?wanted ?fig ?n ?umb ?v ?mm ?ap ?frag ?p WHERE {{
+      VALUES ?wanted {{ {values_clause} }}
+      ?fig a u:Figura ;
+           u:nombre ?n .
+      FILTER(CONTAINS(LCASE(STR(?n)), ?wanted))
+      OPTIONAL {{
+        ?fig u:tieneUmbral ?umb .
+        ?umb a u:UmbralPuntuacion ;
+             u:valor ?v ;
+             u:minmax ?mm ;
+             u:apartado ?ap .
+        {ap_filter}
+        OPTIONAL {{
+          ?umb u:provieneDe ?frag .
+          OPTIONAL {{ ?frag u:pagina ?p . }}
+        }}
+      }}
+    }}
+    """
+
+
+async def afetch_figure_thresholds(
+    fig_names: List[str], apartados: Optional[List[str]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    nombre de figura -> {"uri": ..., "rows": [{"ap", "mm", "v", "p", "frag"}, ...]}.
+    El nombre se resuelve con el gazetteer y los umbrales salen de la tabla en memoria
+    (threshold_table); solo los nombres que no están van a Fuseki, todos en una única
+    consulta. Los nombres sin figura no aparecen; cómo se elige entre varias figuras
+    que casan, en gazetteer.Gazetteer.resolve y threshold_table.choose_figures.
+    """
+    names = list(dict.fromkeys((n or "").strip().lower() for n in fig_names if (n or "").strip()))
+    if not names:
+        return {}
+
+    gaz, table = await asyncio.gather(gazetteer.aget_gazetteer(), aget_table())
+    found: Dict[str, Dict[str, Any]] = {}
+    if table is not None:
+        for name in names:
+            entity = gaz.resolve(name, "figura") if gaz is not None else None
+            rows = table.rows_for(entity.uri, apartados) if entity is not None else []
+            if rows:
+                found[name] = {"uri": entity.uri, "rows": rows}
+        # lo que el gazetteer no sitúa (o sin umbrales de esos apartados), por nombre
+        found.update(table.lookup([n for n in names if n not in found], apartados))
+    missing = [n for n in names if n not in found]
+    record_lookup(not missing)
+    if missing:
+        rows = await asparql_select(_figure_thresholds_query(missing, apartados))
+        found.update(choose_figures(missing, group_threshold_rows(rows), apartados))
+    return found
+
+
+def _threshold_value(entry: Optional[Dict[str, Any]], apartado_uri: str, minmax: str) -> Optional[str]:
+    for t in (entry or {}).get("rows", []):
+        if t["ap"] == apartado_uri and t["mm"] == minmax:
+            return _fmt_num(t["v"])
+    return None
+
+
+async def abuild_exact_context(q: str, sig: Optional[QuestionSignals] = None) -> str:
     """
     Contexto “exacto” para cuando NO hay fast-path numérico.
     Devuelve una lista de umbrales relevantes por figura(s).
     """
-    figs = detect_figures(q)
+    await gazetteer.aget_gazetteer()
+    figs = detect_figures(q, sig)
     if not figs:
         return ""
 
+    # todas las figuras y sus umbrales en una sola consulta
+    thresholds = await afetch_figure_thresholds(figs)
+
     blocks = []
     for fig in figs:
-        fig_uri = _resolve_figure_uri_by_name(fig)
-        if not fig_uri:
-            continue
-
-        query = f"""
-        PREFIX u: <{U}>
-        SELECT ?v ?mm ?ap ?p WHERE {{
-          <{fig_uri}> u:tieneUmbral ?umb .
-          ?umb a u:UmbralPuntuacion ;
-               u:valor ?v ;
-               u:minmax ?mm ;
-               u:apartado ?ap ;
-               u:provieneDe ?frag .
-          OPTIONAL {{ ?frag u:pagina ?p . }}
-        }}
-        ORDER BY ?mm ?ap
-        """
-        rows = sparql_select(query)
+        # como antes, solo los umbrales con fragmento de procedencia
+        rows = [t for t in thresholds.get(fig.strip().lower(), {}).get("rows", []) if t["frag"]]
         if not rows:
             continue
 
         lines = [f"Figura: {fig}"]
-        for r in rows:
-            v = _fmt_num(r["v"]["value"])
-            mm = r["mm"]["value"]
-            ap = r["ap"]["value"]
-            p = r.get("p", {}).get("value", "n/a")
-            lines.append(f"- {mm} | {ap} = {v} (pág. {p})")
+        for t in rows:
+            lines.append(f"- {t['mm']} | {t['ap']} = {_fmt_num(t['v'])} (pág. {t['p']})")
         blocks.append("\n".join(lines))
 
     return "\n\n".join(blocks)
 
 
-def extract_apartado_number(q: str) -> Optional[int]:
-    m = re.search(r"\bapartado\s+(\d+)\b", (q or "").lower())
-    if not m:
-        return None
-    try:
-        return int(m.group(1))
-    except Exception:
-        return None
+def build_exact_context(q: str, sig: Optional[QuestionSignals] = None) -> str:
+    return run_sync(abuild_exact_context(q, sig))
 
 
-def wants_total_min_only(q: str) -> bool:
-    ql = (q or "").lower()
-    return ("total" in ql) and (("mínim" in ql) or ("minim" in ql))
+def extract_apartado_number(q: str, sig: Optional[QuestionSignals] = None) -> Optional[int]:
+    return _signals(q, sig).apartado
+
+
+def wants_total_min_only(q: str, sig: Optional[QuestionSignals] = None) -> bool:
+    return _signals(q, sig).wants_total_min
 
 
 # =========================
@@ -432,44 +524,70 @@ def extract_direct_answer_from_hit(hit: dict) -> str | None:
     )
 
     return answer or None
-def answer_question(question: str, debug: bool = False) -> str:
+async def _exact_fast_answer(q: str, figs: List[str], sig: QuestionSignals) -> Optional[str]:
+    """
+    Respuestas numéricas directas (mínimo total / de un apartado / de investigación).
+    La figura y los umbrales que pueden hacer falta salen de una sola consulta; se
+    responde con el primero que aplica, en el mismo orden de siempre.
+    """
+    if not figs:
+        return None
+
+    ap_n = extract_apartado_number(q, sig)
+    wanted = []
+    if wants_total_min_only(q, sig):
+        wanted.append(("total", f"{U}apartado_total", "total_min"))
+    if ap_n in APARTADO_NUM_TO_URI:
+        wanted.append(("apartado", APARTADO_NUM_TO_URI[ap_n], "apartado_min"))
+    if sig.mentions_investigacion:
+        # URI del apartado según el grafo (gazetteer), o la de siempre si no está cargado
+        gaz = gazetteer.current()
+        entity = gaz.resolve("investigación", "apartado") if gaz is not None else None
+        wanted.append(("investigacion", entity.uri if entity is not None else f"{U}apartado_investigacion", "apartado_min"))
+    if not wanted:
+        return None
+
+    name = figs[0].strip().lower()
+    entry = (await afetch_figure_thresholds([name], [ap for _, ap, _ in wanted])).get(name)
+    for kind, ap_uri, minmax in wanted:
+        val = _threshold_value(entry, ap_uri, minmax)
+        if val is None:
+            continue
+        if kind == "total":
+            return f"La puntuación mínima total para {figs[0]} es de {val} puntos."
+        if kind == "apartado":
+            return f"La puntuación mínima requerida en el apartado {ap_n} para {figs[0]} es de {val} puntos."
+        return f"La puntuación mínima requerida en el apartado de investigación para {figs[0]} es de {val} puntos."
+    return None
+
+
+async def aanswer_question(question: str, debug: bool = False) -> str:
     q = (question or "").strip()
     if not q:
         return "Por favor, escribe una pregunta."
 
-    intent = route_intent(q)
+    # todas las señales de la pregunta en una pasada; se reutilizan en cada etapa.
+    # Figuras y secciones del gazetteer ya cargado (sin ir a Fuseki): la ruta y la
+    # detección posterior ven las mismas
+    sig = question_signals(q)
+    intent = route_intent(q, sig)
 
     # ---------- EXACT ----------
     if intent == "EXACT":
-        figs = detect_figures(q)
-
-        if figs and wants_total_min_only(q):
-            fig_uri = _resolve_figure_uri_by_name(figs[0])
-            if fig_uri:
-                val = sparql_total_min_for_figure(fig_uri)
-                if val is not None:
-                    return f"La puntuación mínima total para {figs[0]} es de {val} puntos."
-
-        ap_n = extract_apartado_number(q)
-        if figs and ap_n in APARTADO_NUM_TO_URI:
-            fig_uri = _resolve_figure_uri_by_name(figs[0])
-            if fig_uri:
-                val = sparql_apartado_min_for_figure(fig_uri, APARTADO_NUM_TO_URI[ap_n])
-                if val is not None:
-                    return f"La puntuación mínima requerida en el apartado {ap_n} para {figs[0]} es de {val} puntos."
-
-        if figs and ("investigación" in q.lower() or "investigacion" in q.lower()):
-            fig_uri = _resolve_figure_uri_by_name(figs[0])
-            if fig_uri:
-                val = sparql_apartado_min_for_figure(fig_uri, f"{U}apartado_investigacion")
-                if val is not None:
-                    return f"La puntuación mínima requerida en el apartado de investigación para {figs[0]} es de {val} puntos."
-
-        structured = try_text2sparql(q)
+        # gazetteer al día con el grafo antes de detectar figuras
+        await gazetteer.aget_gazetteer()
+        figs = detect_figures(q, sig)
+
+        fast = await _exact_fast_answer(q, figs, sig)
+        if fast:
+            return fast
+
+        # text2sparql (LLM + SPARQL) y FAISS son síncronos: en un hilo aparte
+        structured = await asyncio.to_thread(try_text2sparql, q)
         if structured:
             return structured
 
-        ctx_exact = build_exact_context(q)
+        ctx_exact = await abuild_exact_context(q, sig)
         if ctx_exact:
             user_prompt = f"""
 DATOS_ONTOLOGIA:
@@ -483,9 +601,9 @@ Responde de forma clara y breve.
 No muestres URIs ni datos técnicos internos.
 Usa únicamente los datos de la ontología.
 """.strip()
-            return ollama_generate(user_prompt, system=SYSTEM_PROMPT)
+            return await aollama_generate(user_prompt, system=SYSTEM_PROMPT)
 
-        hits = retrieve_content_hits(q, k=6)
+        hits = await asyncio.to_thread(retrieve_content_hits, q, 6, sig)
         if evidence_strength(hits) < 180:
             return "No aparece en el grafo cargado."
 
@@ -507,11 +625,15 @@ Responde de forma clara y breve usando solo la evidencia.
 No muestres fragmentos brutos ni URIs.
 """.strip()
 
-        return ollama_generate(user_prompt, system=SYSTEM_PROMPT)
+        return await aollama_generate(user_prompt, system=SYSTEM_PROMPT)
 
     # ---------- SEARCH ----------
     if intent == "SEARCH":
-        hits = retrieve_section_hits(q, k=6) if is_section_query(q) else retrieve_content_hits(q, k=6)
+        hits = (
+            await aretrieve_section_hits(q, k=6, sig=sig)
+            if is_section_query(q, sig)
+            else await asyncio.to_thread(retrieve_content_hits, q, 6, sig)
+        )
 
         if evidence_strength(hits) < 180:
             return "No aparece en el grafo cargado."
@@ -541,7 +663,7 @@ No digas "he encontrado fragmentos".
 Si la evidencia no permite responder con precisión, indica que no hay información suficiente.
 """.strip()
 
-        ans = ollama_generate(user_prompt, system=SYSTEM_PROMPT)
+        ans = await aollama_generate(user_prompt, system=SYSTEM_PROMPT)
 
         if debug:
             return (
@@ -566,20 +688,26 @@ No inventes datos concretos, puntuaciones, fechas ni requisitos.
 Si la pregunta requiere información normativa exacta y no se ha recuperado evidencia, responde de forma general indicando que sería necesario consultar la normativa cargada.
 """.strip()
 
-    ans = ollama_generate(user_prompt, system=SYSTEM_PROMPT)
+    ans = await aollama_generate(user_prompt, system=SYSTEM_PROMPT)
 
     if debug:
         return (
             "--- DEBUG ---\n"
             f"intent={intent}\n"
-            f"figs={detect_figures(q)}\n"
-            f"sections={detect_sections(q)}\n"
-            f"apartado_n={extract_apartado_number(q)}\n"
+            f"figs={detect_figures(q, sig)}\n"
+            f"sections={detect_sections(q, sig)}\n"
+            f"apartado_n={extract_apartado_number(q, sig)}\n"
             "-------------\n"
             + ans
         )
 
     return ans
+
+
+def answer_question(question: str, debug: bool = False) -> str:
+    return run_sync(aanswer_question(question, debug))
+
+
 # =========================
 # Modo Terminal
 # =========================
@@ -2,16 +2,40 @@
 # -*- coding: utf-8 -*-
 
 import argparse
-import json
+import hashlib
+import itertools
 import os
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
-from sentence_transformers import SentenceTransformer
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 import faiss
 import numpy as np
-import requests
 
+from graphrag_app import embeddings, fuseki
+from graphrag_app.dedup import collapse_groups, near_duplicate_groups
+from graphrag_app.embedding_store import EMBED_STORE_ENABLED, encode_with_store
+from graphrag_app.faiss_io import (
+    INDEX_TYPES,
+    build_index,
+    parse_index_params,
+    read_index,
+    read_index_params,
+    reconstruct_ids,
+    write_index,
+)
+from graphrag_app.index_versions import current_version, new_version_dir, publish_version, version_path
+from graphrag_app.local_sparql import (
+    LOCAL_ENDPOINT,
+    LOCAL_ONTOLOGY,
+    LOCAL_TTL_DIR,
+    binding_key,
+    load_local_graph,
+    local_select,
+    sort_bindings,
+)
+from graphrag_app.meta_store import load_meta, meta_column, write_meta
 
 # ----------------------------
 # Config
@@ -19,9 +43,6 @@ import requests
 
 DEFAULT_OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
 DEFAULT_EMBED_MODEL = os.getenv("EMBED_MODEL", "nomic-embed-text")
-# Cache global para SentenceTransformers (evita recargar el modelo por cada texto)
-_ST_MODEL = None
-_ST_MODEL_NAME = None
 
 DEFAULT_FUSEKI_QUERY = os.getenv(
     "FUSEKI_QUERY_URL",
@@ -36,33 +57,50 @@ U = "http://example.org/academic-career/ontology#"
 # ----------------------------
 
 def sparql_select(endpoint: str, query: str, timeout: int = 60) -> List[dict]:
-    r = requests.post(
-        endpoint,
-        data={"query": query},
-        headers={"Accept": "application/sparql-results+json"},
-        timeout=timeout,
-    )
-    r.raise_for_status()
-    data = r.json()
-    return data["results"]["bindings"]
+    if endpoint == LOCAL_ENDPOINT:
+        # --offline: grafo rdflib en memoria con ingestion/ttl (graphrag_app/local_sparql.py)
+        return local_select(query)
+    # cliente compartido con la app: sesión con keep-alive, reintentos y GET/POST por
+    # endpoint; sin caché de resultados, cada consulta del build se hace una vez
+    return fuseki.sparql_select(query, timeout=timeout, endpoint=endpoint, cache=False)
 
 
-def local_st_embed(model_name: str, text: str):
-    """
-    Embedding local con SentenceTransformers.
-    Cachea el modelo en memoria para no recargarlo.
-    """
-    global _ST_MODEL, _ST_MODEL_NAME
+def _projected_vars(query: str) -> List[str]:
+    m = re.search(r"SELECT\s+(?:DISTINCT\s+)?(.*?)\s+WHERE", query, re.S | re.I)
+    return re.findall(r"\?(\w+)", m.group(1)) if m else []
 
-    from sentence_transformers import SentenceTransformer
 
-    if _ST_MODEL is None or _ST_MODEL_NAME != model_name:
-        _ST_MODEL = SentenceTransformer(model_name)
-        _ST_MODEL_NAME = model_name
+def sparql_pages(
+    endpoint: str,
+    query: str,
+    page_size: int,
+    timeout: int = 60,
+) -> Iterator[List[dict]]:
+    """
+    La misma SELECT por páginas (ORDER BY todas las variables + LIMIT/OFFSET), para no
+    tener la respuesta entera en memoria. El ORDER BY hace que las páginas no se solapen.
+    """
+    order_by = " ".join(f"?{v}" for v in _projected_vars(query))
+    offset = 0
+    while True:
+        page_query = f"{query.rstrip()}\nORDER BY {order_by}\nLIMIT {page_size} OFFSET {offset}\n"
+        rows = sparql_select(endpoint, page_query, timeout=timeout)
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        offset += page_size
+
+
+def sparql_rows(
+    endpoint: str,
+    query: str,
+    page_size: int = 0,
+) -> Iterable[dict]:
+    if page_size <= 0:
+        return sparql_select(endpoint, query)
+    return itertools.chain.from_iterable(sparql_pages(endpoint, query, page_size))
 
-    # normalize_embeddings=True ayuda mucho con cosine similarity / FAISS IP
-    emb = _ST_MODEL.encode([text], normalize_embeddings=True)
-    return emb[0]
 
 def normalize_ws(s: str) -> str:
     return re.sub(r"\s+", " ", (s or "").strip())
@@ -73,6 +111,31 @@ def short(s: str, n: int = 800) -> str:
     return s if len(s) <= n else s[:n].rstrip() + "…"
 
 
+def chunk_spans(text: str, size: int, overlap: int) -> List[Tuple[int, int]]:
+    """
+    Trozos [inicio, fin) de unos size caracteres que se solapan overlap caracteres,
+    cortando entre palabras. size <= 0 o un texto corto -> un único trozo.
+    """
+    if size <= 0 or len(text) <= size:
+        return [(0, len(text))]
+
+    spans = []
+    start = 0
+    while True:
+        end = min(len(text), start + size)
+        if end < len(text):
+            cut = text.rfind(" ", start + size // 2, end)
+            if cut > start:
+                end = cut
+        spans.append((start, end))
+        if end >= len(text):
+            return spans
+        nxt = max(end - overlap, start + 1)
+        # el siguiente trozo empieza al principio de una palabra
+        space = text.find(" ", nxt, end + 1)
+        start = space + 1 if space != -1 else nxt
+
+
 # ----------------------------
 # Data structures
 # ----------------------------
@@ -182,9 +245,11 @@ SELECT ?umb ?valor ?minmax ?apartado ?apartadoNombre ?frag ?pagina ?titulo ?secN
 # Build content entries
 # ----------------------------
 
-def load_fragments(fuseki_query_url: str) -> Dict[str, Fragmento]:
-    rows = sparql_select(fuseki_query_url, Q_FRAGS)
+def load_fragments(fuseki_query_url: str, rows: Optional[Iterable[dict]] = None) -> Dict[str, Fragmento]:
+    if rows is None:
+        rows = sparql_select(fuseki_query_url, Q_FRAGS)
     frags: Dict[str, Fragmento] = {}
+    first_row: Dict[str, tuple] = {}
 
     for b in rows:
         uri = b["frag"]["value"]
@@ -196,11 +261,20 @@ def load_fragments(fuseki_query_url: str) -> Dict[str, Fragmento]:
         sec_nombre = b["secNombre"]["value"] if "secNombre" in b else None
 
         # Deduplicate by URI: keep the longer texto (usually better)
+        row_key = binding_key(b)
         if uri in frags:
-            if len(texto) > len(frags[uri].texto):
-                frags[uri].texto = texto
+            f = frags[uri]
+            if (len(texto), texto) > (len(f.texto), f.texto):
+                f.texto = texto
+            # el resto de campos, de la fila menor en orden canónico: así no depende
+            # del orden en que el servidor (Fuseki o rdflib) devuelva las filas
+            if row_key < first_row[uri]:
+                first_row[uri] = row_key
+                f.pagina, f.doc_uri, f.doc_titulo = pagina, doc_uri, titulo
+                f.seccion_uri, f.seccion_nombre = sec_uri, sec_nombre
             continue
 
+        first_row[uri] = row_key
         frags[uri] = Fragmento(
             uri=uri,
             pagina=pagina,
@@ -214,8 +288,12 @@ def load_fragments(fuseki_query_url: str) -> Dict[str, Fragmento]:
     return frags
 
 
-def load_requisitos(fuseki_query_url: str, frags: Dict[str, Fragmento]) -> List[Requisito]:
-    rows = sparql_select(fuseki_query_url, Q_REQS)
+def load_requisitos(
+    fuseki_query_url: str, frags: Dict[str, Fragmento], rows: Optional[Iterable[dict]] = None
+) -> List[Requisito]:
+    if rows is None:
+        rows = sparql_select(fuseki_query_url, Q_REQS)
+    rows = sort_bindings(rows)
     reqs: List[Requisito] = []
 
     for b in rows:
@@ -253,8 +331,12 @@ def load_requisitos(fuseki_query_url: str, frags: Dict[str, Fragmento]) -> List[
     return reqs
 
 
-def load_umbrales(fuseki_query_url: str, frags: Dict[str, Fragmento]) -> List[Umbral]:
-    rows = sparql_select(fuseki_query_url, Q_UMBRALES)
+def load_umbrales(
+    fuseki_query_url: str, frags: Dict[str, Fragmento], rows: Optional[Iterable[dict]] = None
+) -> List[Umbral]:
+    if rows is None:
+        rows = sparql_select(fuseki_query_url, Q_UMBRALES)
+    rows = sort_bindings(rows)
     umbs: List[Umbral] = []
 
     for b in rows:
@@ -296,13 +378,93 @@ def load_umbrales(fuseki_query_url: str, frags: Dict[str, Fragmento]) -> List[Um
     return umbs
 
 
-def build_content_meta(frags: Dict[str, Fragmento], reqs: List[Requisito], umbs: List[Umbral]) -> List[dict]:
+def load_graph(
+    fuseki_query_url: str,
+    concurrent: bool = True,
+    page_size: int = 0,
+) -> Tuple[Dict[str, Fragmento], List[Requisito], List[Umbral], Dict[str, float]]:
+    """
+    Carga fragmentos, requisitos y umbrales. Por defecto las tres consultas van a la vez
+    por la sesión compartida de graphrag_app.fuseki; los joins con los fragmentos se hacen al tener los tres.
+    Con page_size > 0 cada consulta se pide por páginas. Devuelve también los segundos
+    de cada consulta y el total.
+    """
+    timings: Dict[str, float] = {}
+    t_start = time.perf_counter()
+
+    def fetch(name: str, query: str, consume=list):
+        t0 = time.perf_counter()
+        out = consume(sparql_rows(fuseki_query_url, query, page_size=page_size))
+        timings[name] = time.perf_counter() - t0
+        return out
+
+    # los fragmentos se consumen página a página mientras llegan
+    def fetch_frags():
+        return fetch("fragments", Q_FRAGS, lambda rows: load_fragments(fuseki_query_url, rows))
+
+    if concurrent:
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            f_frags = pool.submit(fetch_frags)
+            f_reqs = pool.submit(fetch, "requisitos", Q_REQS)
+            f_umbs = pool.submit(fetch, "umbrales", Q_UMBRALES)
+            frags, req_rows, umb_rows = f_frags.result(), f_reqs.result(), f_umbs.result()
+    else:
+        frags = fetch_frags()
+        req_rows = fetch("requisitos", Q_REQS)
+        umb_rows = fetch("umbrales", Q_UMBRALES)
+
+    reqs = load_requisitos(fuseki_query_url, frags, req_rows)
+    umbs = load_umbrales(fuseki_query_url, frags, umb_rows)
+    timings["total"] = time.perf_counter() - t_start
+    return frags, reqs, umbs, timings
+
+
+def build_content_meta(
+    frags: Dict[str, Fragmento],
+    reqs: List[Requisito],
+    umbs: List[Umbral],
+    chunk_chars: int = 0,
+    chunk_overlap: int = 0,
+    dedup_threshold: float = 0.0,
+) -> List[dict]:
+    """
+    Cards del índice de contenido. Con chunk_chars > 0 los fragmentos más largos se
+    parten en trozos solapados (uno por card, con parent_uri y span_start/span_end
+    sobre el texto normalizado); el retriever se queda con el mejor trozo de cada fragmento.
+    Con dedup_threshold > 0 las cards casi duplicadas se juntan en una (collapse_near_duplicates).
+    """
     out: List[dict] = []
 
     # Fragments (optional but useful for fallback retrieval)
-    for f in frags.values():
+    for f in sorted(frags.values(), key=lambda f: f.uri):
         doc = f.doc_titulo or ""
         sec = f.seccion_nombre or ""
+        texto = normalize_ws(f.texto)
+        spans = chunk_spans(texto, chunk_chars, chunk_overlap)
+        if len(spans) > 1:
+            for i, (start, end) in enumerate(spans):
+                text = (
+                    "TIPO: Fragmento\n"
+                    f"DOC: {doc}\n"
+                    f"SECCION: {sec}\n"
+                    f"PAGINA: {f.pagina if f.pagina is not None else ''}\n"
+                    f"TEXTO: {texto[start:end]}"
+                )
+                out.append({
+                    "kind": "frag",
+                    "frag_uri": f.uri,
+                    "parent_uri": f.uri,
+                    "chunk": str(i),
+                    "span_start": str(start),
+                    "span_end": str(end),
+                    "pagina": str(f.pagina) if f.pagina is not None else "",
+                    "doc_titulo": doc,
+                    "seccion": sec,
+                    "texto": texto[start:end],
+                    "text": text,
+                })
+            continue
+
         text = (
             "TIPO: Fragmento\n"
             f"DOC: {doc}\n"
@@ -372,9 +534,142 @@ def build_content_meta(frags: Dict[str, Fragmento], reqs: List[Requisito], umbs:
             "text": text,
         })
 
+    if dedup_threshold > 0:
+        out = collapse_near_duplicates(out, dedup_threshold)
     return out
 
 
+# ----------------------------
+# Cards casi duplicadas
+# ----------------------------
+
+def _dedup_identity(it: dict) -> str:
+    # Solo se comparan cards del mismo tipo y con los mismos datos clave: los requisitos
+    # y umbrales de una misma página comparten CONTEXTO y no por eso son el mismo dato
+    kind = it.get("kind", "")
+    if kind == "req":
+        return f"req|{normalize_ws(it.get('req_desc') or '').lower()}"
+    if kind == "umbral":
+        return f"umbral|{it.get('apartado', '')}|{it.get('valor', '')}|{it.get('minmax', '')}"
+    return kind
+
+
+def _dedup_body(it: dict) -> str:
+    # el texto de la card sin lo que cambia entre copias de una misma fuente
+    return "\n".join(
+        line for line in it.get("text", "").split("\n") if not line.startswith(("DOC:", "PAGINA:"))
+    )
+
+
+def _card_uri(it: dict) -> str:
+    return it.get("frag_uri") or it.get("req_uri") or it.get("umbral_uri") or ""
+
+
+def _card_source(it: dict) -> str:
+    doc = it.get("doc_titulo") or it.get("provieneDe") or it.get("frag_uri") or "?"
+    return f"{doc} (pág. {it['pagina']})" if it.get("pagina") else doc
+
+
+def _choose_card(cards: List[dict]) -> int:
+    # la más completa; a igualdad, la de URI menor (estable entre builds)
+    return min(range(len(cards)), key=lambda i: (-len(cards[i].get("text", "")), _card_key(cards[i])))
+
+
+def _merge_cards(card: dict, dups: List[dict]) -> None:
+    members = [card] + sorted(dups, key=_card_key)
+    card["sources"] = " | ".join(dict.fromkeys(_card_source(m) for m in members))
+    card["duplicates"] = " ".join(_card_uri(m) for m in members[1:])
+
+
+def collapse_near_duplicates(items: List[dict], threshold: float = 0.85) -> List[dict]:
+    """
+    Junta las cards casi iguales (Jaccard de shingles >= threshold, ver graphrag_app/dedup.py)
+    en una sola, con 'sources' (documento y página de cada copia) y 'duplicates'
+    (URIs de las cards quitadas). Muestra cuánto se reduce el índice.
+    """
+    partitions: Dict[str, List[int]] = {}
+    for i, it in enumerate(items):
+        partitions.setdefault(_dedup_identity(it), []).append(i)
+
+    groups: List[List[int]] = []
+    for idx in partitions.values():
+        if len(idx) > 1:
+            found = near_duplicate_groups([_dedup_body(items[i]) for i in idx], threshold)
+            groups += [[idx[j] for j in g] for g in found]
+
+    kept, removed = collapse_groups(items, groups, _choose_card, _merge_cards)
+
+    by_kind: Dict[str, int] = {}
+    for it in removed:
+        by_kind[it.get("kind", "")] = by_kind.get(it.get("kind", ""), 0) + 1
+    total_chars = sum(len(it.get("text", "")) for it in items)
+    removed_chars = sum(len(it.get("text", "")) for it in removed)
+    print(
+        f"[dedup] {len(items)} -> {len(kept)} cards ({len(groups)} grupos, "
+        f"-{100 * len(removed) / max(1, len(items)):.1f}% vectores"
+        + "".join(f", {k}: -{n}" for k, n in sorted(by_kind.items()))
+        + f"); texto duplicado fuera del índice: {removed_chars} chars "
+        f"({100 * removed_chars / max(1, total_chars):.1f}%)"
+    )
+    return kept
+
+
+# ----------------------------
+# IDs estables (build incremental)
+# ----------------------------
+
+def _card_key(it: dict) -> str:
+    uri = it.get("frag_uri") or it.get("req_uri") or it.get("umbral_uri") or ""
+    # cada trozo de un fragmento tiene su propio id (y solo se re-embebe si cambia)
+    chunk = f"#{it['chunk']}" if it.get("chunk") else ""
+    return f"{it.get('kind', '')}|{uri}{chunk}"
+
+
+def assign_card_ids(items: List[dict]) -> None:
+    """
+    Añade a cada card un card_id estable (hash de tipo + URI, int64 >= 0) y el
+    content_hash del texto que se embebe. Con ellos el siguiente build sabe qué
+    cards puede reutilizar.
+    """
+    seen: Dict[str, int] = {}
+    for it in items:
+        key = _card_key(it)
+        n = seen.get(key, 0)
+        seen[key] = n + 1
+        if n:
+            key = f"{key}|{n}"
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+        it["card_id"] = int.from_bytes(digest, "big") & 0x7FFF_FFFF_FFFF_FFFF
+        it["content_hash"] = hashlib.blake2b(it["text"].encode("utf-8"), digest_size=16).hexdigest()
+
+
+@dataclass
+class PreviousBuild:
+    index_path: str
+    info: dict
+    hashes: Dict[int, str]  # card_id -> content_hash
+
+
+def load_previous_build(out_dir: str, index_name: str, meta_name: str) -> Optional[PreviousBuild]:
+    """
+    Versión activa (CURRENT) del índice, si tiene IDs estables; None si hay que hacer build completo.
+    """
+    prev_dir = version_path(out_dir, current_version(out_dir))
+    index_path = os.path.join(prev_dir, index_name)
+    meta_path = os.path.join(prev_dir, meta_name)
+    if not (os.path.exists(index_path) and os.path.exists(meta_path)):
+        return None
+
+    info = read_index_params(index_path)
+    meta = load_meta(meta_path, mmap=False)
+    if not info.get("id_map"):
+        return None
+
+    ids = meta_column(meta, "card_id")
+    hashes = meta_column(meta, "content_hash")
+    return PreviousBuild(index_path=index_path, info=info, hashes=dict(zip(ids, hashes)))
+
+
 # ----------------------------
 # Build FAISS
 # ----------------------------
@@ -385,32 +680,96 @@ def build_faiss_index(
     embed_model: str,
     out_index_path: str,
     out_meta_path: str,
-    batch: int = 64,
-) -> None:
-
-    texts = [it["text"] for it in items]
-    embs: List[List[float]] = []
-
-    for i in range(0, len(texts), batch):
-        chunk = texts[i:i + batch]
-        for t in chunk:
-            embs.append(local_st_embed(embed_model, t))
-
-        if (i // batch) % 5 == 0:
-            print(f"[embed] {min(i+batch, len(texts))}/{len(texts)}")
-
-    X = np.array(embs, dtype="float32")
-    dim = X.shape[1]
-    index = faiss.IndexFlatIP(dim)
-    faiss.normalize_L2(X)
-    index.add(X)
-
-    faiss.write_index(index, out_index_path)
-    with open(out_meta_path, "w", encoding="utf-8") as f:
-        json.dump(items, f, ensure_ascii=False, indent=2)
-
-    print(f"[ok] wrote {out_index_path}")
+    batch: int = 32,
+    index_type: str = "flat",
+    index_params: Optional[dict] = None,
+    workers: int = 1,
+    previous: Optional[PreviousBuild] = None,
+    use_store: bool = EMBED_STORE_ENABLED,
+) -> Dict[str, int]:
+    """
+    Escribe el índice y los metadatos. Con previous (build anterior con IDs estables)
+    solo se embeben las cards nuevas o cambiadas y se borran las que ya no existen.
+    Devuelve cuántas cards se reutilizaron, añadieron, actualizaron y borraron.
+    """
+    if not any("card_id" in it for it in items):
+        assign_card_ids(items)
+
+    index_params = index_params or {}
+    model_key = embeddings.cache_key(embed_model)
+    ids = np.array([it["card_id"] for it in items], dtype="int64")
+    t0 = time.perf_counter()
+
+    def progress(done: int, total: int) -> None:
+        elapsed = time.perf_counter() - t0
+        print(f"[embed] {done}/{total} ({done / max(elapsed, 1e-9):.1f} cards/s)")
+
+    def embed(texts: List[str]) -> np.ndarray:
+        # un forward del modelo por batch (y trozos repartidos entre procesos si workers > 1);
+        # los vectores ya salen normalizados, no hace falta normalize_L2.
+        # Los textos ya embebidos en algún build anterior salen del almacén en disco
+        X = encode_with_store(
+            texts, embed_model, use_store=use_store, batch_size=batch, workers=workers, progress=progress
+        )
+        elapsed = time.perf_counter() - t0
+        print(f"[embed] {len(texts)} cards en {elapsed:.1f}s ({len(texts) / max(elapsed, 1e-9):.1f} cards/s)")
+        return X
+
+    if previous is not None and (
+        previous.info.get("type") != index_type
+        or previous.info.get("requested", {}) != index_params
+        or previous.info.get("embed_model") != model_key
+    ):
+        print("[incremental] el índice anterior usa otro modelo/tipo/parámetros: build completo")
+        previous = None
+
+    if previous is None:
+        index, info = build_index(embed([it["text"] for it in items]), index_type, index_params, ids=ids)
+        report = {"reused": 0, "added": len(items), "updated": 0, "deleted": 0}
+    else:
+        current = {int(i): it["content_hash"] for i, it in zip(ids, items)}
+        deleted = [i for i in previous.hashes if i not in current]
+        updated = [i for i, h in current.items() if i in previous.hashes and previous.hashes[i] != h]
+        added = [i for i in current if i not in previous.hashes]
+        todo = set(updated) | set(added)
+        todo_rows = [r for r, i in enumerate(ids.tolist()) if i in todo]
+
+        X_new = embed([items[r]["text"] for r in todo_rows]) if todo_rows else None
+        index = read_index(previous.index_path, mmap=False)
+        info = dict(previous.info)
+        drop = np.array(deleted + updated, dtype="int64")
+        try:
+            if len(drop):
+                index.remove_ids(faiss.IDSelectorBatch(drop))
+            if todo_rows:
+                index.add_with_ids(X_new, ids[todo_rows])
+        except RuntimeError as e:
+            # p.ej. HNSW no admite borrar: se reconstruye con los vectores ya guardados
+            print(f"[incremental] {info.get('type')} no admite actualizar en sitio ({e}); reconstruyendo sin re-embeber")
+            index = read_index(previous.index_path, mmap=False)
+            keep_rows = [r for r, i in enumerate(ids.tolist()) if i not in todo]
+            X = np.zeros((len(items), index.d), dtype="float32")
+            X[keep_rows] = reconstruct_ids(index, ids[keep_rows])
+            if todo_rows:
+                X[todo_rows] = X_new
+            index, info = build_index(X, index_type, index_params, ids=ids)
+
+        report = {"reused": len(items) - len(todo_rows), "added": len(added), "updated": len(updated), "deleted": len(deleted)}
+
+    info["ntotal"] = int(index.ntotal)
+    info["requested"] = index_params
+    info["embed_model"] = model_key
+
+    write_index(index, out_index_path, info)
+    write_meta(out_meta_path, items)
+
+    print(f"[ok] wrote {out_index_path} ({info['type']} {info['params']})")
     print(f"[ok] wrote {out_meta_path}")
+    print(
+        f"[{'incremental' if previous else 'full'}] reutilizadas: {report['reused']}, "
+        f"nuevas: {report['added']}, actualizadas: {report['updated']}, borradas: {report['deleted']}"
+    )
+    return report
 
 
 # ----------------------------
@@ -424,30 +783,59 @@ def parse_args():
     ap.add_argument("--embed_model", default=DEFAULT_EMBED_MODEL)
     ap.add_argument("--out_dir", default=".")
     ap.add_argument("--index_name", default="content.index")
-    ap.add_argument("--meta_name", default="content_meta.json")
+    ap.add_argument("--meta_name", default="content_meta.bin")
+    ap.add_argument("--keep_versions", type=int, default=3)
+    ap.add_argument("--batch_size", type=int, default=32, help="textos por forward del modelo")
+    ap.add_argument("--workers", type=int, default=1, help="procesos de encoding (1 = en este proceso)")
+    ap.add_argument("--index_type", default="flat", choices=list(INDEX_TYPES))
+    ap.add_argument("--index_param", action="append", default=[], metavar="CLAVE=VALOR",
+                    help="p.ej. --index_param M=48 --index_param efSearch=128 (ver faiss_io.INDEX_TYPES)")
+    ap.add_argument("--full", action="store_true",
+                    help="re-embeber todas las cards (por defecto solo las nuevas o cambiadas)")
+    ap.add_argument("--no_embed_store", action="store_true",
+                    help="no usar el almacén de embeddings en disco (graphrag_app/embedding_store.py)")
+    ap.add_argument("--sequential", action="store_true",
+                    help="lanzar las consultas a Fuseki una detrás de otra (por defecto van en paralelo)")
+    ap.add_argument("--page_size", type=int, default=0,
+                    help="filas por página en las consultas a Fuseki (0 = respuesta completa)")
+    ap.add_argument("--chunk_chars", type=int, default=400,
+                    help="fragmentos más largos que esto se parten en trozos solapados (0 = una card por fragmento)")
+    ap.add_argument("--chunk_overlap", type=int, default=100, help="caracteres compartidos entre trozos consecutivos")
+    ap.add_argument("--dedup_threshold", type=float, default=0.85,
+                    help="Jaccard a partir del cual dos cards se consideran la misma (0 = no deduplicar)")
+    ap.add_argument("--offline", action="store_true",
+                    help="sin Fuseki: consultas sobre --ttl_dir + --ontology cargados en memoria (rdflib)")
+    ap.add_argument("--ttl_dir", default=LOCAL_TTL_DIR)
+    ap.add_argument("--ontology", default=LOCAL_ONTOLOGY, help='"" para no cargar la ontología')
     return ap.parse_args()
 
 
 def main():
     args = parse_args()
 
-    out_index = os.path.join(args.out_dir, args.index_name)
-    out_meta = os.path.join(args.out_dir, args.meta_name)
-
-    print("[1/4] loading fragments from Fuseki…")
-    frags = load_fragments(args.fuseki_query_url)
-    print(f"  fragments: {len(frags)}")
-
-    print("[2/4] loading requisitos from Fuseki…")
-    reqs = load_requisitos(args.fuseki_query_url, frags)
-    print(f"  requisitos: {len(reqs)}")
-
-    print("[3/4] loading umbrales from Fuseki…")
-    umbs = load_umbrales(args.fuseki_query_url, frags)
-    print(f"  umbrales: {len(umbs)}")
-
-    print("[4/4] building content meta…")
-    items = build_content_meta(frags, reqs, umbs)
+    # build anterior con IDs estables: solo se embeben las cards nuevas o cambiadas
+    previous = None if args.full else load_previous_build(args.out_dir, args.index_name, args.meta_name)
+
+    # cada build va a una versión nueva; la app la recoge cuando se publica CURRENT
+    version_dir = new_version_dir(args.out_dir)
+    out_index = os.path.join(version_dir, args.index_name)
+    out_meta = os.path.join(version_dir, args.meta_name)
+
+    endpoint = args.fuseki_query_url
+    source = "Fuseki"
+    if args.offline:
+        load_local_graph(args.ttl_dir, args.ontology or None)
+        endpoint, source = LOCAL_ENDPOINT, f"{args.ttl_dir} (offline)"
+
+    mode = "sequential" if args.sequential else "concurrent"
+    print(f"[1/2] loading fragments, requisitos, umbrales from {source} ({mode})…")
+    frags, reqs, umbs, timings = load_graph(endpoint, concurrent=not args.sequential, page_size=args.page_size)
+    print(f"  fragments: {len(frags)} | requisitos: {len(reqs)} | umbrales: {len(umbs)}")
+    print("  " + " | ".join(f"{name} {secs:.2f}s" for name, secs in timings.items()))
+
+    print("[2/2] building content meta…")
+    items = build_content_meta(frags, reqs, umbs, args.chunk_chars, args.chunk_overlap, args.dedup_threshold)
+    assign_card_ids(items)
     print(f"  total items: {len(items)}")
 
     print("[build] embeddings + faiss…")
@@ -457,8 +845,17 @@ def main():
         embed_model=args.embed_model,
         out_index_path=out_index,
         out_meta_path=out_meta,
+        batch=args.batch_size,
+        index_type=args.index_type,
+        index_params=parse_index_params(args.index_param),
+        workers=args.workers,
+        previous=previous,
+        use_store=EMBED_STORE_ENABLED and not args.no_embed_store,
     )
 
+    version = publish_version(args.out_dir, version_dir, keep=args.keep_versions)
+    print(f"[ok] current version: {version}")
+
 
 if __name__ == "__main__":
     main()
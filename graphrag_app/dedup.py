@@ -0,0 +1,120 @@
+# graphrag_app/dedup.py
+"""
+Detección de cards casi duplicadas (MinHash + LSH sobre shingles de palabras).
+
+El corpus tiene fuentes repetidas (p.ej. BOE consolidado en dos ficheros, FAQ
+original y "mejorado"): sin esto salen cards con el mismo texto que llenan el
+final_k del retriever y el prompt del LLM con copias.
+"""
+
+import hashlib
+import re
+import unicodedata
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+NUM_PERM = 64
+BANDS = 16  # 16 bandas x 4 filas: pares con Jaccard >= ~0.6 casi siempre son candidatos
+SHINGLE_WORDS = 3
+
+_MERSENNE = np.uint64((1 << 61) - 1)
+_rng = np.random.default_rng(20240601)
+# a, b < 2^32 y x < 2^32: a * x + b cabe en uint64
+_A = _rng.integers(1, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+
+
+def shingles(text: str, n: int = SHINGLE_WORDS) -> np.ndarray:
+    """
+    Hashes (uint64) de los n-gramas de palabras del texto, sin tener en cuenta
+    mayúsculas ni acentos.
+    """
+    plain = unicodedata.normalize("NFKD", (text or "").lower())
+    plain = "".join(c for c in plain if not unicodedata.combining(c))
+    words = re.findall(r"\w+", plain)
+    if len(words) < n:
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = [" ".join(words[i:i + n]) for i in range(len(words) - n + 1)]
+    return np.unique(np.array(
+        [int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest(), "big") for g in grams],
+        dtype=np.uint64,
+    ))
+
+
+def minhash(sh: np.ndarray) -> np.ndarray:
+    if len(sh) == 0:
+        return np.full(NUM_PERM, np.iinfo(np.uint64).max, dtype=np.uint64)
+    # (a * x + b) mod 2^61-1, con x reducido a 32 bits
+    x = (sh & np.uint64(0xFFFFFFFF))[None, :]
+    h = (_A[:, None] * x + _B[:, None]) % _MERSENNE
+    return h.min(axis=1)
+
+
+def jaccard(a: np.ndarray, b: np.ndarray) -> float:
+    if len(a) == 0 and len(b) == 0:
+        return 1.0
+    inter = len(np.intersect1d(a, b, assume_unique=True))
+    return inter / (len(a) + len(b) - inter)
+
+
+def near_duplicate_groups(texts: List[str], threshold: float) -> List[List[int]]:
+    """
+    Grupos (índices en texts, ordenados) de textos con Jaccard >= threshold entre sí
+    (transitivo). Los candidatos salen de LSH sobre las firmas MinHash y se confirman
+    con el Jaccard exacto de los shingles.
+    """
+    sh = [shingles(t) for t in texts]
+    sigs = np.stack([minhash(s) for s in sh]) if sh else np.zeros((0, NUM_PERM), dtype=np.uint64)
+
+    parent = list(range(len(texts)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    rows = NUM_PERM // BANDS
+    checked = set()
+    for band in range(BANDS):
+        buckets: Dict[bytes, List[int]] = {}
+        for i, sig in enumerate(sigs):
+            buckets.setdefault(sig[band * rows:(band + 1) * rows].tobytes(), []).append(i)
+        for members in buckets.values():
+            for x in range(len(members)):
+                for y in range(x + 1, len(members)):
+                    i, j = members[x], members[y]
+                    if (i, j) in checked:
+                        continue
+                    checked.add((i, j))
+                    if find(i) != find(j) and jaccard(sh[i], sh[j]) >= threshold:
+                        parent[max(find(i), find(j))] = min(find(i), find(j))
+
+    groups: Dict[int, List[int]] = {}
+    for i in range(len(texts)):
+        groups.setdefault(find(i), []).append(i)
+    return [g for g in groups.values() if len(g) > 1]
+
+
+def collapse_groups(
+    items: List[dict],
+    groups: List[List[int]],
+    choose: Callable[[List[dict]], int],
+    merge: Callable[[dict, List[dict]], None],
+) -> Tuple[List[dict], List[dict]]:
+    """
+    Deja una card por grupo (la que elige choose, índice dentro del grupo) y le pasa
+    el resto con merge(card, duplicadas). Devuelve (cards que quedan, cards quitadas).
+    """
+    drop = set()
+    removed: List[dict] = []
+    for group in groups:
+        members = [items[i] for i in group]
+        keep = choose(members)
+        dups = [m for k, m in enumerate(members) if k != keep]
+        merge(members[keep], dups)
+        drop.update(i for k, i in enumerate(group) if k != keep)
+        removed.extend(dups)
+    return [it for i, it in enumerate(items) if i not in drop], removed
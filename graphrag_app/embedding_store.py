@@ -0,0 +1,238 @@
+# graphrag_app/embedding_store.py
+"""
+Almacén en disco de embeddings de los builders (content_index, index_schema),
+direccionado por contenido: (modelo, hash del texto) -> vector float16.
+
+Así un rebuild con los mismos textos (cambio de --index_type, de metadatos, --full...)
+no vuelve a pasar por el modelo. Hay un fichero por modelo/backend:
+
+  MAGIC | len(header) | header JSON | claves (n x 16 bytes, blake2b del texto)
+        | último uso (n x uint32) | vectores (n x dim float16)
+
+Se abre con mmap y se reescribe entero (tmp + os.replace) al guardar. Si supera
+EMBED_STORE_MAX_MB se descartan primero los vectores que hace más builds que no se usan.
+"""
+
+import hashlib
+import json
+import mmap as _mmap
+import os
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from graphrag_app import embeddings
+
+MAGIC = b"GREMB001"
+
+EMBED_STORE_ENABLED = os.getenv("EMBED_STORE", "1").strip().lower() not in ("0", "false", "no", "off")
+EMBED_STORE_DIR = os.getenv("EMBED_STORE_DIR", os.path.join(os.path.dirname(__file__), "embed_store"))
+EMBED_STORE_MAX_MB = float(os.getenv("EMBED_STORE_MAX_MB", "512"))
+
+
+def _align8(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def _to_f16(vecs: np.ndarray) -> np.ndarray:
+    return np.asarray(vecs, dtype=np.float32).astype(np.float16)
+
+
+def _from_f16(vecs: np.ndarray) -> np.ndarray:
+    # float16 -> float32 y se vuelve a normalizar (el redondeo mueve un poco la norma)
+    out = np.asarray(vecs, dtype=np.float32)
+    return out / np.clip(np.linalg.norm(out, axis=1, keepdims=True), 1e-12, None)
+
+
+class EmbeddingStore:
+    """
+    Vectores de un modelo (embeddings.cache_key) guardados en un fichero .emb.
+    """
+
+    def __init__(self, model_key: str, root: str = EMBED_STORE_DIR, max_mb: float = EMBED_STORE_MAX_MB):
+        self.model_key = model_key
+        self.path = os.path.join(root, re.sub(r"[^A-Za-z0-9._-]+", "_", model_key) + ".emb")
+        self.max_bytes = int(max_mb * 1024 * 1024)
+
+        self.dim = 0
+        self.generation = 0
+        self._keys = np.zeros(0, dtype="V16")
+        self._last_used = np.zeros(0, dtype=np.uint32)
+        self._vecs = np.zeros((0, 0), dtype=np.float16)
+        self._row: Dict[bytes, int] = {}
+        self._new: Dict[bytes, np.ndarray] = {}
+        self._used: set = set()
+
+        self.hits = 0
+        self.misses = 0
+
+        if os.path.exists(self.path):
+            self._open()
+
+    def _open(self) -> None:
+        with open(self.path, "rb") as f:
+            buf = _mmap.mmap(f.fileno(), 0, access=_mmap.ACCESS_READ)
+
+        if buf[:8] != MAGIC:
+            raise ValueError(f"{self.path} no es un embedding store ({MAGIC!r})")
+        header_len = int(np.frombuffer(buf, dtype=np.uint64, count=1, offset=8)[0])
+        header = json.loads(bytes(buf[16:16 + header_len]).decode("utf-8"))
+        if header["model"] != self.model_key:
+            raise ValueError(f"{self.path} es de {header['model']}, no de {self.model_key}")
+
+        start = 16 + header_len
+        n = int(header["n"])
+        self.dim = int(header["dim"])
+        self.generation = int(header["generation"])
+        self._keys = np.frombuffer(buf, dtype="V16", count=n, offset=start + header["keys"])
+        self._last_used = np.frombuffer(buf, dtype=np.uint32, count=n, offset=start + header["last_used"])
+        self._vecs = np.frombuffer(
+            buf, dtype=np.float16, count=n * self.dim, offset=start + header["vectors"]
+        ).reshape(n, self.dim)
+        self._row = {k.tobytes(): i for i, k in enumerate(self._keys)}
+
+    def __len__(self) -> int:
+        return len(self._row) + len(self._new)
+
+    def get_many(self, texts: List[str]):
+        """
+        Devuelve (vectores float32 con ceros donde no hay, índices de los textos que faltan).
+        """
+        keys = [text_key(t) for t in texts]
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        missing = []
+        for i, key in enumerate(keys):
+            new = self._new.get(key)
+            row = self._row.get(key)
+            if new is not None:
+                out[i] = new
+            elif row is not None:
+                out[i] = self._vecs[row]
+                self._used.add(key)
+            else:
+                missing.append(i)
+
+        missing_set = set(missing)
+        found = [i for i in range(len(texts)) if i not in missing_set]
+        if found:
+            out[found] = _from_f16(out[found])
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        return out, missing
+
+    def put_many(self, texts: List[str], vecs: np.ndarray) -> None:
+        vecs = _to_f16(vecs)
+        if self.dim == 0 and len(vecs):
+            self.dim = vecs.shape[1]
+        for text, vec in zip(texts, vecs):
+            self._new[text_key(text)] = vec
+
+    def save(self) -> Optional[str]:
+        """
+        Reescribe el fichero con lo nuevo, marcando como usados en este build los
+        vectores leídos o añadidos, y expulsa los más antiguos si no cabe.
+        """
+        if not self._new and not self._used:
+            return None
+
+        self.generation += 1
+        gen = self.generation
+
+        old_keep = [i for i, k in enumerate(self._keys) if k.tobytes() not in self._new]
+        old_keys = [self._keys[i].tobytes() for i in old_keep]
+        keys = old_keys + list(self._new)
+        last_used = np.array(
+            [gen if k in self._used else int(self._last_used[i]) for i, k in zip(old_keep, old_keys)]
+            + [gen] * len(self._new),
+            dtype=np.uint32,
+        )
+        parts = [np.asarray(self._vecs[old_keep], dtype=np.float16).reshape(-1, self.dim)]
+        if self._new:
+            parts.append(np.stack(list(self._new.values())))
+        vecs = np.concatenate(parts, axis=0)
+
+        # expulsión por tamaño: primero los que llevan más builds sin usarse
+        row_bytes = 16 + 4 + 2 * self.dim
+        max_rows = max(0, self.max_bytes // row_bytes)
+        if len(keys) > max_rows:
+            print(f"[embed_store] {self.path}: expulsados {len(keys) - max_rows} vectores (EMBED_STORE_MAX_MB)")
+            order = np.argsort(-last_used.astype(np.int64), kind="stable")[:max_rows]
+            order.sort()
+            keys = [keys[i] for i in order]
+            last_used = last_used[order]
+            vecs = vecs[order]
+
+        self._write(keys, last_used, vecs)
+        self._new = {}
+        self._used = set()
+        self._open()
+        return self.path
+
+    def _write(self, keys: List[bytes], last_used: np.ndarray, vecs: np.ndarray) -> None:
+        n = len(keys)
+        keys_bytes = b"".join(keys)
+        sections = [keys_bytes, last_used.tobytes(), np.ascontiguousarray(vecs, dtype=np.float16).tobytes()]
+        offsets = []
+        pos = 0
+        for data in sections:
+            offsets.append(pos)
+            pos += _align8(len(data))
+
+        header = {
+            "model": self.model_key,
+            "dim": self.dim,
+            "n": n,
+            "generation": self.generation,
+            "keys": offsets[0],
+            "last_used": offsets[1],
+            "vectors": offsets[2],
+        }
+        header_bytes = json.dumps(header).encode("utf-8")
+        header_bytes += b" " * (_align8(16 + len(header_bytes)) - 16 - len(header_bytes))
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(np.uint64(len(header_bytes)).tobytes())
+            f.write(header_bytes)
+            for data in sections:
+                f.write(data + b"\0" * (_align8(len(data)) - len(data)))
+        os.replace(tmp_path, self.path)
+
+
+def encode_with_store(
+    texts: List[str],
+    model_name: str = embeddings.MODEL_NAME,
+    use_store: bool = EMBED_STORE_ENABLED,
+    **encode_kwargs,
+) -> np.ndarray:
+    """
+    embeddings.encode_many, pero consultando antes el almacén en disco: solo se
+    codifican los textos que no están y después se guardan.
+    """
+    texts = list(texts)
+    if not use_store:
+        return embeddings.encode_many(texts, model_name, **encode_kwargs)
+
+    store = EmbeddingStore(embeddings.cache_key(model_name))
+    out, missing = store.get_many(texts)
+    print(f"[embed_store] {len(texts) - len(missing)}/{len(texts)} textos ya calculados ({store.path})")
+
+    if missing:
+        todo = [texts[i] for i in missing]
+        vecs = embeddings.encode_many(todo, model_name, **encode_kwargs)
+        store.put_many(todo, vecs)
+        if out.shape[1] == 0:
+            out = np.zeros((len(texts), vecs.shape[1]), dtype=np.float32)
+        # los vectores nuevos pasan por el mismo redondeo que los guardados,
+        # así un rebuild desde el almacén da exactamente el mismo índice
+        out[missing] = _from_f16(_to_f16(vecs))
+
+    store.save()
+    return out
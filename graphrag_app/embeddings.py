@@ -0,0 +1,267 @@
+# graphrag_app/embeddings.py
+"""
+Proveedor único de embeddings para toda la app (retriever, index_schema, content_index).
+
+El modelo no se carga al importar: se carga la primera vez que se usa (o en warmup(),
+que la web llama al arrancar) y como mucho una vez por proceso y nombre de modelo.
+
+Backends (EMBED_BACKEND):
+  torch      sentence-transformers + PyTorch (por defecto)
+  onnx       modelo exportado a ONNX (fp32) con onnxruntime + tokenizers, sin importar torch
+  onnx-int8  el mismo modelo con pesos int8 (cuantización dinámica)
+
+El modelo ONNX se genera con `python -m graphrag_app.export_onnx`.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch").strip().lower()
+BACKENDS = ("torch", "onnx", "onnx-int8")
+# Directorio con el modelo exportado (por defecto graphrag_app/models/<modelo>-onnx)
+EMBED_ONNX_DIR = os.getenv("EMBED_ONNX_DIR", "")
+EMBED_ONNX_THREADS = int(os.getenv("EMBED_ONNX_THREADS", "0"))
+
+ONNX_CONFIG_FILE = "embed_config.json"
+MODELS_DIR = os.path.join(os.path.dirname(__file__), "models")
+
+_models: Dict[tuple, object] = {}
+_load_seconds: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def default_onnx_dir(model_name: str = MODEL_NAME) -> str:
+    return os.path.join(MODELS_DIR, re.split(r"[\\/]", model_name.rstrip("/\\"))[-1] + "-onnx")
+
+
+def _backend(backend: Optional[str]) -> str:
+    backend = (backend or EMBED_BACKEND).strip().lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"EMBED_BACKEND desconocido: {backend!r} (opciones: {', '.join(BACKENDS)})")
+    return backend
+
+
+# ----------------------------
+# Backend ONNX
+# ----------------------------
+
+class OnnxEncoder:
+    """
+    Encoder ONNX con la misma interfaz que SentenceTransformer.encode:
+    tokenizer -> encoder -> mean pooling sobre la attention mask -> normalización L2.
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = False, threads: int = EMBED_ONNX_THREADS):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, ONNX_CONFIG_FILE), "r", encoding="utf-8") as f:
+            self.config = json.load(f)
+
+        variant = "int8" if quantized else "fp32"
+        filename = self.config.get("files", {}).get(variant)
+        if not filename:
+            raise FileNotFoundError(
+                f"{model_dir} no tiene modelo {variant}; vuelve a exportarlo con python -m graphrag_app.export_onnx"
+            )
+
+        self.model_name = self.config["model_name"]
+        self.max_length = int(self.config.get("max_length", 256))
+        self.input_names = list(self.config.get("inputs", ["input_ids", "attention_mask"]))
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.max_length)
+        pad = self.tokenizer.padding or {}
+        pad_token = pad.get("pad_token", "[PAD]")
+        pad_id = pad.get("pad_id", self.tokenizer.token_to_id(pad_token) or 0)
+        self.tokenizer.enable_padding(pad_id=pad_id, pad_token=pad_token)
+
+        opts = ort.SessionOptions()
+        if threads > 0:
+            opts.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, filename), sess_options=opts, providers=["CPUExecutionProvider"]
+        )
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encs = self.tokenizer.encode_batch(texts)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encs], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encs], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encs], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {n: feeds[n] for n in self.input_names})[0]
+
+        mask = feeds["attention_mask"][:, :, None].astype(np.float32)
+        summed = (hidden * mask).sum(axis=1)
+        return summed / np.clip(mask.sum(axis=1), 1e-9, None)
+
+    def encode(self, texts: List[str], normalize_embeddings: bool = True, batch_size: int = 64, **_) -> np.ndarray:
+        texts = list(texts)
+        # como sentence-transformers: por longitud, para no rellenar de más cada batch
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        out = np.zeros((len(texts), 0), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            idx = order[start:start + batch_size]
+            vecs = self._encode_batch([texts[i] for i in idx])
+            if out.shape[1] == 0:
+                out = np.zeros((len(texts), vecs.shape[1]), dtype=np.float32)
+            out[idx] = vecs
+
+        if normalize_embeddings:
+            out /= np.clip(np.linalg.norm(out, axis=1, keepdims=True), 1e-12, None)
+        return out
+
+
+# ----------------------------
+# API
+# ----------------------------
+
+def _load(model_name: str, backend: str):
+    if backend == "torch":
+        # import diferido: torch/sentence-transformers solo se importan si hace falta
+        from sentence_transformers import SentenceTransformer
+
+        return SentenceTransformer(model_name)
+
+    model_dir = EMBED_ONNX_DIR or default_onnx_dir(model_name)
+    if not os.path.exists(os.path.join(model_dir, ONNX_CONFIG_FILE)):
+        raise FileNotFoundError(
+            f"No hay modelo ONNX en {model_dir}. Genera uno con: python -m graphrag_app.export_onnx --model {model_name}"
+        )
+    encoder = OnnxEncoder(model_dir, quantized=(backend == "onnx-int8"), threads=EMBED_ONNX_THREADS)
+    if os.path.basename(encoder.model_name.rstrip("/")) != os.path.basename(model_name.rstrip("/")):
+        raise ValueError(f"{model_dir} se exportó desde {encoder.model_name}, no desde {model_name}")
+    return encoder
+
+
+def get_model(model_name: str = MODEL_NAME, backend: Optional[str] = None):
+    backend = _backend(backend)
+    key = (model_name, backend)
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    with _lock:
+        if key not in _models:
+            t0 = time.perf_counter()
+            _models[key] = _load(model_name, backend)
+            label = cache_key(model_name, backend)
+            _load_seconds[label] = time.perf_counter() - t0
+            print(f"[embeddings] {label} cargado en {_load_seconds[label]:.2f}s")
+        return _models[key]
+
+
+def cache_key(model_name: str = MODEL_NAME, backend: Optional[str] = None) -> str:
+    """
+    Nombre con el que se cachean los vectores: cada backend da vectores (ligeramente)
+    distintos, así que no comparten entradas en la caché de preguntas.
+    """
+    backend = _backend(backend)
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+
+def encode(
+    texts: List[str],
+    model_name: str = MODEL_NAME,
+    batch_size: int = 64,
+    backend: Optional[str] = None,
+) -> np.ndarray:
+    """
+    Embeddings normalizados (float32, una fila por texto).
+    """
+    texts = list(texts)
+    if not texts:
+        return np.zeros((0, 0), dtype="float32")
+    vecs = get_model(model_name, backend).encode(texts, normalize_embeddings=True, batch_size=batch_size)
+    return np.asarray(vecs, dtype="float32").reshape(len(texts), -1)
+
+
+# ----------------------------
+# Encoding masivo (builders)
+# ----------------------------
+
+def _pool_init(model_name: str, backend: str, threads: int) -> None:
+    global EMBED_ONNX_THREADS
+    # repartimos los cores entre procesos en lugar de que cada uno los use todos
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    EMBED_ONNX_THREADS = threads
+    get_model(model_name, backend)
+
+
+def _pool_encode(texts: List[str], model_name: str, batch_size: int, backend: str) -> np.ndarray:
+    return encode(texts, model_name, batch_size=batch_size, backend=backend)
+
+
+def encode_many(
+    texts: List[str],
+    model_name: str = MODEL_NAME,
+    batch_size: int = 64,
+    workers: int = 1,
+    backend: Optional[str] = None,
+    chunk_size: int = 1024,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> np.ndarray:
+    """
+    Embeddings de muchos textos (builders de índices): batches de batch_size en cada
+    forward y, con workers > 1, trozos de chunk_size repartidos entre procesos.
+    progress(hechos, total) se llama al terminar cada trozo.
+    """
+    texts = list(texts)
+    backend = _backend(backend)
+    chunks = [(start, texts[start:start + chunk_size]) for start in range(0, len(texts), chunk_size)]
+    parts: Dict[int, np.ndarray] = {}
+    done = 0
+
+    if workers <= 1 or len(chunks) <= 1:
+        for start, chunk in chunks:
+            parts[start] = encode(chunk, model_name, batch_size=batch_size, backend=backend)
+            done += len(chunk)
+            if progress:
+                progress(done, len(texts))
+    else:
+        import multiprocessing as mp
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=mp.get_context("spawn"),
+            initializer=_pool_init,
+            initargs=(model_name, backend, threads),
+        ) as pool:
+            futures = {
+                pool.submit(_pool_encode, chunk, model_name, batch_size, backend): (start, len(chunk))
+                for start, chunk in chunks
+            }
+            for fut in as_completed(futures):
+                start, n = futures[fut]
+                parts[start] = fut.result()
+                done += n
+                if progress:
+                    progress(done, len(texts))
+
+    if not parts:
+        return np.zeros((0, 0), dtype="float32")
+    return np.concatenate([parts[start] for start, _ in chunks], axis=0)
+
+
+def warmup(model_name: str = MODEL_NAME, backend: Optional[str] = None) -> float:
+    """
+    Carga el modelo y hace un encode de prueba. Devuelve los segundos empleados.
+    """
+    t0 = time.perf_counter()
+    encode(["warmup"], model_name, backend=backend)
+    return time.perf_counter() - t0
+
+
+def load_stats() -> Dict[str, float]:
+    return {name: round(secs, 3) for name, secs in _load_seconds.items()}
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Exporta el modelo de embeddings (all-MiniLM-L6-v2) a ONNX para el backend
+EMBED_BACKEND=onnx / onnx-int8 de graphrag_app.embeddings.
+
+Genera en --out:
+  model.onnx          (fp32, mismos vectores que PyTorch salvo redondeo)
+  model.int8.onnx     (pesos int8 con cuantización dinámica; más rápido y 4x más pequeño)
+  tokenizer.json      (tokenizer "fast" para la librería tokenizers)
+  embed_config.json   (modelo de origen, max_length, pooling)
+
+Solo este script necesita torch/transformers; en ejecución basta con onnxruntime + tokenizers.
+
+Uso:
+  python -m graphrag_app.export_onnx
+  python -m graphrag_app.export_onnx --model sentence-transformers/all-MiniLM-L6-v2 --out graphrag_app/models/all-MiniLM-L6-v2-onnx
+"""
+
+import argparse
+import json
+import os
+
+from graphrag_app.embeddings import MODEL_NAME, ONNX_CONFIG_FILE, default_onnx_dir
+
+
+def export(model_name: str, out_dir: str, max_length: int = 256, opset: int = 17, quantize: bool = True) -> dict:
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(out_dir, exist_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name)
+    model.eval()
+
+    # El tokenizer "fast" se guarda tal cual; truncado/padding los configura el backend
+    tokenizer.backend_tokenizer.save(os.path.join(out_dir, "tokenizer.json"))
+
+    enc = tokenizer(["ejemplo de exportación", "otro"], padding=True, return_tensors="pt")
+    input_names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in enc]
+    dynamic_axes = {n: {0: "batch", 1: "seq"} for n in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "seq"}
+
+    class Encoder(torch.nn.Module):
+        # Entradas por nombre: el orden de argumentos de forward() cambia entre versiones de transformers
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, *inputs):
+            return self.inner(**dict(zip(input_names, inputs))).last_hidden_state
+
+    fp32_path = os.path.join(out_dir, "model.onnx")
+    # Exportamos solo el encoder: el mean pooling y la normalización se hacen en numpy
+    with torch.no_grad():
+        torch.onnx.export(
+            Encoder(model),
+            tuple(enc[n] for n in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            do_constant_folding=True,
+            dynamo=False,
+        )
+    print(f"[ok] {fp32_path} ({os.path.getsize(fp32_path) / 1e6:.1f} MB)")
+
+    files = {"fp32": "model.onnx"}
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        int8_path = os.path.join(out_dir, "model.int8.onnx")
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        files["int8"] = "model.int8.onnx"
+        print(f"[ok] {int8_path} ({os.path.getsize(int8_path) / 1e6:.1f} MB)")
+
+    config = {
+        "model_name": model_name,
+        "max_length": min(max_length, tokenizer.model_max_length),
+        "pooling": "mean",
+        "normalize": True,
+        "inputs": input_names,
+        "files": files,
+    }
+    with open(os.path.join(out_dir, ONNX_CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+    return config
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Exporta el modelo de embeddings a ONNX (fp32 + int8)")
+    ap.add_argument("--model", default=MODEL_NAME, help="nombre en HuggingFace o ruta local")
+    ap.add_argument("--out", default=None, help="por defecto graphrag_app/models/<modelo>-onnx")
+    # all-MiniLM-L6-v2 se usa en sentence-transformers con max_seq_length=256
+    ap.add_argument("--max_length", type=int, default=256)
+    ap.add_argument("--opset", type=int, default=17)
+    ap.add_argument("--no_quantize", action="store_true")
+    return ap.parse_args()
+
+
+def main():
+    args = parse_args()
+    out_dir = args.out or default_onnx_dir(args.model)
+    config = export(args.model, out_dir, args.max_length, args.opset, quantize=not args.no_quantize)
+    print(f"[ok] exportado {config['model_name']} -> {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
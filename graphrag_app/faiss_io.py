@@ -0,0 +1,216 @@
+# graphrag_app/faiss_io.py
+import json
+import os
+from typing import Optional
+
+import faiss
+import numpy as np
+
+# FAISS_MMAP=1 -> los índices se abren en solo lectura y mapeados en memoria:
+# todos los workers de uvicorn comparten la misma copia en la page cache.
+FAISS_MMAP = os.getenv("FAISS_MMAP", "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _mmap_flags() -> int:
+    # IO_FLAG_MMAP_IFC mapea los códigos de los índices planos (IndexFlat*);
+    # las versiones antiguas de FAISS solo tienen IO_FLAG_MMAP (listas invertidas).
+    flag = getattr(faiss, "IO_FLAG_MMAP_IFC", None) or faiss.IO_FLAG_MMAP
+    return flag | faiss.IO_FLAG_READ_ONLY
+
+
+def read_index(path: str, mmap: bool = None):
+    """
+    Lee un índice FAISS. Con mmap=True no se copia el fichero al heap del proceso;
+    si el tipo de índice no admite mmap se cae a la lectura normal.
+    """
+    if mmap is None:
+        mmap = FAISS_MMAP
+
+    if mmap:
+        try:
+            return faiss.read_index(path, _mmap_flags())
+        except RuntimeError as e:
+            print(f"[faiss] mmap no disponible para {path} ({e}); lectura normal")
+
+    return faiss.read_index(path)
+
+
+# ----------------------------
+# Tipos de índice (ANN)
+# ----------------------------
+
+# Tipos que saben construir los builders (--index_type) y sus parámetros por defecto.
+# nlist=0 -> se calcula a partir del nº de vectores.
+INDEX_TYPES = {
+    "flat": {},
+    "hnsw": {"M": 32, "efConstruction": 200, "efSearch": 64},
+    "ivf": {"nlist": 0, "nprobe": 16},
+    "ivfpq": {"nlist": 0, "nprobe": 16, "m": 48, "nbits": 8},
+    "sq8": {},
+}
+
+# parámetros que no cambian el índice guardado sino cada búsqueda
+SEARCH_PARAMS = ("efSearch", "nprobe")
+
+
+def params_path(index_path: str) -> str:
+    """
+    Fichero con el tipo y los parámetros del índice, junto a él:
+    content.index -> content_params.json
+    """
+    return os.path.splitext(index_path)[0] + "_params.json"
+
+
+def parse_index_params(pairs) -> dict:
+    """
+    ["M=48", "efSearch=128"] -> {"M": 48, "efSearch": 128} (para --index_param).
+    """
+    out = {}
+    for pair in pairs or ():
+        key, sep, value = pair.partition("=")
+        if not sep:
+            raise ValueError(f"--index_param espera CLAVE=VALOR: {pair!r}")
+        out[key.strip()] = int(value)
+    return out
+
+
+def _auto_nlist(n: int) -> int:
+    # ~4*sqrt(n) listas, pero con al menos ~39 vectores de entrenamiento por lista
+    return max(1, min(int(4 * np.sqrt(n)), n // 39))
+
+
+def _pq_m(dim: int, m: int) -> int:
+    # nº de subcuantizadores: el divisor de dim más cercano por abajo
+    m = max(1, min(m, dim))
+    while dim % m:
+        m -= 1
+    return m
+
+
+def build_index(
+    X: np.ndarray,
+    index_type: str = "flat",
+    params: Optional[dict] = None,
+    ids: Optional[np.ndarray] = None,
+):
+    """
+    Construye un índice de producto interno (vectores ya normalizados) del tipo pedido.
+    Con ids, las búsquedas devuelven esos ids (estables entre builds) en lugar de la
+    posición, y se pueden borrar/añadir cards: los IVF guardan los ids ellos mismos y el
+    resto va envuelto en un IndexIDMap2 (que con IVF se desincroniza al borrar).
+    Devuelve (index, info) con los parámetros efectivos, que se guardan con write_index.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"index_type desconocido: {index_type} (opciones: {', '.join(INDEX_TYPES)})")
+
+    unknown = set(params or {}) - set(INDEX_TYPES[index_type])
+    if unknown:
+        raise ValueError(f"parámetros no válidos para {index_type}: {', '.join(sorted(unknown))}")
+
+    p = dict(INDEX_TYPES[index_type])
+    p.update(params or {})
+
+    X = np.ascontiguousarray(X, dtype="float32")
+    n, dim = X.shape
+    ip = faiss.METRIC_INNER_PRODUCT
+
+    if index_type == "flat":
+        index = faiss.IndexFlatIP(dim)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, p["M"], ip)
+        index.hnsw.efConstruction = p["efConstruction"]
+    elif index_type == "sq8":
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, ip)
+    else:
+        p["nlist"] = min(p["nlist"], n) if p["nlist"] else _auto_nlist(n)
+        quantizer = faiss.IndexFlatIP(dim)
+        if index_type == "ivf":
+            index = faiss.IndexIVFFlat(quantizer, dim, p["nlist"], ip)
+        else:
+            p["m"] = _pq_m(dim, p["m"])
+            # el entrenamiento de PQ necesita al menos 2^nbits vectores
+            p["nbits"] = max(1, min(p["nbits"], int(np.log2(max(2, n)))))
+            index = faiss.IndexIVFPQ(quantizer, dim, p["nlist"], p["m"], p["nbits"], ip)
+        # el wrapper de FAISS guarda una referencia al cuantizador, no hace falta retenerlo
+        p["nprobe"] = min(p["nprobe"], p["nlist"])
+        index.nprobe = p["nprobe"]
+
+    if not index.is_trained:
+        index.train(X)
+    if ids is None:
+        index.add(X)
+    else:
+        if index_type not in ("ivf", "ivfpq"):
+            # con IndexIDMap2 una búsqueda filtrada modifica params.sel mientras dura:
+            # los SearchParameters con selector no se comparten entre hilos (retriever._search)
+            index = faiss.IndexIDMap2(index)
+        index.add_with_ids(X, np.ascontiguousarray(ids, dtype="int64"))
+
+    info = {
+        "type": index_type,
+        "params": p,
+        "dim": dim,
+        "ntotal": int(index.ntotal),
+        "metric": "ip",
+        "id_map": ids is not None,
+    }
+    return index, info
+
+
+def reconstruct_ids(index, ids: np.ndarray) -> np.ndarray:
+    """
+    Vectores guardados en el índice para esos ids (exactos salvo en sq8/ivfpq).
+    """
+    if len(ids) == 0:
+        return np.zeros((0, index.d), dtype="float32")
+    if isinstance(index, faiss.IndexIVF):
+        index.make_direct_map(True, faiss.DirectMap.Hashtable)
+    return np.stack([index.reconstruct(int(i)) for i in ids]).astype("float32")
+
+
+def write_index(index, path: str, info: Optional[dict] = None) -> str:
+    """
+    Guarda el índice y, al lado, su tipo y parámetros (params_path).
+    """
+    faiss.write_index(index, path)
+    info = info or {"type": "flat", "params": {}, "dim": index.d, "ntotal": int(index.ntotal), "metric": "ip"}
+    with open(params_path(path), "w", encoding="utf-8") as f:
+        json.dump(info, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def read_index_params(index_path: str) -> dict:
+    """
+    Parámetros guardados con el índice; los índices antiguos (sin fichero) son planos.
+    """
+    try:
+        with open(params_path(index_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"type": "flat", "params": {}}
+
+
+def search_parameters(info: dict, sel=None):
+    """
+    SearchParameters de FAISS para un índice: efSearch (HNSW) o nprobe (IVF)
+    según sus parámetros guardados, más el IDSelector opcional.
+    None si no hace falta ninguno (índice plano sin filtro). Con selector, unos
+    parámetros por búsqueda: FAISS los modifica durante la búsqueda en IndexIDMap2.
+    """
+    index_type = info.get("type", "flat")
+    p = info.get("params", {})
+
+    if index_type == "hnsw":
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = int(p.get("efSearch", INDEX_TYPES["hnsw"]["efSearch"]))
+    elif index_type in ("ivf", "ivfpq"):
+        params = faiss.SearchParametersIVF()
+        params.nprobe = int(p.get("nprobe", INDEX_TYPES[index_type]["nprobe"]))
+    elif sel is not None:
+        params = faiss.SearchParameters()
+    else:
+        return None
+
+    if sel is not None:
+        params.sel = sel
+    return params
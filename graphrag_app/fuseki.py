@@ -1,38 +1,425 @@
 # graphrag_app/fuseki.py
+"""
+Cliente SPARQL de la app (y de los builders) contra Fuseki.
+
+- Implementación asíncrona (httpx.AsyncClient): asparql_select() y asparql_many()
+  para lanzar varias consultas a la vez desde código async (/chat). sparql_select()
+  es un envoltorio síncrono que ejecuta la misma corrutina en un event loop propio
+  en segundo plano, así que los dos caminos comparten pool, caché y estadísticas.
+- Pool de conexiones con keep-alive por event loop (FUSEKI_POOL_SIZE), así que cada
+  consulta no paga el establecimiento de TCP.
+- Reintentos con backoff para errores de conexión y 502/503/504 (FUSEKI_RETRIES,
+  FUSEKI_BACKOFF); las consultas son de solo lectura, así que se reintenta también POST.
+- Se recuerda por endpoint qué método funciona (GET o POST) para no repetir el
+  intento fallido en cada consulta; las consultas largas van directamente por POST
+  (FUSEKI_POST_OVER caracteres), porque no caben en una URL.
+- Latencia de cada llamada en sparql_stats() (la web la muestra en /stats).
+- Caché LRU de resultados (SPARQL_CACHE_SIZE entradas, SPARQL_CACHE_MAX_MB) con clave
+  (endpoint, consulta normalizada). El grafo solo cambia al recargar los TTL, así que
+  la caché se vacía cuando cambia la versión del dataset: nº de triples consultado cada
+  SPARQL_VERSION_SECS segundos, o invalidate_cache() (POST /reload en la web).
+  El nº de triples no ve un TTL que corrige un valor sin añadir ni quitar triples
+  (p.ej. un u:valor de 10 a 12): por eso además se vacía entera cada
+  SPARQL_MAX_AGE_SECS segundos (10 min por defecto; 0 = nunca), y con ella se recargan
+  la tabla de umbrales y el gazetteer. Tras corregir datos así, POST /reload lo
+  aplica al momento.
+"""
+
+import asyncio
 import os
-import requests
+import re
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+from typing import Awaitable, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+import httpx
 from dotenv import load_dotenv
+
 load_dotenv()
 FUSEKI_QUERY_URL = os.getenv("FUSEKI_QUERY_URL")  # debe acabar en /query
+FUSEKI_POOL_SIZE = int(os.getenv("FUSEKI_POOL_SIZE", "10"))
+FUSEKI_RETRIES = int(os.getenv("FUSEKI_RETRIES", "2"))
+FUSEKI_BACKOFF = float(os.getenv("FUSEKI_BACKOFF", "0.2"))
+FUSEKI_POST_OVER = int(os.getenv("FUSEKI_POST_OVER", "1500"))
+
+SPARQL_CACHE_SIZE = int(os.getenv("SPARQL_CACHE_SIZE", "1024"))
+SPARQL_CACHE_MAX_MB = float(os.getenv("SPARQL_CACHE_MAX_MB", "32"))
+# cada cuántos segundos se comprueba si el dataset ha cambiado (0 = solo invalidate_cache())
+SPARQL_VERSION_SECS = float(os.getenv("SPARQL_VERSION_SECS", "30"))
+# edad máxima de lo cacheado (resultados y, vía generation, tabla de umbrales y gazetteer)
+SPARQL_MAX_AGE_SECS = float(os.getenv("SPARQL_MAX_AGE_SECS", "600"))
+
+Q_DATASET_VERSION = "SELECT (COUNT(*) AS ?n) WHERE { ?s ?p ?o }"
+
 HEADERS_GET = {"Accept": "application/sparql-results+json"}
 HEADERS_POST = {
     "Accept": "application/sparql-results+json",
     "Content-Type": "application/x-www-form-urlencoded",
 }
+RETRY_STATUS = (502, 503, 504)
 
-def sparql_select(query: str, timeout: int = 30):
-    if not FUSEKI_QUERY_URL:
-        raise RuntimeError("FUSEKI_QUERY_URL no está definido en el entorno/.env")
+# un AsyncClient por event loop (no se puede compartir entre loops)
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+# endpoint -> "GET" / "POST" (el que respondió 200 la última vez)
+_methods: Dict[str, str] = {}
+
+_stats_lock = threading.Lock()
+_latencies = deque(maxlen=2000)
+_counts = {"calls": 0, "errors": 0, "get": 0, "post": 0, "fallbacks": 0, "retries": 0}
+
+T = TypeVar("T")
+
+
+def make_client(pool_size: int = FUSEKI_POOL_SIZE) -> httpx.AsyncClient:
+    limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+    return httpx.AsyncClient(limits=limits)
+
+
+def get_async_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = make_client()
+    return client
+
+
+# ----------------------------
+# Event loop de fondo para la API síncrona
+# ----------------------------
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_thread: Optional[threading.Thread] = None
+_loop_lock = threading.Lock()
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    global _loop, _loop_thread
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                _loop_thread = threading.Thread(target=loop.run_forever, name="fuseki-loop", daemon=True)
+                _loop_thread.start()
+                _loop = loop
+    return _loop
+
+
+def run_sync(coro: Awaitable[T]) -> T:
+    """
+    Ejecuta una corrutina en el event loop de fondo y espera el resultado. Sirve desde
+    cualquier hilo (los builders usan varios) salvo desde el propio loop de fondo.
+    """
+    loop = _background_loop()
+    if threading.current_thread() is _loop_thread:
+        raise RuntimeError("run_sync() llamado desde el event loop de fondo: usa await")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+
+async def _request(method: str, endpoint: str, query: str, timeout: float) -> httpx.Response:
+    client = get_async_client()
+    for attempt in range(FUSEKI_RETRIES + 1):
+        try:
+            if method == "GET":
+                r = await client.get(endpoint, params={"query": query}, headers=HEADERS_GET, timeout=timeout)
+            else:
+                r = await client.post(endpoint, data={"query": query}, headers=HEADERS_POST, timeout=timeout)
+            if r.status_code not in RETRY_STATUS or attempt == FUSEKI_RETRIES:
+                return r
+        except httpx.TransportError:
+            if attempt == FUSEKI_RETRIES:
+                raise
+        with _stats_lock:
+            _counts["retries"] += 1
+        await asyncio.sleep(FUSEKI_BACKOFF * (2 ** attempt))
+    raise AssertionError("unreachable")
+
+
+def _record(method: str, seconds: float, ok: bool, fallback: bool) -> None:
+    with _stats_lock:
+        _latencies.append(seconds)
+        _counts["calls"] += 1
+        _counts[method.lower()] += 1
+        _counts["errors"] += 0 if ok else 1
+        _counts["fallbacks"] += 1 if fallback else 0
+
+
+# ----------------------------
+# Caché de resultados
+# ----------------------------
+
+_LITERAL_RE = re.compile(r'("(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\'|<[^<>\s]*>)')
+
+
+def normalize_sparql(query: str) -> str:
+    """
+    Clave de caché de una consulta: espacios colapsados fuera de literales e IRIs
+    (dentro de un literal los espacios sí cambian el resultado).
+    """
+    parts = _LITERAL_RE.split(query or "")
+    return "".join(p if i % 2 else re.sub(r"\s+", " ", p) for i, p in enumerate(parts)).strip()
+
+
+class SparqlResultCache:
+    """
+    LRU de results.bindings por (endpoint, consulta normalizada), limitada en número de
+    entradas y en bytes (tamaño de la respuesta JSON). Cada endpoint tiene una versión del
+    dataset; si cambia, se descartan sus entradas. Además todo se descarta cuando la
+    generación actual cumple max_age segundos (expire()).
+    """
+
+    def __init__(self, max_items: int = SPARQL_CACHE_SIZE, max_mb: float = SPARQL_CACHE_MAX_MB,
+                 version_secs: float = SPARQL_VERSION_SECS, max_age: float = SPARQL_MAX_AGE_SECS):
+        self.max_items = max(0, int(max_items))
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.version_secs = version_secs
+        self.max_age = max_age
+        # inicio de la generación actual (para max_age)
+        self._since = time.monotonic()
+        # (endpoint, consulta) -> (bindings, bytes, segundos que costó la consulta)
+        self._items: "OrderedDict[Tuple[str, str], tuple]" = OrderedDict()
+        self._bytes = 0
+        self._versions: Dict[str, Optional[int]] = {}
+        self._next_probe: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.saved_seconds = 0.0
+        # sube cada vez que se descartan entradas: quien guarde datos derivados del
+        # grafo (p.ej. threshold_table) la compara para saber si tiene que recargar
+        self.generation = 0
 
-    # 1) Intento GET (muchos Fuseki lo aceptan siempre)
-    r = requests.get(
-        FUSEKI_QUERY_URL,
-        params={"query": query},
-        headers=HEADERS_GET,
-        timeout=timeout,
-    )
-    if r.status_code == 200:
-        return r.json().get("results", {}).get("bindings", [])
-
-    # 2) Si GET no vale, intento POST (algunos servidores lo exigen)
-    r2 = requests.post(
-        FUSEKI_QUERY_URL,
-        data={"query": query},
-        headers=HEADERS_POST,
-        timeout=timeout,
-    )
-    if r2.status_code == 200:
-        return r2.json().get("results", {}).get("bindings", [])
+    def get(self, endpoint: str, query: str) -> Optional[List[dict]]:
+        key = (endpoint, normalize_sparql(query))
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            self.saved_seconds += entry[2]
+            return list(entry[0])
+
+    def put(self, endpoint: str, query: str, rows: List[dict], size: int, seconds: float) -> None:
+        # una respuesta enorme (p.ej. la de un builder) no desplaza a todas las demás
+        if self.max_items == 0 or size > self.max_bytes // 8:
+            return
+        key = (endpoint, normalize_sparql(query))
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._items[key] = (list(rows), size, seconds)
+            self._bytes += size
+            while self._items and (len(self._items) > self.max_items or self._bytes > self.max_bytes):
+                _, (_, old_size, _) = self._items.popitem(last=False)
+                self._bytes -= old_size
+                self.evictions += 1
+
+    def probe_due(self, endpoint: str) -> bool:
+        """
+        True si toca volver a preguntar la versión del dataset del endpoint (una vez
+        cada version_secs; el primero que llega se encarga).
+        """
+        if self.version_secs <= 0:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_probe.get(endpoint, 0.0):
+                return False
+            self._next_probe[endpoint] = now + self.version_secs
+            return True
+
+    def set_version(self, endpoint: str, version: Optional[int]) -> None:
+        # si la versión ha cambiado, las entradas del endpoint ya no valen
+        with self._lock:
+            known = endpoint in self._versions
+            changed = self._versions.get(endpoint) != version
+            self._versions[endpoint] = version
+        if known and changed:
+            self.invalidate(endpoint)
+
+    def expire(self) -> bool:
+        """
+        Vacía la caché (nueva generación) si la actual tiene max_age segundos o más.
+        """
+        if self.max_age <= 0:
+            return False
+        with self._lock:
+            if time.monotonic() - self._since < self.max_age:
+                return False
+            # el primero que llega se encarga
+            self._since = time.monotonic()
+        self.invalidate()
+        return True
+
+    def invalidate(self, endpoint: Optional[str] = None) -> int:
+        with self._lock:
+            keys = [k for k in self._items if endpoint is None or k[0] == endpoint]
+            for key in keys:
+                self._bytes -= self._items.pop(key)[1]
+            self.invalidations += 1
+            self.generation += 1
+            self._since = time.monotonic()
+            if endpoint is None:
+                self._versions.clear()
+                self._next_probe.clear()
+            return len(keys)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._items),
+                "max_items": self.max_items,
+                "mb": round(self._bytes / (1024 * 1024), 3),
+                "max_mb": round(self.max_bytes / (1024 * 1024), 3),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "dataset_versions": dict(self._versions),
+                "generation": self.generation,
+                "max_age_secs": self.max_age,
+                # lo que habrían tardado en Fuseki las consultas servidas desde la caché
+                "saved_seconds": round(self.saved_seconds, 4),
+            }
+
+
+_cache = SparqlResultCache()
+
+
+async def adataset_version(endpoint: Optional[str] = None) -> Optional[int]:
+    """
+    Versión del dataset: el nº de triples (cambia al cargar o borrar TTL).
+    """
+    rows = (await _fetch(Q_DATASET_VERSION, 30, endpoint or FUSEKI_QUERY_URL))[0]
+    return int(rows[0]["n"]["value"]) if rows else None
+
+
+def dataset_version(endpoint: Optional[str] = None) -> Optional[int]:
+    return run_sync(adataset_version(endpoint))
+
+
+def invalidate_cache() -> int:
+    """
+    Hook de recarga: vacía la caché de resultados (p.ej. después de subir TTL nuevos).
+    Devuelve cuántas entradas se han descartado.
+    """
+    return _cache.invalidate()
+
+
+async def arefresh_version(endpoint: Optional[str] = None) -> int:
+    """
+    Comprueba la versión del dataset si toca (SPARQL_VERSION_SECS) y devuelve la
+    generación de la caché: cambia cuando el grafo ha cambiado, tras invalidate_cache()
+    o al cumplir SPARQL_MAX_AGE_SECS.
+    """
+    _cache.expire()
+    endpoint = endpoint or FUSEKI_QUERY_URL
+    if endpoint and _cache.probe_due(endpoint):
+        try:
+            _cache.set_version(endpoint, await adataset_version(endpoint))
+        except Exception as e:
+            print(f"[fuseki] no se pudo comprobar la versión del dataset: {e!r}")
+    return _cache.generation
+
+
+def _bindings(r: httpx.Response) -> List[dict]:
+    return r.json().get("results", {}).get("bindings", [])
+
+
+async def _fetch(query: str, timeout: float, endpoint: str) -> Tuple[List[dict], int]:
+    """
+    Una consulta a Fuseki sin caché. Devuelve (bindings, tamaño de la respuesta).
+    """
+    # 1) El método que ya funcionó con este endpoint (GET por defecto: muchos Fuseki
+    #    lo aceptan siempre); las consultas largas, POST directamente
+    first = "POST" if len(query) > FUSEKI_POST_OVER else _methods.get(endpoint, "GET")
+    t0 = time.perf_counter()
+    try:
+        r = await _request(first, endpoint, query, timeout)
+        if r.status_code == 200:
+            _record(first, time.perf_counter() - t0, True, False)
+            return _bindings(r), len(r.content)
+
+        # 2) Si no vale, el otro método (algunos servidores exigen POST) y se recuerda
+        second = "GET" if first == "POST" else "POST"
+        r2 = await _request(second, endpoint, query, timeout)
+    except httpx.HTTPError:
+        _record(first, time.perf_counter() - t0, False, False)
+        raise
+
+    ok = r2.status_code == 200
+    _record(second, time.perf_counter() - t0, ok, True)
+    if ok:
+        if second == "POST" or len(query) <= FUSEKI_POST_OVER:
+            _methods[endpoint] = second
+        return _bindings(r2), len(r2.content)
 
     # Si ambos fallan, muestra error útil
-    raise RuntimeError(f"Fuseki {r.status_code}/{r2.status_code}: {r.text[:300]} | {r2.text[:300]}")
\ No newline at end of file
+    raise RuntimeError(f"Fuseki {r.status_code}/{r2.status_code}: {r.text[:300]} | {r2.text[:300]}")
+
+
+async def asparql_select(
+    query: str, timeout: float = 30, endpoint: Optional[str] = None, cache: bool = True
+) -> List[dict]:
+    """
+    results.bindings de una SELECT. cache=False no consulta ni guarda en la caché de
+    resultados (los builders, que hacen cada consulta una sola vez).
+    """
+    endpoint = endpoint or FUSEKI_QUERY_URL
+    if not endpoint:
+        raise RuntimeError("FUSEKI_QUERY_URL no está definido en el entorno/.env")
+
+    if not cache:
+        return (await _fetch(query, timeout, endpoint))[0]
+
+    await arefresh_version(endpoint)
+    rows = _cache.get(endpoint, query)
+    if rows is not None:
+        return rows
+
+    t0 = time.perf_counter()
+    rows, size = await _fetch(query, timeout, endpoint)
+    _cache.put(endpoint, query, rows, size, time.perf_counter() - t0)
+    return rows
+
+
+async def asparql_many(queries: Iterable[str], **kwargs) -> List[List[dict]]:
+    """
+    Varias SELECT a la vez (limitadas por el pool); resultados en el mismo orden.
+    """
+    return list(await asyncio.gather(*(asparql_select(q, **kwargs) for q in queries)))
+
+
+def sparql_select(query: str, timeout: float = 30, endpoint: Optional[str] = None, cache: bool = True) -> List[dict]:
+    """
+    Versión síncrona de asparql_select (mismo resultado, misma caché).
+    """
+    return run_sync(asparql_select(query, timeout=timeout, endpoint=endpoint, cache=cache))
+
+
+def sparql_stats() -> Dict[str, float]:
+    """
+    Latencia de las últimas llamadas (ms) y contadores por método.
+    """
+    with _stats_lock:
+        lat = sorted(_latencies)
+        out = dict(_counts)
+    if lat:
+        out.update({
+            "p50_ms": round(1000 * lat[len(lat) // 2], 2),
+            "p95_ms": round(1000 * lat[min(len(lat) - 1, int(len(lat) * 0.95))], 2),
+            "mean_ms": round(1000 * sum(lat) / len(lat), 2),
+        })
+    out["methods"] = dict(_methods)
+    out["cache"] = _cache.stats()
+    return out
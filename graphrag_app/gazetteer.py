@@ -0,0 +1,399 @@
+# graphrag_app/gazetteer.py
+"""
+Gazetteer de figuras, apartados de evaluación y secciones, cargado del grafo.
+
+Antes app.py detectaba figuras con la lista fija de signals.FIGURE_ALIASES (que se
+desincroniza de lo que hay en el grafo) y resolvía cada nombre a URI con un
+FILTER(CONTAINS(...)) que recorría todas las figuras en Fuseki. Ahora:
+
+- Una consulta trae todas las entidades (u:nombre y nº de umbrales de cada figura).
+- Alias sin acentos ni mayúsculas: los nombres del grafo más los alias ES/EU de
+  signals.py y de este módulo.
+- detect(pregunta) recorre la pregunta una vez (n-gramas de palabras, el más largo
+  primero) y devuelve las entidades con su URI; en figuras se admite además una
+  errata (distancia de edición 1) en alias de FUZZY_MIN_CHARS caracteres o más y
+  hasta FUZZY_MAX_WORDS palabras.
+- Se vuelve a cargar cuando cambia la generación de la caché de fuseki.py (versión
+  del dataset distinta o POST /reload); una sola carga a la vez y, si falla, sin
+  reintentar hasta pasados GAZETTEER_RETRY_SECS (como threshold_table).
+"""
+
+import asyncio
+import os
+import re
+import threading
+import time
+import weakref
+from dataclasses import dataclass, replace
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from graphrag_app.fuseki import arefresh_version, asparql_select
+from graphrag_app.signals import FIGURE_ALIASES, SECTION_ALIASES, QuestionSignals, fold
+
+U = "http://example.org/academic-career/ontology#"
+
+KINDS = ("figura", "apartado", "seccion")
+
+# Tras un fallo al cargar (Fuseki caído), segundos sin volver a intentarlo
+GAZETTEER_RETRY_SECS = float(os.getenv("GAZETTEER_RETRY_SECS", "30"))
+
+Q_ENTITIES = f"""
+PREFIX u: <{U}>
+SELECT ?e ?kind ?n (COUNT(DISTINCT ?umb) AS ?nu) WHERE {{
+  VALUES (?class ?kind) {{
+    (u:Figura "figura")
+    (u:ApartadoEvaluacion "apartado")
+    (u:Seccion "seccion")
+  }}
+  ?e a ?class ;
+     u:nombre ?n .
+  OPTIONAL {{ ?e u:tieneUmbral ?umb . }}
+}}
+GROUP BY ?e ?kind ?n
+"""
+
+# Alias que no están en signals.py (euskera y apartados), por nombre canónico
+EXTRA_ALIASES = {
+    "figura": {
+        "profesorado pleno": ["irakasle osoa", "irakasle oso"],
+        "profesorado agregado": ["irakasle agregatua", "irakasle agregatu", "agregatua", "agregatu"],
+        "profesorado de investigación": ["ikerketako irakaslea", "ikerketako irakasleak", "ikerketako irakasle"],
+        "doctor investigador": ["ikertzaile doktorea", "doktore ikertzailea"],
+    },
+    "apartado": {
+        "investigación": ["investigación", "ikerketa", "ikerkuntza"],
+        "docencia": ["docencia", "irakaskuntza"],
+        "gestión": ["gestión", "kudeaketa"],
+        "formación": ["formación", "prestakuntza"],
+        "total": ["total", "totala", "guztira"],
+    },
+    "seccion": {},
+}
+
+# nombres del grafo más largos que esto (frases sacadas del texto) solo se resuelven
+# por nombre completo, no se buscan dentro de las preguntas
+MAX_ALIAS_WORDS = 6
+FUZZY_MIN_CHARS = 7
+FUZZY_MAX_WORDS = 3
+
+# Declinación vasca al final de un nombre ('irakasle osoaren', 'ikerketako'): si el
+# n-grama no es un alias, se prueba quitando uno de estos sufijos a la última palabra
+EU_SUFFIXES = ("arentzat", "rentzat", "entzat", "aren", "ren", "ari", "ak", "ek", "ko", "en", "an", "a", "k", "n")
+MIN_STEM_CHARS = 4
+
+
+def norm(text: str) -> str:
+    # 'Profesorado  de Investigación.' -> 'profesorado de investigacion'
+    return " ".join(re.findall(r"\w+", fold(text)))
+
+
+def _deletes(s: str) -> Set[str]:
+    return {s[:i] + s[i + 1:] for i in range(len(s))}
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    # Damerau-Levenshtein <= 1 (sustitución, inserción, borrado o trasposición)
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la == lb:
+        diff = [i for i in range(la) if a[i] != b[i]]
+        if len(diff) == 1:
+            return True
+        return len(diff) == 2 and diff[1] == diff[0] + 1 and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]]
+    if la > lb:
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+
+@dataclass(frozen=True)
+class Entity:
+    uri: str
+    kind: str       # "figura" | "apartado" | "seccion"
+    label: str      # nombre para mostrar (el canónico de los alias si lo tiene)
+    weight: int     # nº de umbrales: entre figuras con el mismo nombre gana la que tiene datos
+
+
+@dataclass(frozen=True)
+class Mention:
+    entity: Entity
+    start: int      # posición (en palabras) dentro de la pregunta
+    alias: str
+    fuzzy: bool
+
+
+class Gazetteer:
+    def __init__(self, rows: Iterable[dict], generation: int = 0, load_seconds: float = 0.0):
+        self.generation = generation
+        self.load_seconds = load_seconds
+
+        names: Dict[str, List[str]] = {}
+        meta: Dict[str, Tuple[str, int]] = {}
+        for r in rows:
+            uri = r["e"]["value"]
+            names.setdefault(uri, []).append(r["n"]["value"].strip())
+            weight = int(r.get("nu", {}).get("value", 0) or 0)
+            meta[uri] = (r["kind"]["value"], max(weight, meta.get(uri, ("", 0))[1]))
+
+        # alias canónicos -> entidades del grafo (nombre igual o, si no hay, que lo contiene)
+        curated: Dict[str, Dict[str, List[str]]] = {
+            "figura": {k: list(v) for k, v in FIGURE_ALIASES.items()},
+            "apartado": {},
+            "seccion": {k: list(v) for k, v in SECTION_ALIASES.items()},
+        }
+        for kind, extra in EXTRA_ALIASES.items():
+            for canon, aliases in extra.items():
+                curated[kind].setdefault(canon, []).extend(aliases)
+
+        labels: Dict[str, str] = {}
+        curated_aliases: Dict[str, Set[str]] = {}
+        for kind, table in curated.items():
+            for canon, aliases in table.items():
+                key = norm(canon)
+                same = [u for u, (k, _) in meta.items() if k == kind and any(norm(n) == key for n in names[u])]
+                linked = same or [u for u, (k, _) in meta.items() if k == kind and any(key in norm(n) for n in names[u])]
+                for uri in linked:
+                    labels.setdefault(uri, canon)
+                    curated_aliases.setdefault(uri, set()).update(norm(a) for a in aliases + [canon])
+
+        self.entities: Dict[str, Entity] = {}
+        for uri, (kind, weight) in meta.items():
+            label = labels.get(uri) or min(names[uri], key=len).lower()
+            self.entities[uri] = Entity(uri=uri, kind=kind, label=label, weight=weight)
+
+        # alias -> entidades, la preferida primero; full_names también con los nombres largos
+        self._aliases: Dict[str, List[Entity]] = {}
+        self._full_names: Dict[str, List[Entity]] = {}
+        for uri, entity in self.entities.items():
+            for name in set(norm(n) for n in names[uri]) | curated_aliases.get(uri, set()):
+                if not name:
+                    continue
+                self._full_names.setdefault(name, []).append(entity)
+                if len(name.split()) <= MAX_ALIAS_WORDS:
+                    self._aliases.setdefault(name, []).append(entity)
+        for table in (self._aliases, self._full_names):
+            for alias in table:
+                table[alias].sort(key=lambda e: (-e.weight, e.uri))
+
+        self.max_words = max((len(a.split()) for a in self._aliases), default=1)
+
+        # borrados de un carácter de los alias de figuras largos: erratas en una pasada
+        self._fuzzy: Dict[str, Set[str]] = {}
+        for alias, entities in self._aliases.items():
+            if len(alias) >= FUZZY_MIN_CHARS and any(e.kind == "figura" for e in entities):
+                self._fuzzy.setdefault(alias, set()).add(alias)
+                for d in _deletes(alias):
+                    self._fuzzy.setdefault(d, set()).add(alias)
+
+        self._detect_cache: Dict[str, Tuple[Mention, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self.entities)
+
+    def _fuzzy_alias(self, key: str) -> Optional[str]:
+        candidates: Set[str] = set()
+        for variant in _deletes(key) | {key}:
+            candidates |= self._fuzzy.get(variant, set())
+        best = sorted(a for a in candidates if _within_one_edit(key, a))
+        return best[0] if best else None
+
+    def _exact_alias(self, key: str) -> Optional[str]:
+        if key in self._aliases:
+            return key
+        head, _, last = key.rpartition(" ")
+        for suffix in EU_SUFFIXES:
+            if last.endswith(suffix) and len(last) - len(suffix) >= MIN_STEM_CHARS:
+                stem = (head + " " if head else "") + last[:-len(suffix)]
+                if stem in self._aliases:
+                    return stem
+        return None
+
+    def _scan(self, words: List[str], fuzzy_figures: bool) -> List[Mention]:
+        mentions: List[Mention] = []
+        i = 0
+        while i < len(words):
+            for n in range(min(self.max_words, len(words) - i), 0, -1):
+                key = " ".join(words[i:i + n])
+                alias, fuzzy = self._exact_alias(key), False
+                if alias is None:
+                    if not fuzzy_figures or len(key) < FUZZY_MIN_CHARS or n > FUZZY_MAX_WORDS:
+                        continue
+                    alias, fuzzy = self._fuzzy_alias(key), True
+                    if alias is None:
+                        continue
+                # la errata solo vale para figuras
+                entities = [e for e in self._aliases[alias] if not fuzzy or e.kind == "figura"]
+                if not entities:
+                    continue
+                seen_kinds = set()
+                for e in entities:
+                    # una entidad por tipo: la preferida (más umbrales, URI menor)
+                    if e.kind not in seen_kinds:
+                        seen_kinds.add(e.kind)
+                        mentions.append(Mention(entity=e, start=i, alias=alias, fuzzy=fuzzy))
+                i += n
+                break
+            else:
+                i += 1
+        return mentions
+
+    def detect(self, question: str) -> Tuple[Mention, ...]:
+        """
+        Entidades mencionadas en la pregunta, en orden de aparición. En cada posición
+        gana el alias más largo (así 'profesorado de investigación' es una figura y no
+        el apartado 'investigación'). Si no aparece ninguna figura tal cual, se hace
+        una segunda pasada admitiendo erratas en los nombres de figuras.
+        """
+        cached = self._detect_cache.get(question)
+        if cached is not None:
+            return cached
+
+        words = norm(question).split()
+        mentions = self._scan(words, fuzzy_figures=False)
+        if not any(m.entity.kind == "figura" for m in mentions):
+            mentions = self._scan(words, fuzzy_figures=True)
+
+        out = tuple(mentions)
+        if len(self._detect_cache) > 4096:
+            self._detect_cache.clear()
+        self._detect_cache[question] = out
+        return out
+
+    def detect_kind(self, question: str, kind: str) -> List[Entity]:
+        """
+        Entidades de un tipo, sin repetir. Las figuras con umbrales van primero (son
+        las que el camino EXACT puede responder); después, orden de aparición.
+        """
+        seen: Dict[str, Tuple[int, Entity]] = {}
+        for m in self.detect(question):
+            if m.entity.kind == kind and m.entity.uri not in seen:
+                seen[m.entity.uri] = (m.start, m.entity)
+        ordered = sorted(seen.values(), key=lambda t: t[0])
+        if kind == "figura":
+            ordered.sort(key=lambda t: t[1].weight == 0)
+        return [e for _, e in ordered]
+
+    def resolve(self, name: str, kind: str) -> Optional[Entity]:
+        """
+        Nombre -> entidad, sin ir a Fuseki: alias o nombre completo exacto, después
+        una errata (figuras) y por último la que contiene el nombre (como el CONTAINS
+        de antes).
+        """
+        key = norm(name)
+        if not key:
+            return None
+        for table, k in ((self._aliases, self._exact_alias(key)), (self._full_names, key)):
+            hit = [e for e in table.get(k, []) if e.kind == kind] if k else []
+            if hit:
+                return hit[0]
+        if kind == "figura" and len(key) >= FUZZY_MIN_CHARS:
+            alias = self._fuzzy_alias(key)
+            hit = [e for e in self._aliases.get(alias, []) if e.kind == kind] if alias else []
+            if hit:
+                return hit[0]
+        contains = sorted(
+            {e for full, ents in self._full_names.items() if key in full for e in ents if e.kind == kind},
+            key=lambda e: (-e.weight, e.uri),
+        )
+        return contains[0] if contains else None
+
+
+_gazetteer: Optional[Gazetteer] = None
+_lock = threading.Lock()
+# una sola carga a la vez (por event loop: la web y el de fondo de fuseki.run_sync)
+_load_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+# (generación, instante) del último fallo: hasta entonces no se reintenta esa generación
+_failed: Tuple[int, float] = (-1, 0.0)
+_stats = {"loads": 0, "load_errors": 0}
+
+
+def _load_lock() -> asyncio.Lock:
+    loop = asyncio.get_running_loop()
+    lock = _load_locks.get(loop)
+    if lock is None:
+        lock = _load_locks[loop] = asyncio.Lock()
+    return lock
+
+
+def _usable(gaz: Optional[Gazetteer], generation: int) -> bool:
+    # al día, o la carga de esta generación falló hace poco: se sigue con el que hay
+    if gaz is not None and gaz.generation == generation:
+        return True
+    failed_generation, retry_at = _failed
+    return failed_generation == generation and time.monotonic() < retry_at
+
+
+async def aget_gazetteer() -> Optional[Gazetteer]:
+    """
+    El gazetteer actual, recargado si el grafo ha cambiado desde que se cargó. None si
+    Fuseki no responde y no hay ninguno anterior.
+    """
+    global _gazetteer, _failed
+    generation = await arefresh_version()
+    if _usable(_gazetteer, generation):
+        return _gazetteer
+
+    async with _load_lock():
+        # mientras esperábamos otra petición puede haberlo cargado (o haber fallado)
+        gaz = _gazetteer
+        if _usable(gaz, generation):
+            return gaz
+
+        t0 = time.perf_counter()
+        try:
+            rows = await asparql_select(Q_ENTITIES, cache=False)
+        except Exception as e:
+            with _lock:
+                _stats["load_errors"] += 1
+                _failed = (generation, time.monotonic() + GAZETTEER_RETRY_SECS)
+            print(f"[gazetteer] no se pudo cargar: {e!r}; reintento en {GAZETTEER_RETRY_SECS:.0f}s")
+            return gaz
+
+        gaz = Gazetteer(rows, generation, time.perf_counter() - t0)
+        with _lock:
+            _gazetteer = gaz
+            _failed = (-1, 0.0)
+            _stats["loads"] += 1
+    counts = {k: sum(1 for e in gaz.entities.values() if e.kind == k) for k in KINDS}
+    print(f"[gazetteer] {counts} en {gaz.load_seconds:.3f}s (generación {generation})")
+    return gaz
+
+
+def current() -> Optional[Gazetteer]:
+    """
+    El último gazetteer cargado, sin comprobar la versión (para código síncrono que
+    no puede esperar a Fuseki; app.aanswer_question lo refresca antes).
+    """
+    return _gazetteer
+
+
+def with_entities(sig: QuestionSignals) -> QuestionSignals:
+    """
+    sig con las figuras y secciones que detecta el gazetteer actual en la pregunta, en
+    lugar de las de las listas fijas de signals.py; así la ruta (section_query, route) y
+    app.detect_figures / detect_sections salen de la misma detección. Sin gazetteer
+    cargado, sig tal cual.
+    """
+    gaz = _gazetteer
+    if gaz is None:
+        return sig
+    return replace(
+        sig,
+        figures=tuple(e.label for e in gaz.detect_kind(sig.question, "figura")),
+        sections=tuple(e.label for e in gaz.detect_kind(sig.question, "seccion")),
+    )
+
+
+def gazetteer_stats() -> Dict[str, object]:
+    gaz = _gazetteer
+    with _lock:
+        out = dict(_stats)
+    if gaz is not None:
+        out.update({k: sum(1 for e in gaz.entities.values() if e.kind == k) for k in KINDS})
+        out.update({"generation": gaz.generation, "load_seconds": round(gaz.load_seconds, 4)})
+    return out
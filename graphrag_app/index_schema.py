@@ -1,99 +1,175 @@
-import json
+import argparse
 import os
 import re
-from typing import List, Dict, Tuple
+from typing import Callable, List, Dict, Tuple
 import numpy as np
-import faiss
-from sentence_transformers import SentenceTransformer
+from rdflib import OWL, RDF, RDFS, Graph, URIRef
+from graphrag_app import embeddings
+from graphrag_app.embedding_store import EMBED_STORE_ENABLED, encode_with_store
+from graphrag_app.faiss_io import INDEX_TYPES, build_index, parse_index_params, write_index
 from graphrag_app.fuseki import sparql_select
+from graphrag_app.index_versions import new_version_dir, publish_version
+from graphrag_app.local_sparql import LOCAL_ONTOLOGY, LOCAL_TTL_DIR, load_local_graph, local_select
+from graphrag_app.meta_store import write_meta
 
 ONT_NS = "http://example.org/academic-career/ontology#"
 
-PREFIXES = f"""
-PREFIX rdf:  <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-PREFIX owl:  <http://www.w3.org/2002/07/owl#>
-PREFIX u:    <{ONT_NS}>
-"""
-
-model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+MODEL_NAME = embeddings.MODEL_NAME
 
 def local_name(uri: str) -> str:
     return re.split(r"[#/]", uri.rstrip("/"))[-1]
 
-def embed_texts(texts: List[str]) -> np.ndarray:
-    vectors = model.encode(texts, normalize_embeddings=True)
-    return np.array(vectors, dtype="float32")
-
-def fetch_schema_cards(limit: int = 5000) -> List[Dict]:
-    # Clases declaradas (TBox)
-    q_classes_decl = PREFIXES + f"""
-    SELECT DISTINCT ?uri WHERE {{
-      ?uri a owl:Class .
-      FILTER(STRSTARTS(STR(?uri), "{ONT_NS}"))
-    }}
-    LIMIT {limit}
-    """
+def embed_texts(texts: List[str], use_store: bool = EMBED_STORE_ENABLED) -> np.ndarray:
+    # los textos ya embebidos en builds anteriores salen del almacén en disco
+    return encode_with_store(texts, MODEL_NAME, use_store=use_store)
 
-    # Tipos usados en instancias (ABox) - útil como complemento
-    q_classes_used = PREFIXES + f"""
-    SELECT DISTINCT ?uri WHERE {{
-      ?s a ?uri .
-      FILTER(STRSTARTS(STR(?uri), "{ONT_NS}"))
-    }}
-    LIMIT {limit}
-    """
+# Uso de cada predicado en los datos: una sola agregación, que devuelve una fila por
+# predicado (unas decenas) por mucho que crezcan las instancias
+Q_PREDICATE_USAGE = """
+SELECT ?p (COUNT(*) AS ?n) WHERE { ?s ?p ?o } GROUP BY ?p
+"""
 
-    # Propiedades declaradas (TBox)
-    q_props_decl = PREFIXES + f"""
-    SELECT DISTINCT ?uri WHERE {{
-      ?uri a rdf:Property .
-      FILTER(STRSTARTS(STR(?uri), "{ONT_NS}"))
-    }}
-    LIMIT {limit}
-    """
+_CLASS_TYPES = (OWL.Class, RDFS.Class)
+_PROPERTY_TYPES = {
+    OWL.ObjectProperty: "objeto",
+    OWL.DatatypeProperty: "dato",
+    OWL.AnnotationProperty: "anotación",
+    RDF.Property: "",
+}
+
+
+def _label(g: Graph, uri: URIRef) -> str:
+    labels = sorted(str(l) for l in g.objects(uri, RDFS.label))
+    es = [str(l) for l in g.objects(uri, RDFS.label) if getattr(l, "language", None) == "es"]
+    return (sorted(es) or labels or [local_name(str(uri)).replace("_", " ")])[0]
 
-    # Predicados usados (ABox) - complemento
-    q_props_used = PREFIXES + f"""
-    SELECT DISTINCT ?uri WHERE {{
-      ?s ?uri ?o .
-      FILTER(?uri != rdf:type)
-      FILTER(STRSTARTS(STR(?uri), "{ONT_NS}"))
-    }}
-    LIMIT {limit}
+
+def _names(g: Graph, uri: URIRef, pred) -> List[str]:
+    return sorted(local_name(str(o)) for o in g.objects(uri, pred) if isinstance(o, URIRef))
+
+
+def load_ontology_schema(path: str = LOCAL_ONTOLOGY) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Clases y propiedades del namespace de la ontología, leídas del fichero RDF (TBox):
+    etiqueta, comentario, superclases, dominio y rango. Las marcadas owl:deprecated no se incluyen.
     """
+    g = Graph()
+    g.parse(path)
+
+    def deprecated(uri) -> bool:
+        return any(str(o).lower() == "true" for o in g.objects(uri, OWL.deprecated))
+
+    classes = {}
+    for t in _CLASS_TYPES:
+        for uri in g.subjects(RDF.type, t):
+            if isinstance(uri, URIRef) and str(uri).startswith(ONT_NS) and not deprecated(uri):
+                classes[str(uri)] = {
+                    "uri": str(uri),
+                    "label": _label(g, uri),
+                    "comment": " ".join(sorted(str(c) for c in g.objects(uri, RDFS.comment))),
+                    "parents": _names(g, uri, RDFS.subClassOf),
+                }
+
+    props = {}
+    for t, prop_type in _PROPERTY_TYPES.items():
+        for uri in g.subjects(RDF.type, t):
+            if not isinstance(uri, URIRef) or not str(uri).startswith(ONT_NS) or deprecated(uri):
+                continue
+            prev = props.get(str(uri))
+            props[str(uri)] = {
+                "uri": str(uri),
+                "label": _label(g, uri),
+                "comment": " ".join(sorted(str(c) for c in g.objects(uri, RDFS.comment))),
+                "prop_type": (prev or {}).get("prop_type") or prop_type,
+                "domain": _names(g, uri, RDFS.domain),
+                "range": _names(g, uri, RDFS.range),
+            }
+
+    return [classes[u] for u in sorted(classes)], [props[u] for u in sorted(props)]
+
+
+def fetch_predicate_usage(select: Callable[[str], List[dict]] = sparql_select) -> Dict[str, int]:
+    return {
+        b["p"]["value"]: int(b["n"]["value"])
+        for b in select(Q_PREDICATE_USAGE)
+        if b["p"]["value"].startswith(ONT_NS)
+    }
+
+
+def fetch_schema_cards(
+    select: Callable[[str], List[dict]] = sparql_select,
+    ontology: str = LOCAL_ONTOLOGY,
+) -> List[Dict]:
+    """
+    Cards de clases y propiedades: el esquema sale del fichero de la ontología y de los
+    datos (select: Fuseki por defecto o local_sparql.local_select con --offline) solo
+    el nº de usos de cada predicado. Los predicados usados que no están en la ontología
+    también tienen card.
+    """
+    classes, props = load_ontology_schema(ontology)
+    usage = fetch_predicate_usage(select)
 
-    classes = []
-    for q in (q_classes_decl, q_classes_used):
-        classes += sparql_select(q)
+    declared = {p["uri"] for p in props}
+    for uri in sorted(set(usage) - declared):
+        props.append({
+            "uri": uri, "label": local_name(uri).replace("_", " "), "comment": "",
+            "prop_type": "", "domain": [], "range": [],
+        })
 
-    props = []
-    for q in (q_props_decl, q_props_used):
-        props += sparql_select(q)
+    class_props: Dict[str, List[str]] = {}
+    for p in props:
+        for d in p["domain"]:
+            class_props.setdefault(d, []).append(local_name(p["uri"]))
 
-    # dedupe
-    seen = set()
     cards = []
-
-    for b in classes:
-        uri = b["uri"]["value"]
-        if uri in seen: 
-            continue
-        seen.add(uri)
-        label = local_name(uri).replace("_", " ")
-        cards.append({"kind": "class", "uri": uri, "label": label, "text": f"CLASE: {label}\nURI: {uri}"})
-
-    for b in props:
-        uri = b["uri"]["value"]
-        if uri in seen:
-            continue
-        seen.add(uri)
-        label = local_name(uri).replace("_", " ")
-        cards.append({"kind": "property", "uri": uri, "label": label, "text": f"PROPIEDAD: {label}\nURI: {uri}"})
+    for c in classes:
+        lines = [f"CLASE: {c['label']}", f"URI: {c['uri']}"]
+        if c["parents"]:
+            lines.append(f"SUBCLASE DE: {', '.join(c['parents'])}")
+        own = class_props.get(local_name(c["uri"]), [])
+        if own:
+            lines.append(f"PROPIEDADES: {', '.join(own)}")
+        if c["comment"]:
+            lines.append(f"DESCRIPCION: {c['comment']}")
+        cards.append({
+            "kind": "class",
+            "uri": c["uri"],
+            "label": c["label"],
+            "parents": ", ".join(c["parents"]),
+            "text": "\n".join(lines),
+        })
+
+    for p in props:
+        lines = [f"PROPIEDAD: {p['label']}", f"URI: {p['uri']}"]
+        if p["prop_type"]:
+            lines.append(f"TIPO: {p['prop_type']}")
+        if p["domain"]:
+            lines.append(f"DOMINIO: {', '.join(p['domain'])}")
+        if p["range"]:
+            lines.append(f"RANGO: {', '.join(p['range'])}")
+        if p["comment"]:
+            lines.append(f"DESCRIPCION: {p['comment']}")
+        # el nº de usos va solo en el meta: si fuera en el texto, cada carga de datos
+        # cambiaría los embeddings del esquema
+        cards.append({
+            "kind": "property",
+            "uri": p["uri"],
+            "label": p["label"],
+            "domain": ", ".join(p["domain"]),
+            "range": ", ".join(p["range"]),
+            "usage": str(usage.get(p["uri"], 0)),
+            "text": "\n".join(lines),
+        })
 
     return cards
 
-def build_faiss_index(cards: List[Dict], out_dir: str = None) -> Tuple[str, str]:
+def build_faiss_index(
+    cards: List[Dict],
+    out_dir: str = None,
+    index_type: str = "flat",
+    index_params: Dict = None,
+    use_store: bool = EMBED_STORE_ENABLED,
+) -> Tuple[str, str]:
     if out_dir is None:
         out_dir = os.path.join("graphrag_app", "index_schema")
 
@@ -101,18 +177,41 @@ def build_faiss_index(cards: List[Dict], out_dir: str = None) -> Tuple[str, str]
     if not cards:
         return "", ""
 
-    vectors = embed_texts([c["text"] for c in cards])
-    index = faiss.IndexFlatIP(vectors.shape[1])
-    index.add(vectors)
+    vectors = embed_texts([c["text"] for c in cards], use_store)
+    index, info = build_index(vectors, index_type, index_params)
 
-    i_path = os.path.join(out_dir, "schema.faiss")
-    m_path = os.path.join(out_dir, "schema_meta.json")
-    faiss.write_index(index, i_path)
-    with open(m_path, "w", encoding="utf-8") as f:
-        json.dump(cards, f, ensure_ascii=False, indent=2)
+    # se escribe en una versión nueva y se publica al final (la app la recarga sola)
+    version_dir = new_version_dir(out_dir)
+    i_path = os.path.join(version_dir, "schema.faiss")
+    m_path = os.path.join(version_dir, "schema_meta.bin")
+    write_index(index, i_path, info)
+    write_meta(m_path, cards)
+    publish_version(out_dir, version_dir)
     return i_path, m_path
 
+def parse_args():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--out_dir", default=None)
+    ap.add_argument("--index_type", default="flat", choices=list(INDEX_TYPES))
+    ap.add_argument("--index_param", action="append", default=[], metavar="CLAVE=VALOR")
+    ap.add_argument("--no_embed_store", action="store_true")
+    ap.add_argument("--offline", action="store_true", help="sin Fuseki: --ttl_dir + --ontology en memoria (rdflib)")
+    ap.add_argument("--ttl_dir", default=LOCAL_TTL_DIR)
+    ap.add_argument("--ontology", default=LOCAL_ONTOLOGY, help="fichero RDF del que sale el esquema")
+    return ap.parse_args()
+
 if __name__ == "__main__":
-    cards = fetch_schema_cards()
-    ip, mp = build_faiss_index(cards)
+    args = parse_args()
+    if args.offline:
+        load_local_graph(args.ttl_dir, args.ontology)
+        cards = fetch_schema_cards(select=local_select, ontology=args.ontology)
+    else:
+        cards = fetch_schema_cards(ontology=args.ontology)
+    ip, mp = build_faiss_index(
+        cards,
+        args.out_dir,
+        args.index_type,
+        parse_index_params(args.index_param),
+        use_store=EMBED_STORE_ENABLED and not args.no_embed_store,
+    )
     print(f"✅ Esquema actualizado: {len(cards)} elementos en {ip}")
@@ -0,0 +1,81 @@
+# graphrag_app/index_versions.py
+"""
+Directorios de índice versionados.
+
+  index_content/
+    CURRENT                      <- nombre de la versión activa (se cambia con os.replace, atómico)
+    versions/20250301-101500-123456/content.index
+    versions/20250301-101500-123456/content_meta.bin
+    ...
+
+Los builders escriben siempre en una versión nueva y solo al final apuntan CURRENT a ella,
+así la app nunca ve un índice a medio escribir. Si no hay CURRENT se usan los ficheros
+sueltos del directorio (layout antiguo).
+"""
+
+import os
+import shutil
+import uuid
+from datetime import datetime
+from typing import List, Optional
+
+CURRENT_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+
+
+def new_version_dir(index_dir: str) -> str:
+    name = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    path = os.path.join(index_dir, VERSIONS_DIR, name)
+    os.makedirs(path, exist_ok=False)
+    return path
+
+
+def list_versions(index_dir: str) -> List[str]:
+    root = os.path.join(index_dir, VERSIONS_DIR)
+    if not os.path.isdir(root):
+        return []
+    return sorted(d for d in os.listdir(root) if os.path.isdir(os.path.join(root, d)))
+
+
+def current_version(index_dir: str) -> Optional[str]:
+    try:
+        with open(os.path.join(index_dir, CURRENT_FILE), "r", encoding="utf-8") as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return name or None
+
+
+def version_path(index_dir: str, version: Optional[str]) -> str:
+    """
+    Directorio con los ficheros de una versión (o el propio index_dir si version es None).
+    """
+    if not version:
+        return index_dir
+    return os.path.join(index_dir, VERSIONS_DIR, version)
+
+
+def publish_version(index_dir: str, version_dir: str, keep: int = 3) -> str:
+    """
+    Marca version_dir como versión activa de forma atómica y borra las más antiguas
+    (se conservan las `keep` últimas, además de la activa).
+    """
+    name = os.path.basename(os.path.normpath(version_dir))
+    # temporal con nombre propio: dos builders publicando a la vez no se pisan el fichero
+    tmp_path = os.path.join(index_dir, f"{CURRENT_FILE}.{os.getpid()}.{uuid.uuid4().hex}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(name + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    try:
+        os.replace(tmp_path, os.path.join(index_dir, CURRENT_FILE))
+    except OSError:
+        os.unlink(tmp_path)
+        raise
+
+    if keep > 0:
+        for old in list_versions(index_dir)[:-keep]:
+            if old != name:
+                # en Linux un worker que aún la tenga abierta (mmap) sigue pudiendo leerla
+                shutil.rmtree(version_path(index_dir, old), ignore_errors=True)
+    return name
@@ -0,0 +1,102 @@
+# graphrag_app/local_sparql.py
+"""
+SPARQL sin Fuseki: carga ingestion/ttl/*.ttl (y la ontología) en un grafo rdflib
+en memoria y ejecuta las mismas SELECT que los builders, devolviendo los bindings
+con el mismo formato JSON que Fuseki (application/sparql-results+json).
+
+Lo usan content_index e index_schema con --offline (CI, máquinas de build).
+"""
+
+import glob
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from rdflib import BNode, Graph, Literal, URIRef
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+LOCAL_TTL_DIR = os.getenv("LOCAL_TTL_DIR", os.path.join(ROOT_DIR, "ingestion", "ttl"))
+LOCAL_ONTOLOGY = os.getenv(
+    "LOCAL_ONTOLOGY", os.path.join(ROOT_DIR, "ingestion", "ontology", "academic_career_updated.rdf")
+)
+
+# "endpoint" que content_index.sparql_select resuelve con el grafo local
+LOCAL_ENDPOINT = "local"
+
+_graphs: Dict[tuple, Graph] = {}
+_active: Optional[Graph] = None
+_lock = threading.Lock()
+
+
+def load_local_graph(ttl_dir: str = LOCAL_TTL_DIR, ontology: Optional[str] = LOCAL_ONTOLOGY) -> Graph:
+    """
+    Grafo con todos los .ttl de ttl_dir (como el POST a /data de docker-compose) más
+    la ontología. Se carga una vez por proceso y combinación de rutas, y pasa a ser
+    el grafo de local_select().
+    """
+    global _active
+    key = (os.path.abspath(ttl_dir), os.path.abspath(ontology) if ontology else "")
+    with _lock:
+        if key in _graphs:
+            _active = _graphs[key]
+            return _active
+
+        t0 = time.perf_counter()
+        files = sorted(glob.glob(os.path.join(ttl_dir, "*.ttl")))
+        if not files:
+            raise FileNotFoundError(f"No hay ficheros .ttl en {ttl_dir}")
+
+        g = Graph()
+        for path in files:
+            g.parse(path, format="turtle")
+        if ontology:
+            g.parse(ontology)
+
+        print(f"[local_sparql] {len(files)} ttl + ontología: {len(g)} triples en {time.perf_counter() - t0:.2f}s")
+        _graphs[key] = _active = g
+        return g
+
+
+def _term_json(term) -> dict:
+    # mismo formato que Fuseki: uri / bnode / literal (+ datatype o xml:lang)
+    if isinstance(term, URIRef):
+        return {"type": "uri", "value": str(term)}
+    if isinstance(term, BNode):
+        return {"type": "bnode", "value": str(term)}
+    out = {"type": "literal", "value": str(term)}
+    if isinstance(term, Literal):
+        if term.language:
+            out["xml:lang"] = term.language
+        elif term.datatype:
+            out["datatype"] = str(term.datatype)
+    return out
+
+
+def local_select(query: str, graph: Optional[Graph] = None) -> List[dict]:
+    """
+    Ejecuta una SELECT sobre el grafo local (el último cargado, o el de las rutas por
+    defecto) y devuelve results.bindings.
+    """
+    g = graph if graph is not None else (_active or load_local_graph())
+    # rdflib no gana nada con hilos (GIL) y así no hay lecturas concurrentes del store
+    with _lock:
+        result = g.query(query)
+        names = [str(v) for v in result.vars]
+        rows = []
+        for row in result:
+            rows.append({name: _term_json(term) for name, term in zip(names, row) if term is not None})
+    return rows
+
+
+def binding_key(b: dict) -> tuple:
+    return tuple(sorted((name, t.get("type", ""), t.get("value", "")) for name, t in b.items()))
+
+
+def sort_bindings(rows: Iterable[dict]) -> List[dict]:
+    """
+    Orden canónico de unos bindings (por variable y valor). Fuseki y rdflib devuelven
+    las filas en órdenes distintos; ordenándolas el resultado del build no depende
+    del servidor.
+    """
+    return sorted(rows, key=binding_key)
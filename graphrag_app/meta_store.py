@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Almacén columnar y compacto para los metadatos de los índices FAISS.
+
+Sustituye a los *_meta.json: en lugar de una lista de dicts que cada proceso tiene
+que parsear entera, el fichero .bin guarda
+
+- las columnas de baja cardinalidad (kind, seccion, doc_titulo, pagina, ...) como
+  códigos enteros sobre una tabla de strings internados;
+- el resto de strings (text, texto, URIs, ...) como spans [inicio, fin) sobre un
+  único blob UTF-8. Si un valor ya está contenido en otro campo de la misma card
+  (p.ej. 'texto' dentro de 'text') o es idéntico a uno anterior, no se duplica;
+- las columnas enteras (card_id) como un array int64; deben estar en todas las cards.
+
+El fichero se abre con mmap y cada card solo decodifica los campos que se leen.
+
+Conversión desde/hacia el JSON antiguo:
+  python -m graphrag_app.meta_store graphrag_app/index_content/content_meta.json
+  python -m graphrag_app.meta_store graphrag_app/index_content/content_meta.bin --out /tmp/meta.json
+"""
+
+import argparse
+import json
+import mmap as _mmap
+import os
+from collections.abc import Mapping, Sequence
+from typing import Dict, Iterator, List, Optional, Union
+
+import numpy as np
+
+MAGIC = b"GRMETA01"
+_ABSENT = -1  # la card no tiene ese campo
+_NONE = -2    # el campo existe pero vale None
+
+
+def _align8(n: int) -> int:
+    return (n + 7) & ~7
+
+
+# ----------------------------
+# Escritura
+# ----------------------------
+
+def _column_names(items: List[dict]) -> List[str]:
+    names: Dict[str, None] = {}
+    for it in items:
+        for k in it:
+            names.setdefault(k, None)
+    return list(names)
+
+
+def _is_int(v) -> bool:
+    return isinstance(v, (int, np.integer)) and not isinstance(v, bool)
+
+
+def _check_value(name: str, v) -> None:
+    if v is not None and not isinstance(v, str):
+        raise TypeError(f"meta_store solo admite str/None o columnas int: campo '{name}' = {type(v).__name__}")
+
+
+def _int_columns(items: List[dict], names: List[str]) -> List[str]:
+    out = []
+    for name in names:
+        if not any(_is_int(it.get(name)) for it in items):
+            continue
+        if not all(_is_int(it.get(name)) for it in items):
+            raise TypeError(f"meta_store: la columna entera '{name}' debe tener un int en todas las cards")
+        out.append(name)
+    return out
+
+
+def write_meta(path: str, items: List[dict]) -> str:
+    """
+    Escribe los items (lista de dicts str -> str/None) en formato columnar.
+    Devuelve la ruta escrita.
+    """
+    n = len(items)
+    names = _column_names(items)
+    int_names = _int_columns(items, names)
+    ints = {name: np.array([it[name] for it in items], dtype=np.int64) for name in int_names}
+
+    # Internamos las columnas con pocos valores distintos
+    interned: Dict[str, List[str]] = {}
+    for name in names:
+        if name in ints:
+            continue
+        values = {it[name] for it in items if it.get(name) is not None}
+        for v in values:
+            _check_value(name, v)
+        present = sum(1 for it in items if it.get(name) is not None)
+        if present and len(values) * 2 <= present:
+            interned[name] = sorted(values)
+
+    blob_names = [name for name in names if name not in interned and name not in ints]
+    codes = {name: np.full(n, _ABSENT, dtype=np.int32) for name in interned}
+    spans = {name: np.full((n, 2), _ABSENT, dtype=np.int64) for name in blob_names}
+    lookup = {name: {v: i for i, v in enumerate(vals)} for name, vals in interned.items()}
+
+    blob = bytearray()
+    seen: Dict[bytes, int] = {}
+
+    for row, it in enumerate(items):
+        for name in interned:
+            if name not in it:
+                continue
+            v = it[name]
+            codes[name][row] = _NONE if v is None else lookup[name][v]
+
+        # Los campos largos primero: así los cortos pueden apuntar dentro de ellos
+        record = []
+        for name in blob_names:
+            if name not in it:
+                continue
+            v = it[name]
+            _check_value(name, v)
+            if v is None:
+                spans[name][row] = (_NONE, _NONE)
+                continue
+            record.append((name, v.encode("utf-8")))
+        record.sort(key=lambda x: len(x[1]), reverse=True)
+
+        written = []  # (inicio, bytes) de los campos de esta card ya en el blob
+        for name, b in record:
+            start = seen.get(b)
+            if start is None:
+                for w_start, w_bytes in written:
+                    pos = w_bytes.find(b)
+                    if pos >= 0:
+                        start = w_start + pos
+                        break
+            if start is None:
+                start = len(blob)
+                blob += b
+                seen[b] = start
+            spans[name][row] = (start, start + len(b))
+            written.append((start, b))
+
+    # Layout: MAGIC | len(header) | header JSON | secciones alineadas a 8 bytes
+    sections: List[bytes] = []
+    offset = 0
+    columns = []
+
+    def add_section(data: bytes) -> List[int]:
+        nonlocal offset
+        pos = offset
+        sections.append(data + b"\0" * (_align8(len(data)) - len(data)))
+        offset += _align8(len(data))
+        return [pos, len(data)]
+
+    for name in names:
+        if name in ints:
+            columns.append({
+                "name": name,
+                "enc": "int64",
+                "values": add_section(ints[name].tobytes()),
+            })
+        elif name in interned:
+            columns.append({
+                "name": name,
+                "enc": "intern",
+                "values": interned[name],
+                "codes": add_section(codes[name].tobytes()),
+            })
+        else:
+            columns.append({
+                "name": name,
+                "enc": "blob",
+                "spans": add_section(spans[name].tobytes()),
+            })
+
+    header = {"version": 1, "n": n, "columns": columns, "blob": add_section(bytes(blob))}
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    header_bytes += b" " * (_align8(16 + len(header_bytes)) - 16 - len(header_bytes))
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(np.uint64(len(header_bytes)).tobytes())
+        f.write(header_bytes)
+        for data in sections:
+            f.write(data)
+    os.replace(tmp_path, path)
+    return path
+
+
+# ----------------------------
+# Lectura
+# ----------------------------
+
+class MetaRecord(Mapping):
+    """
+    Vista perezosa de una card: cada campo se decodifica al leerlo.
+    Se comporta como un dict de solo lectura (get, in, dict(record), ...).
+    """
+
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store: "MetaStore", row: int):
+        self._store = store
+        self._row = row
+
+    def __getitem__(self, key: str):
+        return self._store.value(self._row, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return (name for name in self._store.columns if self._store.has(self._row, name))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"MetaRecord({dict(self)!r})"
+
+
+class MetaStore(Sequence):
+    """
+    Metadatos de un índice abiertos desde un fichero .bin (por defecto con mmap).
+    store[i] devuelve un MetaRecord; store.column(nombre) materializa una columna entera.
+    """
+
+    def __init__(self, path: str, mmap: bool = True):
+        self.path = path
+        with open(path, "rb") as f:
+            if mmap:
+                self._buf = _mmap.mmap(f.fileno(), 0, access=_mmap.ACCESS_READ)
+            else:
+                self._buf = f.read()
+
+        if self._buf[:8] != MAGIC:
+            raise ValueError(f"{path} no es un meta_store ({MAGIC!r})")
+
+        header_len = int(np.frombuffer(self._buf, dtype=np.uint64, count=1, offset=8)[0])
+        header = json.loads(bytes(self._buf[16:16 + header_len]).decode("utf-8"))
+        data_start = 16 + header_len
+
+        self._n = int(header["n"])
+        blob_off, blob_len = header["blob"]
+        self._blob_start = data_start + blob_off
+
+        self._interned: Dict[str, List[str]] = {}
+        self._codes: Dict[str, np.ndarray] = {}
+        self._spans: Dict[str, np.ndarray] = {}
+        self._ints: Dict[str, np.ndarray] = {}
+        self.columns: List[str] = []
+
+        for col in header["columns"]:
+            name = col["name"]
+            self.columns.append(name)
+            if col["enc"] == "int64":
+                off, _ = col["values"]
+                self._ints[name] = np.frombuffer(self._buf, dtype=np.int64, count=self._n, offset=data_start + off)
+            elif col["enc"] == "intern":
+                off, _ = col["codes"]
+                self._interned[name] = col["values"]
+                self._codes[name] = np.frombuffer(self._buf, dtype=np.int32, count=self._n, offset=data_start + off)
+            else:
+                off, _ = col["spans"]
+                self._spans[name] = np.frombuffer(
+                    self._buf, dtype=np.int64, count=2 * self._n, offset=data_start + off
+                ).reshape(self._n, 2)
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [MetaRecord(self, i) for i in range(*row.indices(self._n))]
+        row = int(row)
+        if row < 0:
+            row += self._n
+        if not 0 <= row < self._n:
+            raise IndexError(row)
+        return MetaRecord(self, row)
+
+    def has(self, row: int, name: str) -> bool:
+        if name in self._ints:
+            return True
+        if name in self._codes:
+            return self._codes[name][row] != _ABSENT
+        if name in self._spans:
+            return self._spans[name][row, 0] != _ABSENT
+        return False
+
+    def value(self, row: int, name: str) -> Union[str, int, None]:
+        if name in self._ints:
+            return int(self._ints[name][row])
+        if name in self._codes:
+            code = int(self._codes[name][row])
+            if code == _ABSENT:
+                raise KeyError(name)
+            return None if code == _NONE else self._interned[name][code]
+
+        if name in self._spans:
+            start, end = (int(x) for x in self._spans[name][row])
+            if start == _ABSENT:
+                raise KeyError(name)
+            if start == _NONE:
+                return None
+            return bytes(self._buf[self._blob_start + start:self._blob_start + end]).decode("utf-8")
+
+        raise KeyError(name)
+
+    def int_column(self, name: str) -> np.ndarray:
+        """
+        Una columna entera como array int64 (vista sobre el fichero, sin copiar).
+        """
+        return self._ints[name]
+
+    def column(self, name: str, default=None) -> List[Union[str, int, None]]:
+        """
+        Valores de un campo para todas las cards (default donde la card no lo tiene).
+        """
+        if name in self._ints:
+            return self._ints[name].tolist()
+        if name in self._codes:
+            table = self._interned[name]
+            return [
+                default if c == _ABSENT else (None if c == _NONE else table[c])
+                for c in self._codes[name].tolist()
+            ]
+        if name in self._spans:
+            base = self._blob_start
+            buf = self._buf
+            return [
+                default if s == _ABSENT else (None if s == _NONE else bytes(buf[base + s:base + e]).decode("utf-8"))
+                for s, e in self._spans[name].tolist()
+            ]
+        return [default] * self._n
+
+    def to_list(self) -> List[dict]:
+        return [dict(r) for r in self]
+
+
+def load_meta(path: str, mmap: bool = True) -> Union[MetaStore, List[dict]]:
+    """
+    Abre unos metadatos: .bin -> MetaStore (perezoso); cualquier otra cosa -> JSON antiguo.
+    """
+    if path.endswith(".bin"):
+        return MetaStore(path, mmap=mmap)
+
+    with open(path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if not isinstance(meta, list):
+        raise ValueError(f"Meta JSON inválido en {path}: se esperaba una lista de items.")
+    return meta
+
+
+def meta_column(meta, name: str, default=None) -> List[Optional[str]]:
+    """
+    Una columna completa, tanto de un MetaStore como de una lista de dicts.
+    """
+    if isinstance(meta, MetaStore):
+        return meta.column(name, default)
+    return [it.get(name, default) for it in meta]
+
+
+# ----------------------------
+# Conversor
+# ----------------------------
+
+def convert(src: str, out: Optional[str] = None) -> str:
+    if src.endswith(".bin"):
+        out = out or src[:-len(".bin")] + ".json"
+        items = MetaStore(src, mmap=False).to_list()
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(items, f, ensure_ascii=False, indent=2)
+        return out
+
+    out = out or os.path.splitext(src)[0] + ".bin"
+    items = load_meta(src)
+    return write_meta(out, items)
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Convierte metadatos JSON <-> meta_store (.bin)")
+    ap.add_argument("src", help="fichero *_meta.json o *_meta.bin")
+    ap.add_argument("--out", default=None)
+    return ap.parse_args()
+
+
+def main():
+    args = parse_args()
+    out = convert(args.src, args.out)
+    print(f"[ok] {args.src} ({os.path.getsize(args.src)} bytes) -> {out} ({os.path.getsize(out)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,31 @@
+import asyncio
 import os
+import weakref
+
+import httpx
 import requests
 from typing import Optional
 
 OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2:3b")
 
+# un AsyncClient por event loop (keep-alive con Ollama entre peticiones de /chat)
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def _payload(prompt: str, temperature: float, system: Optional[str], model: Optional[str]) -> dict:
+    final_prompt = prompt
+    if system:
+        final_prompt = f"SISTEMA:\n{system.strip()}\n\nUSUARIO:\n{prompt.strip()}\n"
+
+    return {
+        "model": model or OLLAMA_MODEL,
+        "prompt": final_prompt,
+        "stream": False,
+        "options": {"temperature": temperature},
+    }
+
+
 def ollama_generate(
     prompt: str,
     temperature: float = 0.0,
@@ -16,17 +37,27 @@ def ollama_generate(
     Wrapper simple para /api/generate.
     Si 'system' viene, lo inyectamos arriba del prompt (compatible con tu enfoque actual).
     """
-    final_prompt = prompt
-    if system:
-        final_prompt = f"SISTEMA:\n{system.strip()}\n\nUSUARIO:\n{prompt.strip()}\n"
+    payload = _payload(prompt, temperature, system, model)
+    r = requests.post(OLLAMA_URL, json=payload, timeout=timeout)
+    r.raise_for_status()
+    return r.json()["response"].strip()
 
-    payload = {
-        "model": model or OLLAMA_MODEL,
-        "prompt": final_prompt,
-        "stream": False,
-        "options": {"temperature": temperature},
-    }
 
-    r = requests.post(OLLAMA_URL, json=payload, timeout=timeout)
+async def aollama_generate(
+    prompt: str,
+    temperature: float = 0.0,
+    system: Optional[str] = None,
+    model: Optional[str] = None,
+    timeout: int = 600,
+) -> str:
+    """
+    Igual que ollama_generate, sin bloquear el event loop mientras genera.
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = httpx.AsyncClient()
+
+    r = await client.post(OLLAMA_URL, json=_payload(prompt, temperature, system, model), timeout=timeout)
     r.raise_for_status()
-    return r.json()["response"].strip()
\ No newline at end of file
+    return r.json()["response"].strip()
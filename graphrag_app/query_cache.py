@@ -0,0 +1,134 @@
+# graphrag_app/query_cache.py
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_EMB_CACHE_SIZE", "4096"))
+# Si se define, los embeddings se guardan también en un SQLite y sobreviven a reinicios
+QUERY_CACHE_PATH = os.getenv("QUERY_EMB_CACHE_PATH", "")
+
+
+def normalize_query(text: str) -> str:
+    """
+    Clave de caché de una pregunta: NFC + espacios colapsados.
+    No cambia lo que ve el tokenizer, así que el embedding es el mismo.
+    """
+    text = unicodedata.normalize("NFC", text or "")
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class QueryEmbeddingCache:
+    """
+    Caché LRU de embeddings de preguntas, con clave (modelo, texto normalizado).
+    Opcionalmente respaldada por un SQLite en disco compartido entre procesos.
+    """
+
+    def __init__(self, max_items: int = QUERY_CACHE_SIZE, path: str = QUERY_CACHE_PATH):
+        self.max_items = max(0, int(max_items))
+        self.path = path or ""
+        self._items: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.encoded = 0
+        self.encode_seconds = 0.0
+
+        if self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with self._db() as db:
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                    " model TEXT NOT NULL, text TEXT NOT NULL, vec BLOB NOT NULL,"
+                    " PRIMARY KEY (model, text))"
+                )
+
+    def _db(self) -> sqlite3.Connection:
+        # una conexión por hilo (sqlite3 no deja compartirlas entre hilos)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, model_name: str, text: str) -> Optional[np.ndarray]:
+        key = (model_name, normalize_query(text))
+        with self._lock:
+            vec = self._items.get(key)
+            if vec is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return vec
+
+        if self.path:
+            row = self._db().execute(
+                "SELECT vec FROM query_embeddings WHERE model = ? AND text = ?", key
+            ).fetchone()
+            if row is not None:
+                vec = np.frombuffer(row[0], dtype="float32")
+                with self._lock:
+                    self.hits += 1
+                    self.disk_hits += 1
+                    self._remember(key, vec)
+                return vec
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, model_name: str, text: str, vec: np.ndarray) -> None:
+        key = (model_name, normalize_query(text))
+        vec = np.array(vec, dtype="float32").reshape(-1)
+        with self._lock:
+            self._remember(key, vec)
+
+        if self.path:
+            with self._db() as db:
+                db.execute(
+                    "INSERT OR REPLACE INTO query_embeddings (model, text, vec) VALUES (?, ?, ?)",
+                    (key[0], key[1], vec.tobytes()),
+                )
+
+    def _remember(self, key: Tuple[str, str], vec: np.ndarray) -> None:
+        if self.max_items == 0:
+            return
+        self._items[key] = vec
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def record_encode(self, n_texts: int, seconds: float) -> None:
+        with self._lock:
+            self.encoded += n_texts
+            self.encode_seconds += seconds
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            per_text = self.encode_seconds / self.encoded if self.encoded else 0.0
+            return {
+                "size": len(self._items),
+                "max_items": self.max_items,
+                "disk": bool(self.path),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+                "encoded_texts": self.encoded,
+                "encode_seconds": round(self.encode_seconds, 4),
+                # estimación: cada acierto se ahorra un encode de coste medio
+                "saved_seconds": round(self.hits * per_text, 4),
+            }
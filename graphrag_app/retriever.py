@@ -1,34 +1,73 @@
 import os
-import json
 import re
+import threading
+import time
 import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
-from functools import lru_cache
-from typing import Optional
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
-_model = SentenceTransformer(MODEL_NAME)
+from graphrag_app import embeddings
+from graphrag_app.faiss_io import read_index, read_index_params, search_parameters
+from graphrag_app.index_versions import current_version, version_path
+from graphrag_app.meta_store import load_meta, meta_column
+from graphrag_app.query_cache import QueryEmbeddingCache
+from graphrag_app.signals import QuestionSignals, match_signals
+
+MODEL_NAME = embeddings.MODEL_NAME
+# clave de la caché de preguntas: incluye el backend (torch / onnx / onnx-int8)
+_CACHE_MODEL = embeddings.cache_key(MODEL_NAME)
+
+# Las preguntas se repiten mucho (y text2sparql re-embebe la misma pregunta para el esquema)
+_query_cache = QueryEmbeddingCache()
 
 BASE_DIR = os.path.dirname(__file__)
 
+# Cada cuántos segundos se mira si los builders han publicado una versión nueva (0 = nunca)
+INDEX_RELOAD_SECS = float(os.getenv("INDEX_RELOAD_SECS", "5"))
+
 INDEX_CONFIG = {
     "schema": {
         "dir": "index_schema",
         "base": "schema",
-        "meta": "schema_meta.json",
+        "meta": "schema_meta.bin",
     },
     "content": {
         "dir": "index_content",
         "base": "content",
-        "meta": "content_meta.json",
+        "meta": "content_meta.bin",
     },
 }
 
 
 def _embed_one(text: str) -> np.ndarray:
-    vec = _model.encode([text], normalize_embeddings=True)
-    return np.asarray(vec, dtype="float32")
+    return _embed_many([text])
+
+
+def _embed_many(texts: List[str], batch_size: int = 64) -> np.ndarray:
+    """
+    Un único forward del modelo para todas las preguntas (por lotes de batch_size).
+    Solo se codifican las que no están ya en la caché de embeddings.
+    """
+    texts = list(texts)
+    cached = [_query_cache.get(_CACHE_MODEL, t) for t in texts]
+    missing = [i for i, v in enumerate(cached) if v is None]
+
+    if missing:
+        t0 = time.perf_counter()
+        vecs = embeddings.encode([texts[i] for i in missing], MODEL_NAME, batch_size=batch_size)
+        _query_cache.record_encode(len(missing), time.perf_counter() - t0)
+        for i, vec in zip(missing, np.asarray(vecs, dtype="float32")):
+            _query_cache.put(_CACHE_MODEL, texts[i], vec)
+            cached[i] = vec
+
+    if not texts:
+        return np.zeros((0, 0), dtype="float32")
+    return np.stack(cached).astype("float32", copy=False)
+
+
+def embedding_cache_stats() -> Dict[str, float]:
+    return _query_cache.stats()
 
 
 def _pick_index_path(index_dir: str, base_name: str) -> str:
@@ -43,15 +82,170 @@ def _pick_index_path(index_dir: str, base_name: str) -> str:
     return p_faiss
 
 
-@lru_cache(maxsize=4)
-def _load_index(kind: str):
+# ----------------------------
+# Features precalculadas por card (re-ranking vectorizado)
+# ----------------------------
+
+# Familias de palabras que el re-ranking busca en el texto de cada card
+_TEXT_FAMILIES = {
+    "tasa": ["tasa", "ordain", "pago"],
+    "plazo": ["plazo", "convocatoria", "fecha", "epe", "epeak"],
+    "recurso": ["recurso", "reposición", "reposicion", "jurisdicción", "jurisdiccion", "errekurtso"],
+    "notificacion": ["notificación", "notificacion", "resolución", "resolucion", "jakinaraz"],
+    "procedimiento": ["procedimiento", "solicitud", "tramitar", "izapidet"],
+    "evaluacion": ["evaluación", "evaluacion", "criterios", "méritos", "meritos", "ebalu"],
+    "indice": ["índice", "indice", "aurkibidea"],
+    "introduccion": ["introducción", "introduccion", "sarrera"],
+}
+
+# intent -> (bonus por tipo de card, bonus si el texto contiene la familia, bonus si hay números)
+_INTENT_RULES = {
+    "umbral": ({"umbral": 0.08, "req": 0.02}, 0.0, 0.03),
+    "req": ({"req": 0.08, "fragment": 0.02}, 0.0, 0.0),
+    "tasa": ({}, 0.09, 0.04),
+    "plazo": ({}, 0.08, 0.02),
+    "recurso": ({}, 0.09, 0.0),
+    "notificacion": ({}, 0.08, 0.0),
+    "procedimiento": ({}, 0.08, 0.0),
+    "evaluacion": ({}, 0.06, 0.0),
+    "indice": ({}, 0.10, 0.0),
+    "introduccion": ({}, 0.10, 0.0),
+}
+
+# sección de la card -> bonus si la pregunta la menciona (palabras en signals.SECTION_BONUS_TERMS)
+_SECTION_BONUS = {
+    "indice": 0.08,
+    "introduccion": 0.08,
+    "tasas": 0.06,
+    "plazos": 0.06,
+    "recurso": 0.06,
+    "notificacion": 0.06,
+    "procedimiento": 0.06,
+    "evaluacion": 0.04,
+}
+
+
+@dataclass
+class _CardFeatures:
+    kind_names: List[str]
+    kind_code: np.ndarray
+    sections: List[str]
+    section_code: np.ndarray
+    has_number: np.ndarray
+    families: Dict[str, np.ndarray]
+    noise: np.ndarray
+    intent_names: List[str]
+    intent_bonus: np.ndarray  # (n_intents, n_cards)
+    # trozos de un mismo fragmento (parent_uri) comparten código; -1 = card entera
+    parent_code: np.ndarray
+
+
+def _item_section(item: dict) -> str:
+    return (item.get("seccion_nombre") or item.get("section") or "").lower()
+
+
+def _codes(values: List[str]):
+    names: List[str] = []
+    lookup: Dict[str, int] = {}
+    codes = np.empty(len(values), dtype=np.int32)
+    for i, v in enumerate(values):
+        if v not in lookup:
+            lookup[v] = len(names)
+            names.append(v)
+        codes[i] = lookup[v]
+    return names, codes
+
+
+def _build_features(meta) -> _CardFeatures:
+    """
+    Recorre el meta una sola vez y guarda como arrays todo lo que el re-ranking
+    necesita por card, para que retrieve() no tenga que volver a mirar los textos.
+    """
+    n = len(meta)
+    # texto: text > contexto > descripcion; sección: seccion_nombre > section
+    texts = [
+        a or b or c or ""
+        for a, b, c in zip(meta_column(meta, "text"), meta_column(meta, "contexto"), meta_column(meta, "descripcion"))
+    ]
+    lowered = [t.lower() for t in texts]
+    section_values = [
+        (a or b or "").lower()
+        for a, b in zip(meta_column(meta, "seccion_nombre"), meta_column(meta, "section"))
+    ]
+
+    kind_names, kind_code = _codes([_normalize_kind(k or "") for k in meta_column(meta, "kind", "")])
+    sections, section_code = _codes(section_values)
+    has_number = np.fromiter((_contains_number(t) for t in texts), dtype=bool, count=n)
+
+    families = {
+        fam: np.fromiter((any(w in t for w in words) for t in lowered), dtype=bool, count=n)
+        for fam, words in _TEXT_FAMILIES.items()
+    }
+    noise = np.fromiter((_noise_penalty(t) for t in texts), dtype=np.float64, count=n)
+
+    parent_names, parent_code = _codes([p or "" for p in meta_column(meta, "parent_uri", "")])
+    if "" in parent_names:
+        parent_code = np.where(parent_code == parent_names.index(""), -1, parent_code).astype(np.int32)
+
+    # El orden de las sumas es el mismo que el del bonus() original: tipo, familia, números
+    intent_names = list(_INTENT_RULES) + ["general"]
+    intent_bonus = np.zeros((len(intent_names), n), dtype=np.float64)
+    for row, intent in enumerate(_INTENT_RULES):
+        kind_bonus, fam_bonus, num_bonus = _INTENT_RULES[intent]
+        per_kind = np.array([kind_bonus.get(k, 0.0) for k in kind_names], dtype=np.float64)
+        total = intent_bonus[row] + per_kind[kind_code]
+        if fam_bonus:
+            total = total + np.where(families[intent], fam_bonus, 0.0)
+        if num_bonus:
+            total = total + np.where(has_number, num_bonus, 0.0)
+        intent_bonus[row] = total
+
+    return _CardFeatures(
+        kind_names=kind_names,
+        kind_code=kind_code,
+        sections=sections,
+        section_code=section_code,
+        has_number=has_number,
+        families=families,
+        noise=noise,
+        intent_names=intent_names,
+        intent_bonus=intent_bonus,
+        parent_code=parent_code,
+    )
+
+
+@dataclass
+class _IndexBundle:
+    version: Optional[str]
+    index: Any
+    meta: Any
+    feats: _CardFeatures
+    # tipo de índice y parámetros guardados por el builder (faiss_io.write_index)
+    index_params: Dict[str, Any] = field(default_factory=dict)
+    # efSearch / nprobe para las búsquedas sin filtro (None en índices planos)
+    search_params: Any = None
+    # índices con IDs estables (IndexIDMap2): card_id de cada fila del meta y su orden,
+    # para traducir lo que devuelve FAISS a filas. None -> FAISS devuelve la fila directamente
+    card_ids: Optional[np.ndarray] = None
+    id_order: Optional[np.ndarray] = None
+    sorted_ids: Optional[np.ndarray] = None
+    # (kinds, sections) -> (nº de cards, IDSelector); los SearchParameters se crean en
+    # cada búsqueda: con IndexIDMap2 FAISS cambia params.sel durante la búsqueda y no
+    # se pueden compartir entre hilos
+    filters: Dict[tuple, tuple] = field(default_factory=dict)
+
+
+def _load_index(kind: str, version: Optional[str] = None) -> _IndexBundle:
     if kind not in INDEX_CONFIG:
         raise ValueError(f"kind inválido: {kind}. Usa 'schema' o 'content'.")
 
     cfg = INDEX_CONFIG[kind]
-    index_dir = os.path.join(BASE_DIR, cfg["dir"])
+    index_dir = version_path(os.path.join(BASE_DIR, cfg["dir"]), version)
     index_path = _pick_index_path(index_dir, cfg["base"])
     meta_path = os.path.join(index_dir, cfg["meta"])
+    legacy_meta_path = os.path.splitext(meta_path)[0] + ".json"
+    if not os.path.exists(meta_path) and os.path.exists(legacy_meta_path):
+        meta_path = legacy_meta_path
 
     alt_path = (
         index_path.replace(".faiss", ".index")
@@ -67,16 +261,151 @@ def _load_index(kind: str):
         )
 
     if not os.path.exists(meta_path):
-        raise FileNotFoundError(f"No se encuentra el meta JSON: {meta_path}")
+        raise FileNotFoundError(f"No se encuentra el meta: {meta_path}")
+
+    index = read_index(index_path)
+    meta = load_meta(meta_path)
+    index_params = read_index_params(index_path)
+
+    card_ids = id_order = sorted_ids = None
+    if index_params.get("id_map"):
+        card_ids = np.asarray(meta_column(meta, "card_id"), dtype="int64")
+        id_order = np.argsort(card_ids, kind="stable")
+        sorted_ids = card_ids[id_order]
+
+    return _IndexBundle(
+        version=version,
+        index=index,
+        meta=meta,
+        feats=_build_features(meta),
+        index_params=index_params,
+        search_params=search_parameters(index_params),
+        card_ids=card_ids,
+        id_order=id_order,
+        sorted_ids=sorted_ids,
+    )
 
-    index = faiss.read_index(index_path)
-    with open(meta_path, "r", encoding="utf-8") as f:
-        meta = json.load(f)
 
-    if not isinstance(meta, list):
-        raise ValueError(f"Meta JSON inválido en {meta_path}: se esperaba una lista de items.")
+def _ids_to_rows(bundle: _IndexBundle, ids: np.ndarray) -> np.ndarray:
+    """
+    card_ids devueltos por un IndexIDMap2 -> filas del meta (-1 si no hay card).
+    """
+    if bundle.card_ids is None or len(bundle.card_ids) == 0:
+        return ids
+    sorted_ids = bundle.sorted_ids
+    pos = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+    found = (ids >= 0) & (sorted_ids[pos] == ids)
+    return np.where(found, bundle.id_order[pos], -1)
+
+
+class _IndexSlot:
+    """
+    Índice activo de un kind. Si los builders publican una versión nueva (CURRENT),
+    se carga en segundo plano y se sustituye de golpe; mientras tanto se sigue
+    respondiendo con la anterior. Cada petición se queda con su propia referencia
+    al bundle, así que la versión vieja se libera cuando termina la última que la usa.
+    """
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.index_dir = os.path.join(BASE_DIR, INDEX_CONFIG[kind]["dir"])
+        self._bundle: Optional[_IndexBundle] = None
+        self._lock = threading.Lock()
+        self._loading: Optional[str] = None
+        # versiones que no se pudieron cargar: las comprobaciones periódicas no las reintentan
+        self._failed: set = set()
+        self._next_check = 0.0
+
+    def get(self) -> _IndexBundle:
+        bundle = self._bundle
+        if bundle is None:
+            with self._lock:
+                if self._bundle is None:
+                    self._bundle = _load_index(self.kind, current_version(self.index_dir))
+                    self._next_check = time.monotonic() + INDEX_RELOAD_SECS
+                return self._bundle
+
+        if INDEX_RELOAD_SECS > 0 and time.monotonic() >= self._next_check:
+            self._next_check = time.monotonic() + INDEX_RELOAD_SECS
+            self.reload(wait=False)
+        return bundle
+
+    def reload(self, wait: bool = True) -> Optional[str]:
+        """
+        Carga la versión apuntada por CURRENT si es distinta de la activa.
+        Con wait=False la carga se hace en un hilo aparte y no se reintentan las
+        versiones que ya fallaron; con wait=True (POST /reload) sí.
+        """
+        version = current_version(self.index_dir)
+        with self._lock:
+            if self._bundle is not None and self._bundle.version == version:
+                return version
+            if self._loading is not None:
+                return None
+            if not wait and version in self._failed:
+                return None
+            self._loading = version
+
+        if wait:
+            self._swap_in(version)
+        else:
+            threading.Thread(target=self._swap_in, args=(version,), daemon=True).start()
+        return version
+
+    def _swap_in(self, version: Optional[str]) -> None:
+        try:
+            bundle = _load_index(self.kind, version)
+        except Exception as e:
+            print(f"[retriever] no se pudo cargar {self.kind}@{version}: {e!r}; sigo con la versión anterior")
+            with self._lock:
+                self._failed.add(version)
+                self._loading = None
+            return
+
+        # _loading se libera en el mismo paso que se instala el bundle: hasta entonces
+        # ninguna otra recarga de la misma versión puede empezar
+        with self._lock:
+            old = self._bundle
+            self._bundle = bundle
+            self._failed.discard(version)
+            self._loading = None
+        print(f"[retriever] índice {self.kind}: {old.version if old else None} -> {version}")
+
+
+_slots = {kind: _IndexSlot(kind) for kind in INDEX_CONFIG}
+
+
+def _current_index(kind: str) -> _IndexBundle:
+    if kind not in _slots:
+        raise ValueError(f"kind inválido: {kind}. Usa 'schema' o 'content'.")
+    return _slots[kind].get()
 
-    return index, meta
+
+def warmup() -> Dict[str, float]:
+    """
+    Carga el modelo de embeddings y los índices antes de la primera petición.
+    Devuelve los segundos de cada paso.
+    """
+    timings = {"model": embeddings.warmup(MODEL_NAME)}
+    for kind in _slots:
+        t0 = time.perf_counter()
+        try:
+            _current_index(kind)
+        except FileNotFoundError as e:
+            print(f"[retriever] índice {kind} no disponible: {e}")
+        timings[f"index_{kind}"] = time.perf_counter() - t0
+    return {name: round(secs, 3) for name, secs in timings.items()}
+
+
+def loaded_index_versions() -> Dict[str, Optional[str]]:
+    return {kind: (slot._bundle.version if slot._bundle else None) for kind, slot in _slots.items()}
+
+
+def reload_indexes() -> Dict[str, Optional[str]]:
+    """
+    Fuerza la comprobación de versiones nuevas (p.ej. justo después de reconstruir).
+    """
+    return {kind: slot.reload(wait=True) for kind, slot in _slots.items()}
 
 
 def _normalize_kind(k: str) -> str:
@@ -91,39 +420,7 @@ def _normalize_kind(k: str) -> str:
 
 
 def _intent(question: str) -> str:
-    q = (question or "").lower()
-
-    if any(w in q for w in ["umbral", "mínimo", "minimo", "puntuación", "puntuacion", "puntos", "threshold"]):
-        return "umbral"
-
-    if any(w in q for w in ["requisito", "requisitos", "condición", "condiciones", "debe", "deberá", "debera"]):
-        return "req"
-
-    if any(w in q for w in ["tasa", "tasas", "pago", "pagar", "cuánto cuesta", "cuanto cuesta", "ordain", "ordaindu"]):
-        return "tasa"
-
-    if any(w in q for w in ["plazo", "plazos", "cuándo", "cuando", "fecha", "fechas", "epe", "epeak", "convocatoria"]):
-        return "plazo"
-
-    if any(w in q for w in ["recurso", "recurrir", "reposición", "reposicion", "jurisdicción", "jurisdiccion", "errekurtso"]):
-        return "recurso"
-
-    if any(w in q for w in ["notificación", "notificacion", "notifica", "resolución", "resolucion", "jakinaraz"]):
-        return "notificacion"
-
-    if any(w in q for w in ["procedimiento", "tramitar", "tramitación", "tramitacion", "pasos", "solicitud", "izapidet"]):
-        return "procedimiento"
-
-    if any(w in q for w in ["evaluación", "evaluacion", "criterios", "méritos", "meritos", "ebalu"]):
-        return "evaluacion"
-
-    if any(w in q for w in ["índice", "indice", "aurkibidea"]):
-        return "indice"
-
-    if any(w in q for w in ["introducción", "introduccion", "sarrera"]):
-        return "introduccion"
-
-    return "general"
+    return match_signals(question).intent
 
 
 def _contains_number(text: str) -> bool:
@@ -131,37 +428,22 @@ def _contains_number(text: str) -> bool:
 
 
 def _section_bonus(question: str, item: dict) -> float:
-    q = (question or "").lower()
-    sec = (item.get("seccion_nombre") or item.get("section") or "").lower()
-
+    sec = _item_section(item)
     if not sec:
         return 0.0
+    return float(_section_bonus_table(match_signals(question), [sec])[0])
 
-    if any(w in q for w in ["índice", "indice", "aurkibidea"]) and sec == "indice":
-        return 0.08
-
-    if any(w in q for w in ["introducción", "introduccion", "sarrera"]) and sec == "introduccion":
-        return 0.08
 
-    if any(w in q for w in ["tasa", "tasas", "pago", "pagar", "ordain"]) and sec == "tasas":
-        return 0.06
-
-    if any(w in q for w in ["plazo", "plazos", "epe", "epeak", "convocatoria"]) and sec == "plazos":
-        return 0.06
-
-    if any(w in q for w in ["recurso", "recurrir", "reposicion", "reposición", "errekurtso"]) and sec == "recurso":
-        return 0.06
-
-    if any(w in q for w in ["notificación", "notificacion", "jakinaraz"]) and sec == "notificacion":
-        return 0.06
-
-    if any(w in q for w in ["procedimiento", "tramitar", "izapidet"]) and sec == "procedimiento":
-        return 0.06
-
-    if any(w in q for w in ["evaluación", "evaluacion", "criterios", "méritos", "meritos", "ebalu"]) and sec == "evaluacion":
-        return 0.04
-
-    return 0.0
+def _section_bonus_table(sig: QuestionSignals, sections: List[str]) -> np.ndarray:
+    """
+    Bonus por sección para una pregunta: un valor por cada sección distinta del índice,
+    de forma que el re-ranking solo tiene que indexar con section_code.
+    """
+    table = np.zeros(len(sections), dtype=np.float64)
+    for i, sec in enumerate(sections):
+        if sec in _SECTION_BONUS and sig.has(f"rsec:{sec}"):
+            table[i] = _SECTION_BONUS[sec]
+    return table
 
 
 def _noise_penalty(text: str) -> float:
@@ -174,6 +456,209 @@ def _noise_penalty(text: str) -> float:
     return penalty
 
 
+def _rerank(
+    signals: List[QuestionSignals],
+    scores: np.ndarray,
+    ids: np.ndarray,
+    meta: List[dict],
+    feats: _CardFeatures,
+    min_score: Optional[float],
+    final_k: int,
+):
+    """
+    Re-ranking de un lote completo: scores/ids son las matrices (n_preguntas, search_k)
+    que devuelve index.search. Los candidatos descartados (-1 o < min_score) quedan a -inf.
+    """
+    intent_rows = np.array([feats.intent_names.index(sig.intent) for sig in signals], dtype=np.int64)
+    section_tables = np.stack([_section_bonus_table(sig, feats.sections) for sig in signals])
+
+    valid = ids != -1
+    if min_score is not None:
+        valid &= scores >= min_score
+    safe_ids = np.where(valid, ids, 0)
+
+    # gather-and-add de los bonus precalculados para todo el lote
+    bonus = (
+        feats.intent_bonus[intent_rows[:, None], safe_ids]
+        + np.take_along_axis(section_tables, feats.section_code[safe_ids], axis=1)
+        + feats.noise[safe_ids]
+    )
+    scores = scores.astype(np.float64)
+    scores2 = np.where(valid, scores + bonus, -np.inf)
+
+    # argsort estable: a igualdad de score2 se respeta el orden de FAISS
+    order = np.argsort(-scores2, axis=1, kind="stable")
+    n_valid = valid.sum(axis=1)
+
+    batch_results = []
+    for row in range(len(signals)):
+        results = []
+        seen_parents = set()
+        for j in order[row, :int(n_valid[row])]:
+            if len(results) >= max(1, final_k):
+                break
+            idx = int(ids[row, j])
+            parent = int(feats.parent_code[idx])
+            if parent >= 0:
+                # de cada fragmento troceado solo se devuelve el trozo con más score
+                if parent in seen_parents:
+                    continue
+                seen_parents.add(parent)
+            item = dict(meta[idx])
+            item["_score"] = float(scores[row, j])
+            item["_score2"] = float(scores2[row, j])
+            item["_kind_norm"] = feats.kind_names[feats.kind_code[idx]]
+            results.append(item)
+        batch_results.append(results)
+
+    return batch_results
+
+
+# ----------------------------
+# Búsqueda filtrada por tipo de card / sección
+# ----------------------------
+
+# intent -> tipos de card en los que se busca directamente (si hay al menos final_k).
+# "req" no está: salta con palabras muy comunes ("debe", "condición") y los fragmentos y
+# chunks también responden a esas preguntas; a las cards req ya les da un bonus el re-ranking
+INTENT_KINDS = {
+    "umbral": ("umbral",),
+}
+
+
+def _filter_params(bundle: _IndexBundle, kinds: Sequence[str], sections: Sequence[str]) -> tuple:
+    """
+    (nº de cards, IDSelector de FAISS) con las cards de esos tipos/secciones
+    (cacheado por bundle; el selector solo se lee, se puede compartir entre hilos).
+    """
+    key = (
+        tuple(sorted({_normalize_kind(k) for k in kinds or ()})),
+        tuple(sorted({(s or "").lower() for s in sections or ()})),
+    )
+    cached = bundle.filters.get(key)
+    if cached is not None:
+        return cached
+
+    feats = bundle.feats
+    mask = np.ones(len(feats.kind_code), dtype=bool)
+    if key[0]:
+        codes = [i for i, name in enumerate(feats.kind_names) if name in key[0]]
+        mask &= np.isin(feats.kind_code, codes)
+    if key[1]:
+        codes = [i for i, name in enumerate(feats.sections) if name in key[1]]
+        mask &= np.isin(feats.section_code, codes)
+
+    rows = np.flatnonzero(mask).astype("int64")
+    sel = faiss.IDSelectorBatch(rows if bundle.card_ids is None else bundle.card_ids[rows])
+    cached = (len(rows), sel)
+    bundle.filters[key] = cached
+    return cached
+
+
+def _plan_filter(
+    bundle: _IndexBundle,
+    intent: str,
+    kinds: Optional[Sequence[str]],
+    sections: Optional[Sequence[str]],
+    final_k: int,
+    auto_filter: bool,
+):
+    """
+    Decide en qué partición se busca: la pedida explícitamente, la del intent
+    (INTENT_KINDS) o todo el índice (None).
+    """
+    if kinds or sections:
+        return _filter_params(bundle, kinds or (), sections or ())
+
+    if not auto_filter or intent not in INTENT_KINDS:
+        return None
+
+    plan = _filter_params(bundle, INTENT_KINDS[intent], ())
+    # si la partición no llena final_k (p.ej. índice de esquema) buscamos en todo
+    if plan[0] < max(1, final_k):
+        return None
+    return plan
+
+
+def _search(
+    bundle: _IndexBundle,
+    qvecs: np.ndarray,
+    intents: List[str],
+    search_k: int,
+    final_k: int,
+    kinds: Optional[Sequence[str]],
+    sections: Optional[Sequence[str]],
+    auto_filter: bool,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    index.search agrupando las preguntas por partición: una búsqueda matricial por grupo.
+    Devuelve matrices (n_preguntas, search_k) rellenas con -1 donde no hay candidato.
+    """
+    n = len(intents)
+    scores = np.full((n, search_k), -np.inf, dtype="float32")
+    ids = np.full((n, search_k), -1, dtype="int64")
+
+    groups: Dict[Any, List[int]] = {}
+    plans = {}
+    for row, intent in enumerate(intents):
+        plan = _plan_filter(bundle, intent, kinds, sections, final_k, auto_filter)
+        key = id(plan[1]) if plan else None
+        groups.setdefault(key, []).append(row)
+        plans[key] = plan
+
+    for key, rows in groups.items():
+        plan = plans[key]
+        if plan is None:
+            s, i = bundle.index.search(qvecs[rows], search_k, params=bundle.search_params)
+        else:
+            n_cards, sel = plan
+            kk = min(search_k, n_cards)
+            if kk == 0:
+                continue
+            # mismos efSearch/nprobe que la búsqueda sin filtro, más el selector; unos
+            # parámetros nuevos por búsqueda (ver _IndexBundle.filters)
+            params = search_parameters(bundle.index_params, sel)
+            s, i = bundle.index.search(qvecs[rows], kk, params=params)
+        scores[rows, :s.shape[1]] = s
+        ids[rows, :i.shape[1]] = i
+
+    return scores, _ids_to_rows(bundle, ids)
+
+
+def retrieve_many(
+    questions: List[str],
+    kind: str = "content",
+    k: int = 20,
+    min_score: Optional[float] = None,
+    final_k: int = 8,
+    batch_size: int = 64,
+    kinds: Optional[Sequence[str]] = None,
+    sections: Optional[Sequence[str]] = None,
+    auto_filter: bool = True,
+    signals: Optional[List[QuestionSignals]] = None,
+) -> List[List[dict]]:
+    """
+    Versión por lotes de retrieve(): codifica todas las preguntas en un único forward
+    del modelo, hace una sola búsqueda matricial en FAISS y re-rankea todo el lote.
+    Devuelve una lista de resultados por pregunta, igual que llamar a retrieve() en bucle.
+    """
+    questions = list(questions)
+    if not questions:
+        return []
+
+    bundle = _current_index(kind)
+    qvecs = _embed_many(questions, batch_size=batch_size)
+    if signals is None:
+        signals = [match_signals(q) for q in questions]
+    intents = [sig.intent for sig in signals]
+
+    # subimos un poco el recall inicial para que el re-ranking tenga margen
+    search_k = max(k, final_k * 4, 30)
+    scores, ids = _search(bundle, qvecs, intents, search_k, final_k, kinds, sections, auto_filter)
+
+    return _rerank(signals, scores, ids, bundle.meta, bundle.feats, min_score, final_k)
+
+
 def retrieve(
     question: str,
     kind: str = "content",
@@ -181,93 +666,35 @@ def retrieve(
     min_score: Optional[float] = None,
     final_k: int = 8,
     debug: bool = False,
+    kinds: Optional[Sequence[str]] = None,
+    sections: Optional[Sequence[str]] = None,
+    auto_filter: bool = True,
+    signals: Optional[QuestionSignals] = None,
 ):
-    index, meta = _load_index(kind)
+    """
+    kinds/sections restringen la búsqueda FAISS a esas cards (frag/req/umbral, nombre de sección).
+    Sin filtros explícitos, los intents de INTENT_KINDS buscan solo en su tipo de card
+    (auto_filter=False busca siempre en todo el índice).
+    signals: señales ya calculadas de la pregunta (signals.match_signals), si el llamante las tiene.
+    """
+    bundle = _current_index(kind)
     qvec = _embed_one(question)
+    sig = signals if signals is not None else match_signals(question)
+    intent = sig.intent
 
     # subimos un poco el recall inicial para que el re-ranking tenga margen
     search_k = max(k, final_k * 4, 30)
-    scores, ids = index.search(qvec, search_k)
-
-    raw_results = []
-    for score, idx in zip(scores[0], ids[0]):
-        if idx == -1:
-            continue
-
-        score = float(score)
-        if min_score is not None and score < min_score:
-            continue
-
-        item = dict(meta[idx])
-        item["_score"] = score
-        item["_kind_norm"] = _normalize_kind(item.get("kind", ""))
-        raw_results.append(item)
-
-    intent = _intent(question)
-
-    def bonus(it) -> float:
-        text = (it.get("text") or it.get("contexto") or it.get("descripcion") or "")
-        k_norm = it.get("_kind_norm", "")
-        total = 0.0
-
-        # boosts por tipo de card
-        if intent == "umbral":
-            total += 0.08 if k_norm == "umbral" else (0.02 if k_norm == "req" else 0.0)
-            if _contains_number(text):
-                total += 0.03
-
-        elif intent == "req":
-            total += 0.08 if k_norm == "req" else (0.02 if k_norm == "fragment" else 0.0)
-
-        elif intent == "tasa":
-            if "tasa" in text.lower() or "ordain" in text.lower() or "pago" in text.lower():
-                total += 0.09
-            if _contains_number(text):
-                total += 0.04
-
-        elif intent == "plazo":
-            if any(w in text.lower() for w in ["plazo", "convocatoria", "fecha", "epe", "epeak"]):
-                total += 0.08
-            if _contains_number(text):
-                total += 0.02
-
-        elif intent == "recurso":
-            if any(w in text.lower() for w in ["recurso", "reposición", "reposicion", "jurisdicción", "jurisdiccion", "errekurtso"]):
-                total += 0.09
-
-        elif intent == "notificacion":
-            if any(w in text.lower() for w in ["notificación", "notificacion", "resolución", "resolucion", "jakinaraz"]):
-                total += 0.08
-
-        elif intent == "procedimiento":
-            if any(w in text.lower() for w in ["procedimiento", "solicitud", "tramitar", "izapidet"]):
-                total += 0.08
-
-        elif intent == "evaluacion":
-            if any(w in text.lower() for w in ["evaluación", "evaluacion", "criterios", "méritos", "meritos", "ebalu"]):
-                total += 0.06
-
-        elif intent == "indice":
-            total += 0.10 if "índice" in text.lower() or "indice" in text.lower() or "aurkibidea" in text.lower() else 0.0
-
-        elif intent == "introduccion":
-            total += 0.10 if "introducción" in text.lower() or "introduccion" in text.lower() or "sarrera" in text.lower() else 0.0
-
-        total += _section_bonus(question, it)
-        total += _noise_penalty(text)
-        return total
-
-    for it in raw_results:
-        it["_score2"] = it["_score"] + bonus(it)
+    scores, ids = _search(bundle, qvec, [intent], search_k, final_k, kinds, sections, auto_filter)
 
-    raw_results.sort(key=lambda x: x["_score2"], reverse=True)
-    results = raw_results[:max(1, final_k)]
+    results = _rerank([sig], scores, ids, bundle.meta, bundle.feats, min_score, final_k)[0]
 
     if debug:
         print("\n=== RETRIEVER DEBUG ===")
         print(f"kind_index={kind}  k={k}  search_k={search_k}  min_score={min_score}  final_k={final_k}")
         print("Q:", question)
         print("INTENT:", intent)
+        plan = _plan_filter(bundle, intent, kinds, sections, final_k, auto_filter)
+        print("FILTER:", f"{plan[0]} cards" if plan else "none")
         for i, r in enumerate(results, start=1):
             preview = (r.get("text") or r.get("contexto") or r.get("descripcion") or "")[:220].replace("\n", " ")
             print(
@@ -277,4 +704,4 @@ def retrieve(
             )
         print("=======================\n")
 
-    return results
\ No newline at end of file
+    return results
@@ -0,0 +1,232 @@
+# graphrag_app/signals.py
+"""
+Detección de señales de una pregunta (intent del retriever, secciones, figuras,
+"apartado N", rutas EXACT/SEARCH, ...) con un único regex precompilado.
+
+Antes cada etapa (app.route_intent, detect_figures, detect_sections, retriever._intent,
+_section_bonus...) volvía a recorrer la pregunta con sus propios any(w in q) y re.search.
+Ahora match_signals(q) la recorre una vez, sin acentos, y el resultado (QuestionSignals)
+se pasa por todo el pipeline.
+"""
+
+import re
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+
+def fold(text: str) -> str:
+    """
+    Minúsculas y sin acentos ('Introducción' -> 'introduccion'); la ñ pasa a n.
+    """
+    text = unicodedata.normalize("NFD", (text or "").lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+# ----------------------------
+# Vocabulario
+# ----------------------------
+
+# Intents del retriever, en orden de prioridad (subcadenas, como el any(w in q) original)
+INTENT_TERMS = {
+    "umbral": ["umbral", "mínimo", "minimo", "puntuación", "puntuacion", "puntos", "threshold"],
+    "req": ["requisito", "requisitos", "condición", "condiciones", "debe", "deberá", "debera"],
+    "tasa": ["tasa", "tasas", "pago", "pagar", "cuánto cuesta", "cuanto cuesta", "ordain", "ordaindu"],
+    "plazo": ["plazo", "plazos", "cuándo", "cuando", "fecha", "fechas", "epe", "epeak", "convocatoria"],
+    "recurso": ["recurso", "recurrir", "reposición", "reposicion", "jurisdicción", "jurisdiccion", "errekurtso"],
+    "notificacion": ["notificación", "notificacion", "notifica", "resolución", "resolucion", "jakinaraz"],
+    "procedimiento": ["procedimiento", "tramitar", "tramitación", "tramitacion", "pasos", "solicitud", "izapidet"],
+    "evaluacion": ["evaluación", "evaluacion", "criterios", "méritos", "meritos", "ebalu"],
+    "indice": ["índice", "indice", "aurkibidea"],
+    "introduccion": ["introducción", "introduccion", "sarrera"],
+}
+
+# Palabras de la pregunta que dan bonus a las cards de una sección en el re-ranking
+SECTION_BONUS_TERMS = {
+    "indice": ["índice", "indice", "aurkibidea"],
+    "introduccion": ["introducción", "introduccion", "sarrera"],
+    "tasas": ["tasa", "tasas", "pago", "pagar", "ordain"],
+    "plazos": ["plazo", "plazos", "epe", "epeak", "convocatoria"],
+    "recurso": ["recurso", "recurrir", "reposicion", "reposición", "errekurtso"],
+    "notificacion": ["notificación", "notificacion", "jakinaraz"],
+    "procedimiento": ["procedimiento", "tramitar", "izapidet"],
+    "evaluacion": ["evaluación", "evaluacion", "criterios", "méritos", "meritos", "ebalu"],
+}
+
+# Alias de figuras y secciones (palabras completas)
+FIGURE_ALIASES = {
+    "profesorado pleno": ["pleno", "profesorado pleno", "profesor pleno"],
+    "profesorado agregado": ["agregado", "profesorado agregado", "profesor agregado"],
+    "profesorado de investigación": ["profesorado de investigación", "profesorado investigación"],
+    "doctor investigador": ["doctor investigador"],
+}
+
+SECTION_ALIASES = {
+    "indice": ["índice", "indice", "aurkibidea"],
+    "introduccion": ["introducción", "introduccion", "sarrera"],
+    "procedimiento": ["procedimiento", "izapidetzea"],
+    "recurso": ["recurso", "recursos", "errekurtsoak", "errekurtsoa"],
+    "requisitos": ["requisito", "requisitos"],
+    "plazos": ["plazo", "plazos", "epeak"],
+    "notificacion": ["notificación", "notificacion", "jakinarazpen"],
+    "tasas": ["tasa", "tasas", "ordainketa"],
+    "evaluacion": ["evaluación", "evaluacion", "ebaluazioa"],
+    "otro": ["otro"],
+}
+
+SEARCHY_TERMS = [
+    "dónde", "donde", "menciona", "mencione", "aparece", "habla de", "texto",
+    "fragmento", "muéstrame", "muestrame", "enséñame", "enseñame", "qué pone",
+    "que pone", "qué dice", "que dice", "sección", "seccion", "apartado",
+]
+
+EXACTY_TERMS = [
+    "umbral", "mínim", "minim", "máxim", "maxim", "puntuación", "puntuacion",
+    "puntos", "requisito",
+]
+
+SECTION_QUERY_HINTS = [
+    "sección", "seccion", "apartado", "índice", "indice", "introducción", "introduccion",
+    "aurkibidea", "sarrera",
+]
+
+
+def _substring_vocab() -> Dict[str, Set[str]]:
+    vocab: Dict[str, Set[str]] = {}
+
+    def add(tag: str, terms: List[str]) -> None:
+        for t in terms:
+            vocab.setdefault(fold(t), set()).add(tag)
+
+    for intent, terms in INTENT_TERMS.items():
+        add(f"intent:{intent}", terms)
+    for sec, terms in SECTION_BONUS_TERMS.items():
+        add(f"rsec:{sec}", terms)
+    add("searchy", SEARCHY_TERMS)
+    add("exacty", EXACTY_TERMS)
+    add("section_hint", SECTION_QUERY_HINTS)
+    add("total", ["total"])
+    add("minim", ["mínim", "minim"])
+    add("investigacion", ["investigación", "investigacion"])
+    return vocab
+
+
+def _word_vocab() -> Dict[str, Set[str]]:
+    vocab: Dict[str, Set[str]] = {}
+    for fig, terms in FIGURE_ALIASES.items():
+        for t in terms:
+            vocab.setdefault(fold(t), set()).add(f"fig:{fig}")
+    for sec, terms in SECTION_ALIASES.items():
+        for t in terms:
+            vocab.setdefault(fold(t), set()).add(f"sec:{sec}")
+    return vocab
+
+
+def _close_over_contained(vocab: Dict[str, Set[str]], words: bool) -> Dict[str, FrozenSet[str]]:
+    """
+    En cada posición el regex solo devuelve el término más largo que empieza ahí,
+    así que cada término hereda los tags de los términos que contiene
+    ('mínimo' también es 'mínim'; 'profesorado agregado' también es 'agregado').
+    """
+    closed: Dict[str, FrozenSet[str]] = {}
+    for term, tags in vocab.items():
+        out = set(tags)
+        for other, other_tags in vocab.items():
+            if other == term:
+                continue
+            if words:
+                if re.search(rf"\b{re.escape(other)}\b", term):
+                    out |= other_tags
+            elif other in term:
+                out |= other_tags
+        closed[term] = frozenset(out)
+    return closed
+
+
+def _alternation(terms) -> str:
+    # más largos primero: el regex se queda con la primera alternativa que encaja
+    return "|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True))
+
+
+_SUBSTRING_TAGS = _close_over_contained(_substring_vocab(), words=False)
+_WORD_TAGS = _close_over_contained(_word_vocab(), words=True)
+
+# Un único patrón: en cada posición prueba a la vez las subcadenas, las palabras
+# completas y "apartado N" (lookaheads, para no perder coincidencias solapadas)
+_SIGNALS_RE = re.compile(
+    rf"(?=(?P<sub>{_alternation(_SUBSTRING_TAGS)}))?"
+    rf"(?=\b(?P<word>{_alternation(_WORD_TAGS)})\b)?"
+    rf"(?=\bapartado\s+(?P<ap>\d+)\b)?"
+)
+
+
+# ----------------------------
+# Resultado
+# ----------------------------
+
+@dataclass(frozen=True)
+class QuestionSignals:
+    question: str
+    tags: FrozenSet[str]
+    intent: str                     # intent del retriever ('umbral', 'req', ..., 'general')
+    figures: Tuple[str, ...]        # en el orden de FIGURE_ALIASES
+    sections: Tuple[str, ...]       # en el orden de SECTION_ALIASES
+    apartado: Optional[int]         # "apartado N"
+
+    def has(self, tag: str) -> bool:
+        return tag in self.tags
+
+    @property
+    def searchy(self) -> bool:
+        return "searchy" in self.tags
+
+    @property
+    def exacty(self) -> bool:
+        return "exacty" in self.tags
+
+    @property
+    def section_query(self) -> bool:
+        return bool(self.sections) or "section_hint" in self.tags
+
+    @property
+    def wants_total_min(self) -> bool:
+        return "total" in self.tags and "minim" in self.tags
+
+    @property
+    def mentions_investigacion(self) -> bool:
+        return "investigacion" in self.tags
+
+    @property
+    def route(self) -> str:
+        if self.exacty:
+            return "EXACT"
+        if self.section_query or self.searchy:
+            return "SEARCH"
+        return "OPEN"
+
+
+@lru_cache(maxsize=4096)
+def match_signals(question: str) -> QuestionSignals:
+    q = fold(question)
+    tags: Set[str] = set()
+    apartado: Optional[int] = None
+
+    for m in _SIGNALS_RE.finditer(q):
+        sub, word, ap = m.group("sub", "word", "ap")
+        if sub:
+            tags |= _SUBSTRING_TAGS[sub]
+        if word:
+            tags |= _WORD_TAGS[word]
+        if ap and apartado is None:
+            apartado = int(ap)
+
+    intent = next((name for name in INTENT_TERMS if f"intent:{name}" in tags), "general")
+    return QuestionSignals(
+        question=question,
+        tags=frozenset(tags),
+        intent=intent,
+        figures=tuple(fig for fig in FIGURE_ALIASES if f"fig:{fig}" in tags),
+        sections=tuple(sec for sec in SECTION_ALIASES if f"sec:{sec}" in tags),
+        apartado=apartado,
+    )
@@ -0,0 +1,218 @@
+# graphrag_app/threshold_table.py
+"""
+Tabla en memoria de Figura x UmbralPuntuacion (apartado, minmax, valor, fragmento,
+página) para el camino EXACT de app.py.
+
+Son unos cientos de filas: se cargan de Fuseki con una sola consulta (al arrancar la
+web o en el primer uso) y se indexan por figura y por (figura, apartado, minmax), así
+que "puntuación mínima total para agregado" se responde sin ir a Fuseki. Se vuelve a
+cargar cuando cambia la generación de la caché de fuseki.py (versión del dataset
+distinta o invalidate_cache(), es decir, POST /reload). Si la carga falla no se
+reintenta hasta pasados THRESHOLD_RETRY_SECS (salvo que cambie la generación).
+"""
+
+import asyncio
+import os
+import threading
+import time
+import weakref
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from graphrag_app.fuseki import arefresh_version, asparql_select
+
+U = "http://example.org/academic-career/ontology#"
+
+# Tras un fallo al cargar (Fuseki caído), segundos sin volver a intentarlo
+THRESHOLD_RETRY_SECS = float(os.getenv("THRESHOLD_RETRY_SECS", "30"))
+
+Q_THRESHOLDS = f"""
+PREFIX u: <{U}>
+SELECT ?fig ?n ?umb ?v ?mm ?ap ?frag ?p WHERE {{
+  ?fig a u:Figura .
+  OPTIONAL {{ ?fig u:nombre ?n . }}
+  OPTIONAL {{
+    ?fig u:tieneUmbral ?umb .
+    ?umb a u:UmbralPuntuacion ;
+         u:valor ?v ;
+         u:minmax ?mm ;
+         u:apartado ?ap .
+    OPTIONAL {{
+      ?umb u:provieneDe ?frag .
+      OPTIONAL {{ ?frag u:pagina ?p . }}
+    }}
+  }}
+}}
+"""
+
+
+def _row_key(t: Dict[str, Any]) -> tuple:
+    return t["mm"], t["ap"], t["v"], t["p"]
+
+
+def group_threshold_rows(rows: Iterable[dict]) -> Dict[str, Dict[str, Any]]:
+    """
+    Bindings con ?fig ?n ?umb ?v ?mm ?ap ?frag ?p -> figura -> {"names": {nombres en
+    minúsculas}, "rows": [{"umb", "ap", "mm", "v", "p", "frag"}, ...]} (filas ordenadas por
+    minmax y apartado).
+    """
+    figs: Dict[str, Dict[str, Any]] = {}
+    for r in rows:
+        fig = figs.setdefault(r["fig"]["value"], {"names": set(), "rows": []})
+        if "n" in r:
+            fig["names"].add(r["n"]["value"].strip().lower())
+        if "v" in r:
+            fig["rows"].append({
+                "umb": r.get("umb", {}).get("value", ""),
+                "ap": r["ap"]["value"],
+                "mm": r["mm"]["value"],
+                "v": r["v"]["value"],
+                "p": r.get("p", {}).get("value", "n/a"),
+                "frag": r.get("frag", {}).get("value"),
+            })
+
+    for fig in figs.values():
+        # la misma fila sale repetida una vez por nombre de la figura
+        fig["rows"] = sorted({(t["umb"], t["frag"], t["p"]): t for t in fig["rows"]}.values(), key=_row_key)
+    return figs
+
+
+def choose_figures(
+    names: Iterable[str], figs: Dict[str, Dict[str, Any]], apartados: Optional[List[str]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    nombre buscado -> {"uri", "rows"} entre las figuras cuyo nombre lo contiene.
+    Si casan varias (hay figuras repetidas con otra URI y sin umbrales) se queda, por
+    este orden, la que tiene umbrales (de los apartados pedidos), la de nombre exacto
+    y la de URI menor. Los nombres sin figura no aparecen.
+    """
+    wanted_aps = set(apartados or [])
+    out = {}
+    for name in names:
+        candidates = {}
+        for uri, fig in figs.items():
+            if any(name in n for n in fig["names"]):
+                rows = [t for t in fig["rows"] if not wanted_aps or t["ap"] in wanted_aps]
+                candidates[uri] = (rows, name in fig["names"])
+        if candidates:
+            uri = min(candidates, key=lambda u: (not candidates[u][0], not candidates[u][1], u))
+            out[name] = {"uri": uri, "rows": candidates[uri][0]}
+    return out
+
+
+class ThresholdTable:
+    def __init__(self, figs: Dict[str, Dict[str, Any]], generation: int, load_seconds: float):
+        self.figs = figs
+        self.generation = generation
+        self.load_seconds = load_seconds
+        # (figura, apartado, minmax) -> valor de la primera fila
+        self.values: Dict[Tuple[str, str, str], str] = {}
+        for uri, fig in figs.items():
+            for t in fig["rows"]:
+                self.values.setdefault((uri, t["ap"], t["mm"]), t["v"])
+        # (nombre, apartados) -> resultado de choose_figures; las preguntas se repiten mucho
+        self._lookups: Dict[tuple, Optional[Dict[str, Any]]] = {}
+
+    def lookup(self, names: List[str], apartados: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        aps = tuple(apartados or ())
+        out = {}
+        for name in names:
+            key = (name, aps)
+            if key not in self._lookups:
+                if len(self._lookups) > 10000:
+                    self._lookups.clear()
+                self._lookups[key] = choose_figures([name], self.figs, apartados).get(name)
+            if self._lookups[key] is not None:
+                out[name] = self._lookups[key]
+        return out
+
+    def rows_for(self, fig_uri: str, apartados: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        rows = self.figs.get(fig_uri, {}).get("rows", [])
+        return [t for t in rows if not apartados or t["ap"] in apartados]
+
+    def value(self, fig_uri: str, apartado_uri: str, minmax: str) -> Optional[str]:
+        return self.values.get((fig_uri, apartado_uri, minmax))
+
+    def has_figure(self, fig_uri: str) -> bool:
+        return fig_uri in self.figs
+
+
+_table: Optional[ThresholdTable] = None
+_lock = threading.Lock()
+# una sola carga a la vez (por event loop: la web y el de fondo de fuseki.run_sync)
+_load_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+# (generación, instante) del último fallo: hasta entonces no se reintenta esa generación
+_failed: Tuple[int, float] = (-1, 0.0)
+_stats = {"hits": 0, "misses": 0, "loads": 0, "load_errors": 0}
+
+
+def _load_lock() -> asyncio.Lock:
+    loop = asyncio.get_running_loop()
+    lock = _load_locks.get(loop)
+    if lock is None:
+        lock = _load_locks[loop] = asyncio.Lock()
+    return lock
+
+
+def _usable(table: Optional[ThresholdTable], generation: int) -> bool:
+    # al día, o la carga de esta generación falló hace poco: se sigue con la que hay
+    if table is not None and table.generation == generation:
+        return True
+    failed_generation, retry_at = _failed
+    return failed_generation == generation and time.monotonic() < retry_at
+
+
+async def aget_table() -> Optional[ThresholdTable]:
+    """
+    La tabla actual, recargada si el grafo ha cambiado desde que se cargó. None si
+    Fuseki no responde y no hay ninguna tabla anterior.
+    """
+    global _table, _failed
+    generation = await arefresh_version()
+    if _usable(_table, generation):
+        return _table
+
+    async with _load_lock():
+        # mientras esperábamos otra petición puede haberla cargado (o haber fallado)
+        table = _table
+        if _usable(table, generation):
+            return table
+
+        t0 = time.perf_counter()
+        try:
+            rows = await asparql_select(Q_THRESHOLDS, cache=False)
+        except Exception as e:
+            with _lock:
+                _stats["load_errors"] += 1
+                _failed = (generation, time.monotonic() + THRESHOLD_RETRY_SECS)
+            print(f"[thresholds] no se pudo cargar la tabla de umbrales: {e!r}; reintento en {THRESHOLD_RETRY_SECS:.0f}s")
+            return table
+
+        table = ThresholdTable(group_threshold_rows(rows), generation, time.perf_counter() - t0)
+        with _lock:
+            _table = table
+            _failed = (-1, 0.0)
+            _stats["loads"] += 1
+    print(
+        f"[thresholds] {len(table.figs)} figuras, {len(table.values)} umbrales "
+        f"en {table.load_seconds:.3f}s (generación {generation})"
+    )
+    return table
+
+
+def record_lookup(hit: bool) -> None:
+    with _lock:
+        _stats["hits" if hit else "misses"] += 1
+
+
+def threshold_stats() -> Dict[str, Any]:
+    table = _table
+    with _lock:
+        out = dict(_stats)
+    if table is not None:
+        out.update({
+            "figures": len(table.figs),
+            "thresholds": len(table.values),
+            "generation": table.generation,
+            "load_seconds": round(table.load_seconds, 4),
+        })
+    return out
@@ -1,14 +1,52 @@
+import asyncio
 import os
+import secrets
+import time
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 load_dotenv() 
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Request
 from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 
-from graphrag_app.app import answer_question
+_t_import = time.perf_counter()
+from graphrag_app.app import aanswer_question
+from graphrag_app.fuseki import invalidate_cache, sparql_stats
+from graphrag_app.retriever import embedding_cache_stats, loaded_index_versions, reload_indexes, warmup
+from graphrag_app.gazetteer import aget_gazetteer, gazetteer_stats
+from graphrag_app.threshold_table import aget_table, threshold_stats
+IMPORT_SECONDS = round(time.perf_counter() - _t_import, 3)
 
-app = FastAPI()
+# POST /reload exige este token en la cabecera X-Reload-Token; sin token configurado
+# solo se acepta desde la propia máquina
+RELOAD_TOKEN = os.getenv("RELOAD_TOKEN", "")
+LOCAL_HOSTS = {"127.0.0.1", "::1", "localhost"}
+
+# Tiempos de arranque (import de graphrag_app + carga del modelo y de los índices)
+startup_timings = {"import": IMPORT_SECONDS}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # El modelo de embeddings ya no se carga al importar: lo cargamos aquí,
+    # antes de aceptar peticiones, para que la primera pregunta no pague la carga
+    t0 = time.perf_counter()
+    startup_timings.update(await asyncio.to_thread(warmup))
+    startup_timings["warmup"] = round(time.perf_counter() - t0, 3)
+    # tabla de umbrales y gazetteer del camino EXACT (si Fuseki no está aún, se cargan
+    # en el primer uso)
+    t0 = time.perf_counter()
+    await aget_table()
+    startup_timings["thresholds"] = round(time.perf_counter() - t0, 3)
+    t0 = time.perf_counter()
+    await aget_gazetteer()
+    startup_timings["gazetteer"] = round(time.perf_counter() - t0, 3)
+    print(f"[startup] {startup_timings}")
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 
 BASE_DIR = os.path.dirname(__file__)
 STATIC_DIR = os.path.join(BASE_DIR, "static")
@@ -24,14 +62,45 @@ def home():
     return FileResponse(os.path.join(STATIC_DIR, "index.html"))
 
 
+@app.get("/stats")
+def stats():
+    return {
+        "query_embeddings": embedding_cache_stats(),
+        "index_versions": loaded_index_versions(),
+        "sparql": sparql_stats(),
+        "thresholds": threshold_stats(),
+        "gazetteer": gazetteer_stats(),
+        "startup": startup_timings,
+    }
+
+
+@app.post("/reload")
+def reload(request: Request, x_reload_token: str = Header(default="")):
+    # Después de recargar TTL en Fuseki o reconstruir índices: vacía la caché SPARQL
+    # (y con ella la tabla de umbrales) y carga las versiones nuevas de los índices
+    # sin esperar al sondeo. No es para los usuarios del chat: con token o en local
+    if RELOAD_TOKEN:
+        allowed = secrets.compare_digest(x_reload_token.encode(), RELOAD_TOKEN.encode())
+    else:
+        allowed = request.client is not None and request.client.host in LOCAL_HOSTS
+    if not allowed:
+        raise HTTPException(status_code=403, detail="reload no permitido")
+    return {
+        "sparql_cache_dropped": invalidate_cache(),
+        "index_versions": reload_indexes(),
+    }
+
+
 @app.post("/chat")
-def chat(req: ChatRequest):
+async def chat(req: ChatRequest):
+    # async: mientras espera a Fuseki/Ollama el worker atiende otras peticiones
+    # (antes cada /chat ocupaba un hilo del threadpool de Starlette)
     question = req.message.strip()
     if not question:
         return {"answer": "Escribe una pregunta 🙂"}
 
     try:
-        answer = answer_question(question)
+        answer = await aanswer_question(question)
         return {"answer": answer}
     except Exception as e:
         print("ERROR /chat:", repr(e))